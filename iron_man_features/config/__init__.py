@@ -14,3 +14,63 @@ MATCHES_TO_PREDICT_PATH = os.getenv(
     "MATCHES_TO_PREDICT_PATH", "data/matches_to_predict.csv"
 )
 FEATURES_LIST_PATH = os.getenv("FEATURES_LIST_PATH", "data/feature_list.json")
+
+# Downloads
+# Local snapshots of the query results, reused while their source tables do not
+# change and otherwise refreshed (from their last match for the historical
+# queries). Set to an empty string to download every query in full on every run
+DOWNLOAD_SNAPSHOT_DIR = os.getenv("DOWNLOAD_SNAPSHOT_DIR", "data/snapshots")
+# Days before the last match downloaded again, to pick up late corrections
+DOWNLOAD_OVERLAP_DAYS = float(os.getenv("DOWNLOAD_OVERLAP_DAYS", "7"))
+# Threads issuing the queries concurrently and size of the connection pool they
+# share (never smaller than DOWNLOAD_WORKERS)
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "3"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(DOWNLOAD_WORKERS)))
+# Rows fetched per chunk from the server-side cursor and cast to the schema dtypes
+DOWNLOAD_CHUNK_ROWS = int(os.getenv("DOWNLOAD_CHUNK_ROWS", "50000"))
+# Ignore the local snapshots and download every query in full, e.g. after rows
+# were edited in place, which the source probe does not see
+DOWNLOAD_FULL_REFRESH = os.getenv("DOWNLOAD_FULL_REFRESH", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Offline mode: load the local snapshots without connecting to the database
+DOWNLOAD_OFFLINE = os.getenv("DOWNLOAD_OFFLINE", "").lower() in ("1", "true", "yes")
+# Download the team_game aggregate once and derive games_for_elo and team_games
+# from it on the client instead of running both queries
+DOWNLOAD_SHARED_TEAM_GAME = os.getenv("DOWNLOAD_SHARED_TEAM_GAME", "1").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Feature calculation
+# Rolling engine: "numpy" (prefix-sum kernel), "pandas" (groupby rolling) or "check"
+# (runs both and fails if they diverge)
+ROLLING_ENGINE = os.getenv("ROLLING_ENGINE", "numpy")
+# Intermediate results kept during one feature calculation run (see feature_cache)
+FEATURE_CACHE_MAX_ENTRIES = int(os.getenv("FEATURE_CACHE_MAX_ENTRIES", "64"))
+FEATURE_CACHE_MAX_BYTES = (
+    int(os.environ["FEATURE_CACHE_MAX_BYTES"])
+    if os.getenv("FEATURE_CACHE_MAX_BYTES")
+    else None
+)
+# Processes used to calculate roster features; inputs with fewer rows than
+# FEATURE_PARALLEL_MIN_ROWS are calculated serially
+FEATURE_WORKERS = int(os.getenv("FEATURE_WORKERS", str(os.cpu_count() or 1)))
+FEATURE_PARALLEL_MIN_ROWS = int(os.getenv("FEATURE_PARALLEL_MIN_ROWS", "100000"))
+
+# Elo calculation
+# Elo engine: "array" (array-backed loop, compiled with numba when installed,
+# otherwise vectorized over wavefronts of games that share no roster when they
+# are large enough),
+# "iterrows" (original row-by-row loop) or "check" (runs both and fails if they
+# diverge)
+ELO_ENGINE = os.getenv("ELO_ENGINE", "array")
+# Elo checkpoints, one file per Elo system, resumed by the next run. Set to an
+# empty string to always calculate Elo from the first game
+ELO_CHECKPOINT_DIR = os.getenv("ELO_CHECKPOINT_DIR", "data/elo_checkpoints")
+# Elo hyperparameter sweep: processes and output table (see elo_sweep)
+ELO_SWEEP_WORKERS = int(os.getenv("ELO_SWEEP_WORKERS", str(os.cpu_count() or 1)))
+ELO_SWEEP_PATH = os.getenv("ELO_SWEEP_PATH", "data/elo_sweep.csv")
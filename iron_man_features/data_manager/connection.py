@@ -1,11 +1,30 @@
 import logging
 
 from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
 
-from iron_man_features.config import DB_CONNECTION_STRING
+from iron_man_features.config import (
+    DB_CONNECTION_STRING,
+    DB_POOL_SIZE,
+    DOWNLOAD_WORKERS,
+)
 
 
 logging.basicConfig()
 logging.getLogger("sqlalchemy.engine").setLevel(logging.ERROR)
 
-engine = create_engine(DB_CONNECTION_STRING, pool_recycle=3600)
+# No engine without a connection string, e.g. in offline mode. The pool holds at
+# least one connection per concurrent download, so a DB_POOL_SIZE below
+# DOWNLOAD_WORKERS cannot leave download threads waiting for a connection, and
+# never opens more
+engine = (
+    create_engine(
+        DB_CONNECTION_STRING,
+        poolclass=QueuePool,
+        pool_size=max(DB_POOL_SIZE, DOWNLOAD_WORKERS),
+        max_overflow=0,
+        pool_recycle=3600,
+    )
+    if DB_CONNECTION_STRING
+    else None
+)
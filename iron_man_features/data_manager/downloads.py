@@ -1,15 +1,485 @@
+import hashlib
+import json
 import logging
-from typing import Dict
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
 
 import pandas as pd
+from sqlalchemy import text
 
+from iron_man_features.config import (
+    DOWNLOAD_CHUNK_ROWS,
+    DOWNLOAD_FULL_REFRESH,
+    DOWNLOAD_OFFLINE,
+    DOWNLOAD_OVERLAP_DAYS,
+    DOWNLOAD_SHARED_TEAM_GAME,
+    DOWNLOAD_SNAPSHOT_DIR,
+    DOWNLOAD_WORKERS,
+)
 from iron_man_features.data_manager.connection import engine
-from iron_man_features.queries import QUERIES
+from iron_man_features.data_manager.schema import (
+    apply_schema,
+    compact_dataframes,
+    concat_chunks,
+)
+from iron_man_features.data_manager.views import derive_views
+from iron_man_features.queries import (
+    HISTORY_PROBE,
+    INCREMENTAL_QUERIES,
+    LAST_MATCH_DATE,
+    QUERIES,
+    QUERY_SOURCES,
+    RESULT_NAMES,
+    ROW_KEYS,
+    SCHEMAS,
+    SHARED_VIEWS,
+    SOURCE_PROBE,
+    WATERMARKS,
+)
 
 
-def get_dataframes() -> Dict[str, pd.DataFrame]:
-    dfs = {}
-    for name, query in QUERIES.items():
-        dfs[name] = pd.read_sql(query, engine)
-        logging.info(f"Downloaded {name} df")
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# Snapshots are stored as Parquet when pyarrow is installed, as pickles otherwise
+SNAPSHOT_FORMAT = "parquet" if pyarrow is not None else "pickle"
+SNAPSHOT_EXTENSIONS = {"parquet": "parquet", "pickle": "pkl"}
+
+
+# Schema dtypes cast chunk by chunk by read_query (see there)
+CHUNK_DTYPES = ("category", "float32")
+
+
+def _snapshot_paths(
+    name: str, directory: str, snapshot_format: str = SNAPSHOT_FORMAT
+) -> Dict[str, str]:
+    return {
+        "data": os.path.join(
+            directory, f"{name}.{SNAPSHOT_EXTENSIONS[snapshot_format]}"
+        ),
+        "meta": os.path.join(directory, f"{name}.json"),
+    }
+
+
+def _query_hash(name: str) -> str:
+    # The schema is part of the key, so a dtype change discards the old snapshots
+    schema = json.dumps(SCHEMAS.get(name, {}), sort_keys=True)
+    return hashlib.sha256(f"{QUERIES[name]}\n{schema}".encode()).hexdigest()
+
+
+def _json_int(value) -> Optional[int]:
+    return None if pd.isna(value) else int(value)
+
+
+def read_query(
+    query,
+    schema: Dict[str, str],
+    params: Optional[dict] = None,
+    chunksize: int = DOWNLOAD_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """
+    Reads the result of a query in chunks from a server-side cursor, so only one
+    chunk at a time is held as Python objects.
+
+    Categorical and float32 columns, which hold most of the memory, are cast as
+    soon as each chunk arrives, since those casts never fail on the strings and
+    numbers read_sql returns. The integer and boolean dtypes of the schema are
+    cast once on the whole result, so a value that does not fit (see apply_schema)
+    leaves its column with the dtype of a single read_sql, whatever chunk it is in.
+
+    Args:
+        query (str | TextClause): Query.
+        schema (dict): Dtypes of the columns (see queries.SCHEMAS).
+        params (dict): Bound parameters of the query.
+        chunksize (int): Rows per chunk.
+
+    Returns:
+        pd.DataFrame: The result, with the dtypes of the schema.
+    """
+    chunk_schema, result_schema = {}, {}
+    for column, dtype in schema.items():
+        (chunk_schema if dtype in CHUNK_DTYPES else result_schema)[column] = dtype
+    with engine.connect().execution_options(stream_results=True) as connection:
+        chunks = [
+            apply_schema(chunk, chunk_schema)
+            for chunk in pd.read_sql(
+                query, connection, params=params, chunksize=chunksize
+            )
+        ]
+    return apply_schema(concat_chunks(chunks), result_schema)
+
+
+def _read_probe(query, params: Optional[dict] = None) -> Dict[str, list]:
+    probe = pd.read_sql(query, engine, params=params)
+    return {
+        row.source: [_json_int(row.row_count), _json_int(row.max_id)]
+        for row in probe.itertuples()
+    }
+
+
+def probe_sources() -> Dict[str, list]:
+    """
+    Runs the source probe (see queries.SOURCE_PROBE).
+
+    Returns:
+        dict: [row count, largest id] of each source table.
+    """
+    return _read_probe(SOURCE_PROBE)
+
+
+def probe_history(since: pd.Timestamp) -> Dict[str, list]:
+    """
+    Runs the history probe (see queries.HISTORY_PROBE).
+
+    Args:
+        since (pd.Timestamp): Start date of an incremental download.
+
+    Returns:
+        dict: [row count, largest id] of the rows of each source table that an
+              incremental download from since does not read.
+    """
+    return _read_probe(text(HISTORY_PROBE), {"since": since.to_pydatetime()})
+
+
+def last_match_date() -> Optional[pd.Timestamp]:
+    """
+    Returns the date of the last match with games, or None if there is none.
+    """
+    last_date = pd.read_sql(LAST_MATCH_DATE, engine)["last_date"].iloc[0]
+    return None if pd.isna(last_date) else pd.Timestamp(last_date)
+
+
+def sort_rows(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sorts the result of a historical query by date, game and team, so full and
+    incremental downloads return the rows in the same order.
+    """
+    return df.sort_values([WATERMARKS[name][0]] + ROW_KEYS, ignore_index=True)
+
+
+def load_snapshot(name: str, directory: str = DOWNLOAD_SNAPSHOT_DIR):
+    """
+    Loads the local snapshot of a query and its metadata.
+
+    Args:
+        name (str): Query name.
+        directory (str): Snapshot directory.
+
+    Returns:
+        tuple: The snapshot DataFrame and its metadata (source probe and, for the
+               historical queries, (date, game_id) watermark and history probe),
+               or (None, None) if
+               there is no usable snapshot or it was saved for a different
+               version of the query or of its schema.
+    """
+    meta_path = _snapshot_paths(name, directory)["meta"]
+    if not os.path.exists(meta_path):
+        return None, None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("query") != _query_hash(name):
+        logging.info(
+            f"Query {name} or its schema changed since its snapshot, discarding it"
+        )
+        return None, None
+    if meta["format"] == "parquet" and pyarrow is None:
+        logging.info(f"Snapshot of {name} is Parquet but pyarrow is not installed")
+        return None, None
+    data_path = _snapshot_paths(name, directory, meta["format"])["data"]
+    if not os.path.exists(data_path):
+        return None, None
+
+    if meta["format"] == "parquet":
+        df = pd.read_parquet(data_path)
+    else:
+        df = pd.read_pickle(data_path)
+    if meta["watermark"] is not None:
+        date, game_id = meta["watermark"]
+        meta["watermark"] = (pd.Timestamp(date), game_id)
+    return df, meta
+
+
+def save_snapshot(
+    name: str,
+    df: pd.DataFrame,
+    probe: Optional[Dict[str, list]],
+    directory: str = DOWNLOAD_SNAPSHOT_DIR,
+    history: Optional[dict] = None,
+):
+    """
+    Saves the snapshot of a query with the source probe taken before downloading
+    it and, for the historical queries, its watermark, the latest (date, game_id),
+    and the history probe taken before downloading it. The files are written next
+    to the old ones and then moved over them.
+
+    Args:
+        name (str): Query name.
+        df (pd.DataFrame): Full result of the query.
+        probe (dict): Probe of the sources of the query, or None.
+        directory (str): Snapshot directory.
+        history (dict): Start date ("since") of the next incremental download and
+                        the probe_history of that date ("probe"), or None.
+    """
+    meta = {
+        "query": _query_hash(name),
+        "format": SNAPSHOT_FORMAT,
+        "probe": probe,
+        "watermark": None,
+        "history": history,
+    }
+    if name in WATERMARKS:
+        date_column, id_column = WATERMARKS[name]
+        last_date = df[date_column].max()
+        if not pd.isna(last_date):
+            last_id = df.loc[df[date_column] == last_date, id_column].max()
+            meta["watermark"] = [last_date.isoformat(), int(last_id)]
+
+    os.makedirs(directory, exist_ok=True)
+    paths = _snapshot_paths(name, directory)
+    if SNAPSHOT_FORMAT == "parquet":
+        df.to_parquet(f"{paths['data']}.tmp")
+    else:
+        df.to_pickle(f"{paths['data']}.tmp")
+    with open(f"{paths['meta']}.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{paths['data']}.tmp", paths["data"])
+    os.replace(f"{paths['meta']}.tmp", paths["meta"])
+
+
+def merge_snapshot(
+    name: str, snapshot: pd.DataFrame, new_rows: pd.DataFrame, since: pd.Timestamp
+) -> pd.DataFrame:
+    """
+    Merges the rows downloaded since a date into the snapshot of a query.
+
+    The downloaded rows replace every snapshot row from that date on, so late
+    corrections and deletions within the overlap window are picked up, as well as
+    any older snapshot row with the same game and team. Rows without a date are
+    kept as they are.
+
+    Args:
+        name (str): Query name.
+        snapshot (pd.DataFrame): Previous result of the query.
+        new_rows (pd.DataFrame): Result of the incremental query.
+        since (pd.Timestamp): Start date of the incremental query.
+
+    Returns:
+        pd.DataFrame: The merged result (see sort_rows).
+    """
+    kept = snapshot[~(snapshot[WATERMARKS[name][0]] >= since)]
+    if new_rows.empty:
+        return kept.reset_index(drop=True)
+
+    new_keys = pd.MultiIndex.from_frame(new_rows[ROW_KEYS])
+    kept = kept[~pd.MultiIndex.from_frame(kept[ROW_KEYS]).isin(new_keys)]
+    merged = sort_rows(name, pd.concat([kept, new_rows], ignore_index=True))
+    # Categories of the snapshot and of the new rows differ
+    return apply_schema(merged, SCHEMAS.get(name, {}))
+
+
+def _history_baseline(overlap_days: float) -> Optional[dict]:
+    last_date = last_match_date()
+    if last_date is None:
+        return None
+    since = last_date - pd.Timedelta(days=overlap_days)
+    return {"since": since.isoformat(), "probe": probe_history(since)}
+
+
+def _incremental_start(
+    name: str, meta: dict, history: Optional[dict]
+) -> Optional[pd.Timestamp]:
+    # Start of the incremental download saved with the snapshot, if the rows
+    # before it did not change since
+    saved = meta.get("history")
+    if saved is None:
+        return None
+    since = pd.Timestamp(saved["since"])
+    if history is not None and history["since"] == saved["since"]:
+        current = history["probe"]
+    else:
+        current = probe_history(since)
+    if current != saved["probe"]:
+        logging.info(f"Rows of {name} before {since} changed, downloading it in full")
+        return None
+    return since
+
+
+def download_query(
+    name: str,
+    probe: Optional[Dict[str, list]],
+    directory: str = DOWNLOAD_SNAPSHOT_DIR,
+    overlap_days: float = DOWNLOAD_OVERLAP_DAYS,
+    full_refresh: bool = False,
+) -> pd.DataFrame:
+    """
+    Returns the result of a query through its local snapshot.
+
+    The snapshot is reused as is when the probe of its sources did not change,
+    never for queries without sources (see QUERY_SOURCES). Otherwise the other
+    queries are downloaded in full, and historical queries download only the
+    matches since the start date saved with the snapshot: the date of the last
+    match at the time, minus the overlap. That is only done while the history
+    probe of the rows before that date is the same as when the snapshot was
+    saved; if a row was added or deleted there, the query is downloaded in full.
+    Like the source probe, the history probe does not see rows edited in place,
+    which are only picked up within the overlap or by a full refresh.
+
+    Args:
+        name (str): Query name.
+        probe (dict): Current probe of the sources of the query, or None if it
+                      has no sources.
+        directory (str): Snapshot directory.
+        overlap_days (float): Days before the last match downloaded again.
+        full_refresh (bool): Ignore the snapshot and download the query in full.
+
+    Returns:
+        pd.DataFrame: Full, up to date result of the query.
+    """
+    snapshot, meta = (None, None) if full_refresh else load_snapshot(name, directory)
+    if snapshot is not None and probe is not None and meta["probe"] == probe:
+        logging.info(f"Reusing {name} snapshot, its sources did not change")
+        return snapshot
+
+    # Taken before reading, so rows changed during the download are seen next time
+    history = _history_baseline(overlap_days) if name in WATERMARKS else None
+    since = None
+    if snapshot is not None and name in WATERMARKS:
+        since = _incremental_start(name, meta, history)
+
+    if since is not None:
+        new_rows = read_query(
+            text(INCREMENTAL_QUERIES[name]),
+            SCHEMAS.get(name, {}),
+            params={"since": since.to_pydatetime()},
+        )
+        df = merge_snapshot(name, snapshot, new_rows, since)
+        logging.info(
+            f"Downloaded {len(new_rows)} rows of {name} df since {since} "
+            f"(watermark {meta['watermark']}), {len(df)} rows in total"
+        )
+    else:
+        df = read_query(QUERIES[name], SCHEMAS.get(name, {}))
+        if name in WATERMARKS:
+            df = sort_rows(name, df)
+        logging.info(f"Downloaded {name} df in full ({len(df)} rows)")
+    save_snapshot(name, df, probe, directory, history)
+    return df
+
+
+def load_offline(name: str, directory: str = DOWNLOAD_SNAPSHOT_DIR) -> pd.DataFrame:
+    """
+    Loads the local snapshot of a query without connecting to the database.
+
+    Raises:
+        FileNotFoundError: If there is no usable snapshot of the query.
+    """
+    snapshot, meta = load_snapshot(name, directory)
+    if snapshot is None:
+        raise FileNotFoundError(
+            f"No snapshot of {name} in '{directory}', run once with DOWNLOAD_OFFLINE "
+            "unset to download it"
+        )
+    logging.info(f"Loaded {name} snapshot offline (watermark {meta['watermark']})")
+    return snapshot
+
+
+def _timed(download: Callable[[str], pd.DataFrame], name: str) -> pd.DataFrame:
+    start = time.perf_counter()
+    df = download(name)
+    logging.info(f"Got {name} df: {len(df)} rows in {time.perf_counter() - start:.1f}s")
+    return df
+
+
+def download_concurrently(
+    names: List[str],
+    download: Callable[[str], pd.DataFrame],
+    workers: int = DOWNLOAD_WORKERS,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Downloads several queries at the same time from a thread pool, each on its own
+    connection of the engine pool (see DB_POOL_SIZE), so the download takes about
+    as long as the slowest query.
+
+    Args:
+        names (list): Query names.
+        download (Callable): Returns the DataFrame of a query given its name.
+        workers (int): Number of threads.
+
+    Returns:
+        dict: DataFrame of each query, in the order of names.
+    """
+    start = time.perf_counter()
+    workers = max(1, min(workers, len(names)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {name: executor.submit(_timed, download, name) for name in names}
+        dfs = {name: future.result() for name, future in futures.items()}
+    logging.info(
+        f"Downloaded {len(names)} queries in {time.perf_counter() - start:.1f}s "
+        f"with {workers} threads"
+    )
     return dfs
+
+
+def _download_full(name: str) -> pd.DataFrame:
+    df = read_query(QUERIES[name], SCHEMAS.get(name, {}))
+    return sort_rows(name, df) if name in WATERMARKS else df
+
+
+def get_dataframes(
+    names: Optional[Iterable[str]] = None,
+    offline: bool = DOWNLOAD_OFFLINE,
+    shared: bool = DOWNLOAD_SHARED_TEAM_GAME,
+    full_refresh: bool = DOWNLOAD_FULL_REFRESH,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Downloads the query results, through their local snapshots unless
+    DOWNLOAD_SNAPSHOT_DIR is empty.
+
+    Args:
+        names (Iterable): Results to download. Default: all (see RESULT_NAMES).
+        offline (bool): Only load the local snapshots. Default: DOWNLOAD_OFFLINE.
+        shared (bool): Download the team_game aggregate once and derive
+                       games_for_elo and team_games from it (see SHARED_VIEWS).
+                       Default: DOWNLOAD_SHARED_TEAM_GAME.
+        full_refresh (bool): Download every query in full and replace its
+                             snapshot. Default: DOWNLOAD_FULL_REFRESH.
+
+    Returns:
+        dict: DataFrame of each result, with the compact dtypes of its schema.
+    """
+    names = list(names or RESULT_NAMES)
+    queries = list(
+        dict.fromkeys(
+            SHARED_VIEWS.get(name, name) if shared else name for name in names
+        )
+    )
+    if offline:
+        dfs = {name: load_offline(name) for name in queries}
+    elif engine is None:
+        raise ValueError(
+            "DB_CONNECTION_STRING is not set; set DOWNLOAD_OFFLINE to use the local "
+            "snapshots"
+        )
+    elif not DOWNLOAD_SNAPSHOT_DIR:
+        dfs = download_concurrently(queries, _download_full)
+    else:
+        probe = probe_sources()
+
+        def download(name: str) -> pd.DataFrame:
+            sources = QUERY_SOURCES[name]
+            return download_query(
+                name,
+                None if sources is None else {s: probe[s] for s in sources},
+                full_refresh=full_refresh,
+            )
+
+        dfs = download_concurrently(queries, download)
+
+    if shared:
+        dfs = derive_views(dfs, names)
+    return compact_dataframes(dfs, SCHEMAS)
@@ -0,0 +1,149 @@
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Columns interned by key kind. Every column of a kind shares one vocabulary, so
+# codes can be compared across columns and across DataFrames.
+INTERNED_COLUMNS = {
+    "roster": ["roster_hash", "roster_hash_op"],
+    "team": ["team_id", "team_id_op"],
+}
+
+INTERNED_DTYPE = "Int32"
+
+
+class KeyInterner:
+    """
+    Maps roster hashes and team ids to dense int32 codes.
+
+    Roster hashes are GROUP_CONCAT strings such as "1-2-3-4-5" and are the groupby,
+    merge and rating keys of the whole pipeline. Interning them once after the
+    download makes all of those operations run on integers. Missing keys become
+    <NA>, so groupbys still drop them and merges still match them to each other.
+
+    Args:
+        vocabularies (dict): Original values for each key kind, indexed by code.
+
+    Usage:
+    >>> interner = KeyInterner.fit(dfs)
+    >>> dfs = {name: interner.intern(df) for name, df in dfs.items()}
+    >>> output = interner.restore(feature_df)
+    """
+
+    def __init__(self, vocabularies: Dict[str, pd.Index]):
+        self.vocabularies = vocabularies
+
+    @classmethod
+    def fit(cls, dfs: Dict[str, pd.DataFrame]) -> "KeyInterner":
+        """
+        Builds the vocabularies from every interned column of the DataFrames.
+        """
+        vocabularies = {}
+        for kind, columns in INTERNED_COLUMNS.items():
+            values = pd.concat(
+                [
+                    df[column].dropna()
+                    for df in dfs.values()
+                    for column in columns
+                    if column in df.columns
+                ]
+                or [pd.Series(dtype=object)],
+                ignore_index=True,
+            )
+            uniques = pd.unique(values)
+            # Team ids read from nullable columns come as float; keep them integer
+            if pd.api.types.is_float_dtype(uniques) and np.all(uniques % 1 == 0):
+                uniques = uniques.astype(np.int64)
+            vocabularies[kind] = pd.Index(uniques)
+        return cls(vocabularies)
+
+    def _columns(self, df: pd.DataFrame) -> List[Tuple[str, str]]:
+        return [
+            (kind, column)
+            for kind, columns in INTERNED_COLUMNS.items()
+            for column in columns
+            if column in df.columns
+        ]
+
+    def encode(self, kind: str, values) -> pd.arrays.IntegerArray:
+        """
+        Returns the codes of the given values. Missing or unknown values are <NA>.
+        """
+        codes = self.vocabularies[kind].get_indexer(pd.Index(values))
+        return pd.arrays.IntegerArray(
+            np.where(codes >= 0, codes, 0).astype(np.int32), codes < 0
+        )
+
+    def decode(self, kind: str, codes) -> np.ndarray:
+        """
+        Returns the original values of the given codes. <NA> codes become NaN.
+        """
+        positions = pd.array(codes, dtype=INTERNED_DTYPE).to_numpy(
+            dtype=np.int64, na_value=-1
+        )
+        return pd.api.extensions.take(
+            self.vocabularies[kind].to_numpy(), positions, allow_fill=True
+        )
+
+    def names(self, kind: str) -> Dict[int, object]:
+        """
+        Returns a {code: original value} dictionary, e.g. to save Elo ratings.
+        """
+        return dict(enumerate(self.vocabularies[kind]))
+
+    def codes(self, kind: str, values) -> Dict[object, object]:
+        """
+        Returns a {original value: code} dictionary, e.g. to load Elo checkpoints.
+        Values not in the vocabulary are added to it. Missing values map to <NA>.
+        """
+        values = list(values)
+        known = pd.Index([v for v in values if not pd.isna(v)])
+        unknown = known[self.vocabularies[kind].get_indexer(known) < 0].unique()
+        if len(unknown):
+            self.vocabularies[kind] = self.vocabularies[kind].append(unknown)
+        return dict(zip(values, self.encode(kind, values).tolist()))
+
+    def intern(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replaces the roster and team columns of a DataFrame with their codes.
+        """
+        df = df.copy()
+        for kind, column in self._columns(df):
+            df[column] = self.encode(kind, df[column])
+        return df
+
+    def restore(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replaces the interned columns of a DataFrame with their original values.
+        """
+        df = df.copy()
+        for kind, column in self._columns(df):
+            df[column] = self.decode(kind, df[column])
+        return df
+
+
+def intern_keys(
+    dfs: Dict[str, pd.DataFrame]
+) -> Tuple[Dict[str, pd.DataFrame], KeyInterner]:
+    """
+    Interns the roster and team keys of all downloaded DataFrames with a shared
+    vocabulary.
+
+    Args:
+        dfs (dict): DataFrames returned by get_dataframes.
+
+    Returns:
+        tuple: The interned DataFrames and the KeyInterner used to restore them.
+    """
+    interner = KeyInterner.fit(dfs)
+    logging.info(
+        "Interned "
+        + ", ".join(
+            f"{len(vocabulary)} {kind} keys"
+            for kind, vocabulary in interner.vocabularies.items()
+        )
+    )
+    return {name: interner.intern(df) for name, df in dfs.items()}, interner
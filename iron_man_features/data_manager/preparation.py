@@ -1,8 +1,12 @@
 import logging
 
+import numpy as np
 import pandas as pd
 
 from iron_man_features.features import MAPS
+from iron_man_features.features.feature_cache import feature_cache_scope
+from iron_man_features.features.parallel import execute_plan
+from iron_man_features.features.planner import FeaturePlan
 
 
 def calculate_features(
@@ -10,12 +14,23 @@ def calculate_features(
     feature_classes: list,
     information_df: pd.DataFrame,
 ) -> pd.DataFrame:
-    """Calculates features for a given list of feature classes."""
+    """
+    Calculates features for a given list of feature classes.
+
+    The features are run through a FeaturePlan, so filters, roster groupings and
+    cumulative sums shared by several features are computed only once. Intermediate
+    results live in a FeatureCache scoped to this call and are released at the end.
+    Roster features of large inputs are computed in parallel over roster shards
+    (see FEATURE_WORKERS and FEATURE_PARALLEL_MIN_ROWS).
+    Column order follows feature_classes.
+    """
     try:
         logging.info(f"Calculating {len(feature_classes)} features")
-        features = [feature_df] + [
-            f.calculation(information_df) for f in feature_classes
-        ]
+        plan = FeaturePlan(feature_classes)
+        logging.info(plan.summary())
+        with feature_cache_scope() as cache:
+            features = [feature_df] + execute_plan(plan, information_df)
+            logging.info(f"Feature cache stats: {cache.stats()}")
         return pd.concat(features, axis=1)
     except KeyError as e:
         print(e.args)
@@ -89,18 +104,43 @@ def create_opponent_features(df: pd.DataFrame):
     return df
 
 
-def create_elo_crossing_features(df: pd.DataFrame, elo_system):
-    team_elo_features = [f for f in df.columns if "elo" in f and "_op" not in f]
+def elo_crossing_pairs(columns) -> pd.DataFrame:
+    """
+    Resolves the opponent column and the name of the crossing feature of each team
+    elo column. A _tr elo is crossed with the opponent's _ct elo and vice versa.
+
+    Args:
+        columns: Columns of the feature DataFrame.
+
+    Returns:
+        pd.DataFrame: One row per team elo column, with the columns team, opponent
+                      and feature.
+    """
+    team_elo_features = [f for f in columns if "elo" in f and "_op" not in f]
+    pairs = []
     for f in team_elo_features:
-        new_feature_name = f.replace("elo", "elo_cross")
         if "_tr" in f:
             op_f_name = f"{f.replace("_tr", "_ct")}_op"
         elif "_ct" in f:
             op_f_name = f"{f.replace("_ct", "_tr")}_op"
         else:
             op_f_name = f"{f}_op"
-        df[new_feature_name] = df.apply(
-            lambda r: elo_system.calc_expected_score(r[f], r[op_f_name]), axis=1
-        )
+        pairs.append((f, op_f_name, f.replace("elo", "elo_cross")))
+    return pd.DataFrame(pairs, columns=["team", "opponent", "feature"])
 
-    return df
+
+def create_elo_crossing_features(df: pd.DataFrame, elo_system):
+    """
+    Adds the expected score of the team against the opponent for every elo column,
+    computed for all column pairs (see elo_crossing_pairs) in one array operation.
+    """
+    pairs = elo_crossing_pairs(df.columns)
+    logging.info(f"Creating {len(pairs)} elo crossing features")
+    expected = elo_system.calc_expected_score(
+        df[pairs["team"]].to_numpy(dtype=float, na_value=np.nan),
+        df[pairs["opponent"]].to_numpy(dtype=float, na_value=np.nan),
+    )
+    crossing = pd.DataFrame(expected, index=df.index, columns=pairs["feature"].tolist())
+    return pd.concat(
+        [df.drop(columns=crossing.columns, errors="ignore"), crossing], axis=1
+    )
@@ -0,0 +1,125 @@
+import logging
+import warnings
+from typing import Dict, List
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+def frame_memory(df: pd.DataFrame) -> int:
+    """Returns the deep memory usage of a DataFrame in bytes."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, str]) -> pd.DataFrame:
+    """
+    Casts the columns of a DataFrame to the dtypes declared in a schema.
+
+    Columns missing from the DataFrame are ignored. A column whose values do not
+    fit its declared dtype (e.g. fractional values in an integer column) keeps its
+    inferred dtype and a warning is logged.
+
+    Args:
+        df (pd.DataFrame): DataFrame returned by read_sql.
+        schema (dict): Maps column names to pandas dtypes.
+
+    Returns:
+        pd.DataFrame: DataFrame with the compact dtypes.
+    """
+    casts = {}
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        try:
+            casts[column] = df[column].astype(dtype)
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Keeping {column} as {df[column].dtype}: {e}")
+    return df.assign(**casts)
+
+
+def align_categories(dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Gives categorical columns that appear in several DataFrames the same categories,
+    so that concatenating the DataFrames keeps them categorical.
+    """
+    columns = {}
+    for df in dfs.values():
+        for column in df.select_dtypes("category").columns:
+            columns.setdefault(column, []).append(df[column])
+
+    for column, series in columns.items():
+        if len(series) < 2:
+            continue
+        categories = union_categoricals(
+            [s.array for s in series], ignore_order=True
+        ).categories
+        for df in dfs.values():
+            if column in df.columns and isinstance(
+                df[column].dtype, pd.CategoricalDtype
+            ):
+                df[column] = df[column].cat.set_categories(categories)
+    return dfs
+
+
+def concat_chunks(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates the chunks of a query result.
+
+    Categorical columns get the union of the categories of the chunks, and
+    columns left as object by chunks that are entirely NULL get the dtype inferred
+    for the whole result, as a single read_sql would.
+
+    Args:
+        chunks (list): Chunks with the same columns, as returned by read_sql,
+                       with their categorical columns cast.
+
+    Returns:
+        pd.DataFrame: The result, with a fresh RangeIndex.
+    """
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+    aligned = align_categories(dict(enumerate(chunks)))
+    with warnings.catch_warnings():
+        # All-NULL chunks are object columns, inferred again below either way
+        warnings.filterwarnings(
+            "ignore", "The behavior of DataFrame concatenation", FutureWarning
+        )
+        df = pd.concat(list(aligned.values()), ignore_index=True)
+    for column in df.select_dtypes("object").columns:
+        inferred = df[column].infer_objects()
+        if inferred.dtype != object:
+            df[column] = inferred
+    return df
+
+
+def compact_dataframes(
+    dfs: Dict[str, pd.DataFrame], schemas: Dict[str, Dict[str, str]]
+) -> Dict[str, pd.DataFrame]:
+    """
+    Applies the schema of each query to its DataFrame and logs the memory saved.
+
+    Args:
+        dfs (dict): DataFrames by query name.
+        schemas (dict): Schema by query name (see queries.SCHEMAS).
+
+    Returns:
+        dict: DataFrames with compact dtypes.
+    """
+    compacted = {}
+    for name, df in dfs.items():
+        before = frame_memory(df)
+        compacted[name] = apply_schema(df, schemas.get(name, {}))
+        after = frame_memory(compacted[name])
+        logging.info(
+            f"Compacted {name} df from {before / 2**20:.1f} MB to "
+            f"{after / 2**20:.1f} MB ({1 - after / max(before, 1):.0%} saved)"
+        )
+    return align_categories(compacted)
+
+
+def to_output_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Casts nullable boolean columns to Int8 so CSV files keep 0/1 values.
+    """
+    boolean_columns = df.select_dtypes("boolean").columns
+    return df.astype({column: "Int8" for column in boolean_columns})
@@ -0,0 +1,286 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from iron_man_features.queries import SHARED_VIEWS
+
+
+# Columns of each view, in the order of the SELECT of its query
+ELO_COLUMNS = [
+    "team_id",
+    "game_id",
+    "match_id",
+    "lan",
+    "start_date",
+    "roster_hash",
+    "team_name",
+    "starting_side",
+    "score_ct",
+    "score_tr",
+    "map_id",
+    "played_map",
+    "total_rounds",
+    "score",
+    "hltv_rank",
+]
+ELO_OPPONENT_COLUMNS = [
+    "team_id",
+    "roster_hash",
+    "team_name",
+    "starting_side",
+    "score_ct",
+    "score_tr",
+    "score",
+    "hltv_rank",
+]
+
+PLAYER_STATS = [
+    f"{stat}{side}"
+    for side in ("", "_ct", "_tr")
+    for stat in ("kills", "deaths", "assists", "flash_assists", "fk_diff")
+]
+RATINGS = [
+    f"{aggregate}_rating{side}"
+    for side in ("", "_ct", "_tr")
+    for aggregate in ("max", "avg", "min")
+]
+FEATURE_COLUMNS = (
+    [
+        "match_id",
+        "match_date",
+        "team_id",
+        "game_id",
+        "game_hltv_id",
+        "roster_hash",
+        "lan",
+        "team_name",
+        "starting_side",
+        "score_ct",
+        "won_pistol_ct",
+        "score_tr",
+        "won_pistol_tr",
+        "clutches",
+        "first_kills",
+        "played_map",
+        "hltv_rank",
+        "total_rounds",
+        "score",
+    ]
+    + PLAYER_STATS
+    + RATINGS[:3]
+    + ["max_kast", "avg_kast", "min_kast"]
+    + RATINGS[3:]
+)
+FEATURE_OPPONENT_COLUMNS = (
+    [
+        "roster_hash",
+        "team_id",
+        "team_name",
+        "starting_side",
+        "score_ct",
+        "won_pistol_ct",
+        "score_tr",
+        "won_pistol_tr",
+        "clutches",
+        "first_kills",
+        "hltv_rank",
+        "score",
+    ]
+    + PLAYER_STATS
+    + RATINGS
+)
+
+# Upper bounds of the rank_range buckets
+RANK_RANGES = np.array([5, 10, 20, 50, 100, 500])
+
+
+def opponent_pairs(team_game: pd.DataFrame) -> pd.DataFrame:
+    """
+    Self-join of the team_game rows on game_id, the integer key shared by the two
+    teams of a game.
+
+    Args:
+        team_game (pd.DataFrame): Result of the team_game query.
+
+    Returns:
+        pd.DataFrame: row and row_op, positions of a team and of its opponent, and
+                      their team_id and team_id_op, in the order of row.
+    """
+    keys = pd.DataFrame(
+        {
+            "game_id": team_game["game_id"].to_numpy(),
+            "team_id": team_game["team_id"].to_numpy(),
+            "row": np.arange(len(team_game)),
+        }
+    )
+    pairs = keys.merge(keys, on="game_id", suffixes=("", "_op"))
+    pairs = pairs[pairs["team_id"] != pairs["team_id_op"]]
+    return pairs.sort_values("row", kind="stable", ignore_index=True)
+
+
+def _join_opponent(
+    team_game: pd.DataFrame,
+    rows: np.ndarray,
+    opponent_rows: np.ndarray,
+    columns: list,
+    opponent_columns: list,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Takes the team columns of rows and the opponent columns of opponent_rows. An
+    opponent row of -1 gives missing opponent values, like an unmatched LEFT JOIN.
+    """
+    team = team_game[columns].take(rows).reset_index(drop=True)
+    opponent = team_game[opponent_columns].reset_index(drop=True)
+    opponent = opponent.reindex(opponent_rows).reset_index(drop=True)
+    return team, opponent.add_suffix("_op")
+
+
+def games_for_elo_view(
+    team_game: pd.DataFrame, pairs: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Derives the games_for_elo result from the team_game result: one row per game,
+    from the side of the team with the lowest id.
+
+    Args:
+        team_game (pd.DataFrame): Result of the team_game query, sorted by
+                                  start_date and game_id.
+        pairs (pd.DataFrame): opponent_pairs of team_game, if already computed.
+
+    Returns:
+        pd.DataFrame: The games_for_elo columns.
+    """
+    if pairs is None:
+        pairs = opponent_pairs(team_game)
+    pairs = pairs[pairs["team_id"] < pairs["team_id_op"]]
+    team, opponent = _join_opponent(
+        team_game,
+        pairs["row"].to_numpy(),
+        pairs["row_op"].to_numpy(),
+        ELO_COLUMNS,
+        ELO_OPPONENT_COLUMNS,
+    )
+    return pd.concat([team, opponent], axis=1)
+
+
+def _nullable_float(series: pd.Series) -> pd.Series:
+    return series.astype("Float64")
+
+
+def _per_round(values: pd.Series, total_rounds: pd.Series) -> pd.Series:
+    # MySQL returns integer divisions as DECIMAL rounded half up to 4 places, and
+    # NULL for a division by zero
+    ratio = _nullable_float(values) / _nullable_float(total_rounds)
+    ratio = np.floor(ratio * 10**4 + 0.5) / 10**4
+    return ratio.where((total_rounds != 0).fillna(False))
+
+
+def _rank_range(hltv_rank: pd.Series) -> pd.Series:
+    ranks = hltv_rank.to_numpy(dtype=float, na_value=np.nan)
+    bucket = np.searchsorted(RANK_RANGES, ranks, side="left")
+    in_range = bucket < len(RANK_RANGES)
+    ranges = RANK_RANGES[np.minimum(bucket, len(RANK_RANGES) - 1)]
+    return pd.Series(ranges, dtype="Int16").where(in_range)
+
+
+def team_games_view(
+    team_game: pd.DataFrame, pairs: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Derives the team_games result from the team_game result: one row per team of
+    each game, with the opponent columns (missing if the game has a single team)
+    and the columns the query calculates.
+
+    Args:
+        team_game (pd.DataFrame): Result of the team_game query, sorted by
+                                  start_date.
+        pairs (pd.DataFrame): opponent_pairs of team_game, if already computed.
+
+    Returns:
+        pd.DataFrame: The team_games columns.
+    """
+    if pairs is None:
+        pairs = opponent_pairs(team_game)
+    unmatched = np.setdiff1d(np.arange(len(team_game)), pairs["row"].to_numpy())
+    rows = np.concatenate([pairs["row"].to_numpy(), unmatched])
+    opponent_rows = np.concatenate(
+        [pairs["row_op"].to_numpy(), np.full(len(unmatched), -1)]
+    )
+    order = np.argsort(rows, kind="stable")
+    team, opponent = _join_opponent(
+        team_game,
+        rows[order],
+        opponent_rows[order],
+        [column.replace("match_date", "start_date") for column in FEATURE_COLUMNS],
+        FEATURE_OPPONENT_COLUMNS,
+    )
+    team = team.rename(columns={"start_date": "match_date"})
+
+    score = _nullable_float(team["score"])
+    score_op = _nullable_float(opponent["score_op"])
+    won = score > score_op
+    derived = pd.DataFrame(
+        {
+            "pistols_won": team["won_pistol_ct"] + team["won_pistol_tr"],
+            "rank_range_op": _rank_range(opponent["hltv_rank_op"]),
+            "rank_range": _rank_range(team["hltv_rank"]),
+            "rank_diff": team["hltv_rank"] - opponent["hltv_rank_op"],
+            "player_carried_down": (team["min_rating"] < 0.5)
+            .astype("boolean")
+            .mask(team["min_rating"].isna()),
+            "player_carried": (team["max_rating"] > 1.6)
+            .astype("boolean")
+            .mask(team["max_rating"].isna()),
+            "rounds_lost_on_win": (
+                opponent["score_ct_op"] + opponent["score_tr_op"]
+            ).where(won.fillna(False)),
+            "rounds_won_on_loss": (team["score_ct"] + team["score_tr"]).where(
+                (score < score_op).fillna(False)
+            ),
+            **{
+                f"{column}_per_round": _per_round(team[column], team["total_rounds"])
+                for column in [
+                    "kills",
+                    "deaths",
+                    "first_kills",
+                    "flash_assists",
+                    "clutches",
+                ]
+            },
+            "game_played": 1,
+            "won": won,
+        }
+    )
+    return pd.concat([team, opponent, derived], axis=1)
+
+
+# Function deriving each view of SHARED_VIEWS from its shared result
+VIEW_BUILDERS = {"games_for_elo": games_for_elo_view, "team_games": team_games_view}
+
+
+def derive_views(
+    dfs: Dict[str, pd.DataFrame], names: Iterable[str]
+) -> Dict[str, pd.DataFrame]:
+    """
+    Replaces the shared results with the views derived from them.
+
+    Args:
+        dfs (dict): Downloaded DataFrames by query name.
+        names (Iterable): Results requested from get_dataframes.
+
+    Returns:
+        dict: DataFrame of each requested result.
+    """
+    pairs = {}
+    views = {}
+    for name in names:
+        source = SHARED_VIEWS.get(name)
+        if source is None:
+            views[name] = dfs[name]
+            continue
+        # The self-join is shared by the views of a source
+        if source not in pairs:
+            pairs[source] = opponent_pairs(dfs[source])
+        views[name] = VIEW_BUILDERS[name](dfs[source], pairs[source])
+    return views
@@ -1,22 +1,26 @@
 import json
 import logging
-from typing import List
+import os
+from typing import List, Optional
 
 import pandas as pd
 
 from iron_man_features.config import (
+    ELO_CHECKPOINT_DIR,
     FEATURES_DF_PATH,
     FEATURES_LIST_PATH,
     MATCHES_TO_PREDICT_PATH,
 )
 from iron_man_features.data_manager.downloads import get_dataframes
+from iron_man_features.data_manager.interning import KeyInterner, intern_keys
 from iron_man_features.data_manager.preparation import (
     calculate_features,
     create_elo_crossing_features,
     create_opponent_features,
     keep_only_played_map_columns,
 )
-from iron_man_features.elo_system import EloSystem, calculate_elos
+from iron_man_features.data_manager.schema import to_output_dtypes
+from iron_man_features.elo_system import EloSystem, add_elos, calculate_elo_systems
 from iron_man_features.features import FEATURES
 
 
@@ -33,18 +37,58 @@ GAME_ID_COLUMNS = [
 
 ELO_SYSTEMS_CONFIG = [
     {"base_k_factor": 32, "postfix": ""},
-    # {"base_k_factor": 10, "postfix": "_slow"},
-    # {"base_k_factor": 50, "postfix": "_fast", "boost_diff": True},
+    {"base_k_factor": 10, "postfix": "_slow"},
+    {"base_k_factor": 50, "postfix": "_fast", "boost_diff": True},
 ]
 
 
-def initialize_elo_systems(configs: List[dict]) -> List[EloSystem]:
+def elo_checkpoint_path(elo_system: EloSystem) -> str:
     """
-    Initialize multiple EloSystem instances based on provided configurations.
+    Path of the checkpoint directory of an Elo system.
+    """
+    return os.path.join(ELO_CHECKPOINT_DIR, f"elo{elo_system.postfix}")
+
+
+def load_elo_checkpoint(elo_system: EloSystem, interner: KeyInterner) -> EloSystem:
+    """
+    Load the checkpoint of an Elo system, if there is one saved with the same
+    config, with its rosters interned with the codes of this run.
+    """
+    path = elo_checkpoint_path(elo_system)
+    if not ELO_CHECKPOINT_DIR or not os.path.exists(path):
+        return elo_system
+    checkpoint = EloSystem.load_checkpoint(path)
+    if checkpoint.config != elo_system.config:
+        logging.info(f"Ignoring Elo checkpoint {path} saved with another config")
+        return elo_system
+    checkpoint.rename_rosters(interner.codes("roster", checkpoint.rosters()))
+    return checkpoint
+
+
+def save_elo_checkpoints(elo_systems: List[EloSystem], interner: KeyInterner) -> None:
+    """
+    Save the checkpoint of each Elo system with the original roster hashes, since
+    the interned codes change from one run to the next.
+    """
+    if not ELO_CHECKPOINT_DIR:
+        return
+    roster_names = interner.names("roster")
+    for elo_system in elo_systems:
+        elo_system.save_checkpoint(elo_checkpoint_path(elo_system), roster_names)
+
+
+def initialize_elo_systems(
+    configs: List[dict], interner: Optional[KeyInterner] = None
+) -> List[EloSystem]:
+    """
+    Initialize multiple EloSystem instances based on provided configurations,
+    resuming from their checkpoints when an interner is given.
     """
     elo_systems = []
     for config in configs:
         elo_system = EloSystem(**config)
+        if interner is not None:
+            elo_system = load_elo_checkpoint(elo_system, interner)
         elo_systems.append(elo_system)
     return elo_systems
 
@@ -53,10 +97,12 @@ def calculate_elos_for_systems(
     data: pd.DataFrame, games_for_elo: pd.DataFrame, elo_systems: List[EloSystem]
 ) -> pd.DataFrame:
     """
-    Calculate Elo ratings for multiple Elo systems and add them to the data.
+    Calculate Elo ratings for multiple Elo systems, in a single pass over the games,
+    and add them to the data.
     """
+    calculate_elo_systems(elo_systems, games_for_elo)
     for elo_system in elo_systems:
-        data = calculate_elos(data, games_for_elo, elo_system)
+        data = add_elos(data, elo_system)
     return data
 
 
@@ -97,16 +143,17 @@ def update_feature_df():
     Update the feature DataFrame with all games and save the features and matches to
     predict.
     """
-    dfs = get_dataframes()
+    dfs, interner = intern_keys(get_dataframes())
 
     data = pd.concat([dfs["team_games"], dfs["matches_to_predict"]], ignore_index=True)
     data = data.sort_values(["match_date", "game_hltv_id"])
 
     # Initialize Elo systems
-    elo_systems = initialize_elo_systems(ELO_SYSTEMS_CONFIG)
+    elo_systems = initialize_elo_systems(ELO_SYSTEMS_CONFIG, interner)
 
     # Calculate Elo ratings and add them to the data
     data = calculate_elos_for_systems(data, dfs["games_for_elo"], elo_systems)
+    save_elo_checkpoints(elo_systems, interner)
 
     feature_df = process_features(data, elo_systems[0])
 
@@ -115,6 +162,11 @@ def update_feature_df():
     matches_to_predict = feature_df[is_new_match].drop_duplicates()
     feature_df = feature_df[~is_new_match]
 
+    # Restore the original roster and team keys and CSV-friendly dtypes for the
+    # output files
+    feature_df = to_output_dtypes(interner.restore(feature_df))
+    matches_to_predict = to_output_dtypes(interner.restore(matches_to_predict))
+
     # Save feature DataFrame
     logging.info(
         f"Saving features DataFrame with {len(feature_df)} rows and "
@@ -137,19 +189,20 @@ def calculate_features_for_matches_to_predict():
     """
     Calculate features only for matches to predict and save the results.
     """
-    dfs = get_dataframes()
+    dfs, interner = intern_keys(get_dataframes())
 
     # Use only matches_to_predict
     matches_to_predict = dfs["matches_to_predict"].copy()
     matches_to_predict = matches_to_predict.sort_values(["match_date"])
 
     # Initialize Elo systems
-    elo_systems = initialize_elo_systems(ELO_SYSTEMS_CONFIG)
+    elo_systems = initialize_elo_systems(ELO_SYSTEMS_CONFIG, interner)
 
-    # Calculate Elo ratings using all historical games
+    # Calculate Elo ratings using the historical games after the checkpoints
+    calculate_elo_systems(elo_systems, dfs["games_for_elo"])
     for elo_system in elo_systems:
-        elo_system.calculate_elo(games=dfs["games_for_elo"])
         matches_to_predict = elo_system.add_elos_to_df(matches_to_predict)
+    save_elo_checkpoints(elo_systems, interner)
 
     # Get unique roster hashes involved in matches to predict
     roster_hashes = set(matches_to_predict["roster_hash"].unique())
@@ -167,7 +220,9 @@ def calculate_features_for_matches_to_predict():
     data = data.sort_values(["match_date", "game_hltv_id"])
 
     feature_df = process_features(data, elo_systems[0])
-    matches_to_predict = feature_df[feature_df["won"].isna()]
+    matches_to_predict = to_output_dtypes(
+        interner.restore(feature_df[feature_df["won"].isna()])
+    )
 
     # Save matches to predict
     logging.info(
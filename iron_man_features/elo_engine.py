@@ -0,0 +1,1046 @@
+import math
+import os
+from typing import Dict, Hashable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+DAY_NS = 86_400 * 10**9
+
+# EloSystem settings passed to the kernel, in the order of the config array
+CONFIG_FIELDS = (
+    "base_k_factor",
+    "boost_threshold",
+    "boost_factor",
+    "boost_diff",
+    "mean_elo",
+    "decay_rate",
+)
+BASE_K_FACTOR = 0
+BOOST_THRESHOLD = 1
+BOOST_FACTOR = 2
+BOOST_DIFF = 3
+MEAN_ELO = 4
+DECAY_RATE = 5
+
+
+def _run_elo(
+    team,
+    opponent,
+    map_key,
+    score,
+    score_op,
+    has_score,
+    team_default,
+    opponent_default,
+    times,
+    new_match,
+    config,
+    ratings,
+    has_key,
+    key_seq,
+    exists,
+    roster_seq,
+    counts,
+    counted,
+    count_seq,
+    last_played,
+    played,
+    last_seq,
+    snapshot,
+    snapshot_mask,
+    snapshot_match,
+    records,
+    record_mask,
+    elos,
+    seq,
+):
+    """
+    Runs the EloSystem update rules of several configurations over a sorted stream
+    of games.
+
+    Written so the same code runs in pure Python over lists and, when numba is
+    installed, compiled over NumPy arrays. Rosters and Elo keys are integer codes.
+    Only the ratings depend on the configuration: ratings[c][r][k] holds the
+    rating of roster r for key k in configuration c when has_key[r][k], while the
+    game counts, last played dates and the *_seq arrays, which record insertion
+    order so the EloSystem dicts can be rebuilt with their original ordering, are
+    shared. records[c][2 * g + side] receives the pre-match ratings of each side
+    of game g.
+
+    Pre-match ratings are copied on write: the first time a roster appears in a
+    match its row is copied to snapshot[c][r], so snapshotting costs O(keys) per
+    game instead of a copy of every roster per match, and updates made during the
+    match never leak into its pre-match rows.
+
+    Returns:
+        int: The next insertion sequence number.
+    """
+    n_configs = len(config)
+    n_games = len(team)
+    n_keys = len(record_mask[0]) if n_games > 0 else 0
+
+    match = -1
+    for g in range(n_games):
+        if new_match[g]:
+            match += 1
+
+        for side in range(2):
+            r = team[g] if side == 0 else opponent[g]
+            if snapshot_match[r] != match:
+                snapshot_match[r] = match
+                for k in range(n_keys):
+                    snapshot_mask[r][k] = has_key[r][k]
+                    for c in range(n_configs):
+                        snapshot[c][r][k] = ratings[c][r][k]
+            for k in range(n_keys):
+                if snapshot_mask[r][k]:
+                    record_mask[2 * g + side][k] = True
+                    for c in range(n_configs):
+                        records[c][2 * g + side][k] = snapshot[c][r][k]
+
+        now = times[g]
+        for step in range(2):
+            key = 0 if step == 0 else map_key[g]
+            t = team[g]
+            o = opponent[g]
+
+            # setdefault of the roster and of the key, team first
+            for side in range(2):
+                r = t if side == 0 else o
+                if not exists[r]:
+                    exists[r] = True
+                    roster_seq[r] = seq
+                    seq += 1
+                if not has_key[r][key]:
+                    for c in range(n_configs):
+                        ratings[c][r][key] = (
+                            team_default[c][g] if side == 0 else opponent_default[c][g]
+                        )
+                    has_key[r][key] = True
+                    key_seq[r][key] = seq
+                    seq += 1
+                for c in range(n_configs):
+                    elos[c][side] = ratings[c][r][key]
+
+            # Decay since each roster's last game
+            for side in range(2):
+                r = t if side == 0 else o
+                days_inactive = (now - last_played[r]) // DAY_NS if played[r] else 0
+                for c in range(n_configs):
+                    ratings[c][r][key] *= config[c][DECAY_RATE] ** float(days_inactive)
+                last_played[r] = now
+                if not played[r]:
+                    played[r] = True
+                    last_seq[r] = seq
+                    seq += 1
+
+            if not has_score[g]:
+                continue
+
+            team_score = score[g]
+            opponent_score = score_op[g]
+            if team_score > opponent_score:
+                team_actual, opponent_actual = 1.0, 0.0
+            elif team_score < opponent_score:
+                team_actual, opponent_actual = 0.0, 1.0
+            else:
+                team_actual, opponent_actual = 0.5, 0.5
+            score_difference = abs(team_score - opponent_score)
+
+            # Dynamic K factor: the base K multipliers depend only on the game counts
+            # and the days inactive
+            team_tier = opponent_tier = team_multiplier = opponent_multiplier = 1.0
+            for side in range(2):
+                r = t if side == 0 else o
+                num_games = counts[r]
+                days_inactive = (now - last_played[r]) // DAY_NS
+                if num_games < 5:
+                    tier = 2.0
+                elif num_games < 20:
+                    tier = 1.0
+                else:
+                    tier = 0.5
+                if days_inactive <= 7:
+                    k_multiplier = 1.0
+                elif days_inactive <= 30:
+                    k_multiplier = 1.0 + ((days_inactive - 7) / (30 - 7)) * 0.5
+                else:
+                    k_multiplier = 1.5
+                if side == 0:
+                    team_tier, team_multiplier = tier, k_multiplier
+                else:
+                    opponent_tier, opponent_multiplier = tier, k_multiplier
+
+            for c in range(n_configs):
+                base_k_factor = config[c][BASE_K_FACTOR]
+                team_elo = elos[c][0]
+                opponent_elo = elos[c][1]
+                expected_team = 1 / (1 + 10.0 ** ((opponent_elo - team_elo) / 400))
+                expected_opponent = 1 - expected_team
+
+                boost_multiplier = (
+                    config[c][BOOST_FACTOR]
+                    if score_difference >= config[c][BOOST_THRESHOLD]
+                    else 1.0
+                )
+                boost_diff = (
+                    base_k_factor / 10 * score_difference
+                    if config[c][BOOST_DIFF] > 0
+                    else 0.0
+                )
+                team_k = base_k_factor * team_tier * team_multiplier
+                opponent_k = base_k_factor * opponent_tier * opponent_multiplier
+
+                team_change = team_k * boost_multiplier * (
+                    team_actual - expected_team
+                ) + boost_diff * (1 if team_actual > expected_team else -1)
+                opponent_change = opponent_k * boost_multiplier * (
+                    opponent_actual - expected_opponent
+                ) + boost_diff * (1 if opponent_actual > expected_opponent else -1)
+                ratings[c][t][key] += team_change
+                ratings[c][o][key] += opponent_change
+
+            for side in range(2):
+                r = t if side == 0 else o
+                counts[r] += 1
+                if not counted[r]:
+                    counted[r] = True
+                    count_seq[r] = seq
+                    seq += 1
+
+            # Regress to the mean
+            for side in range(2):
+                r = t if side == 0 else o
+                weight = 5 / (counts[r] + 1)
+                if weight > 1:
+                    weight = 1.0
+                for c in range(n_configs):
+                    rating = ratings[c][r][key]
+                    ratings[c][r][key] = (1 - weight) * rating + weight * config[c][
+                        MEAN_ELO
+                    ]
+
+    return seq
+
+
+_compiled_run_elo = njit(cache=True)(_run_elo) if njit is not None else None
+
+# Relative tolerance of check_elo_equivalence. NumPy's SIMD power, used by the
+# wavefront, can differ from Python's float power in the last bit.
+ELO_RTOL = 1e-9
+
+# Insertion events of a game, in the order the sequential kernel numbers them
+(
+    NEW_TEAM,
+    NEW_TEAM_KEY,
+    NEW_OPPONENT,
+    NEW_OPPONENT_KEY,
+    TEAM_PLAYED,
+    OPPONENT_PLAYED,
+    TEAM_COUNTED,
+    OPPONENT_COUNTED,
+    NEW_TEAM_MAP,
+    NEW_OPPONENT_MAP,
+) = range(10)
+EVENTS_PER_GAME = 10
+# Without numba, wavefronts are used when they hold at least this many games on
+# average; below that the NumPy overhead of each wavefront outweighs the savings
+WAVEFRONT_MIN_GAMES = 16
+
+
+def wavefront_levels(team: np.ndarray, opponent: np.ndarray) -> np.ndarray:
+    """
+    Schedules the games in conflict-free wavefronts.
+
+    A game only depends on the earlier games of its two rosters, so its level is
+    one more than the last level of either roster. Games of the same level share
+    no roster and can be updated together, and the games of each roster keep
+    their order.
+
+    Args:
+        team (np.ndarray): Roster code of the team of each game, in order.
+        opponent (np.ndarray): Roster code of the opponent of each game.
+
+    Returns:
+        np.ndarray: Level of each game, starting at 0.
+    """
+    last_level = {}
+    levels = np.empty(len(team), dtype=np.int64)
+    for g, (t, o) in enumerate(zip(team.tolist(), opponent.tolist())):
+        level = max(last_level.get(t, -1), last_level.get(o, -1)) + 1
+        last_level[t] = last_level[o] = levels[g] = level
+    return levels
+
+
+def _run_elo_wavefront(
+    levels,
+    team,
+    opponent,
+    map_key,
+    score,
+    score_op,
+    has_score,
+    team_default,
+    opponent_default,
+    times,
+    new_match,
+    config,
+    ratings,
+    has_key,
+    key_seq,
+    exists,
+    roster_seq,
+    counts,
+    counted,
+    count_seq,
+    last_played,
+    played,
+    last_seq,
+    snapshot,
+    snapshot_mask,
+    snapshot_match,
+    records,
+    record_mask,
+    elos,
+    seq,
+):
+    """
+    Same result as _run_elo, up to the last bit of NumPy's power (see ELO_RTOL),
+    with each wavefront of games (levels, see wavefront_levels) applied as one
+    vectorized NumPy update instead of game by game.
+
+    The statements of each side of a game are kept separate, so games whose team
+    and opponent share a roster key (e.g. two missing rosters) update it in the
+    same order as the sequential kernel. Insertion sequence numbers are first
+    given per (game, event) and then renumbered densely, which yields exactly the
+    numbers of the sequential pass. Arrays are updated in place.
+
+    Returns:
+        int: The next insertion sequence number.
+    """
+    order = np.argsort(levels, kind="stable")
+    bounds = np.searchsorted(levels[order], np.arange(levels.max(initial=-1) + 2))
+    matches = np.cumsum(new_match) - 1
+    decay_rate = config[:, DECAY_RATE, None]
+    base_k_factor = config[:, BASE_K_FACTOR, None]
+
+    def event(games, slot):
+        return seq + EVENTS_PER_GAME * games + slot
+
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        games = order[start:stop]
+        match = matches[games]
+        now = times[games]
+        sides = (team[games], opponent[games])
+
+        # Pre-match ratings, copied on the first game of each roster in its match
+        for side, rosters in enumerate(sides):
+            fresh = snapshot_match[rosters] != match
+            r = rosters[fresh]
+            snapshot_match[r] = match[fresh]
+            snapshot_mask[r] = has_key[r]
+            snapshot[:, r] = ratings[:, r]
+            rows = 2 * games + side
+            record_mask[rows] = snapshot_mask[rosters]
+            records[:, rows] = np.where(
+                snapshot_mask[rosters], snapshot[:, rosters], np.nan
+            )
+
+        scored = has_score[games]
+        for step in range(2):
+            keys = np.zeros(len(games), dtype=np.int64) if step == 0 else map_key[games]
+            defaults = (team_default[:, games], opponent_default[:, games])
+            new_roster_events = (NEW_TEAM, NEW_OPPONENT)
+            new_key_events = (
+                (NEW_TEAM_KEY, NEW_OPPONENT_KEY)
+                if step == 0
+                else (NEW_TEAM_MAP, NEW_OPPONENT_MAP)
+            )
+
+            # setdefault of the roster and of the key, team first
+            step_elos = []
+            for side, rosters in enumerate(sides):
+                new = ~exists[rosters]
+                exists[rosters[new]] = True
+                roster_seq[rosters[new]] = event(games[new], new_roster_events[side])
+                new = ~has_key[rosters, keys]
+                ratings[:, rosters[new], keys[new]] = defaults[side][:, new]
+                has_key[rosters[new], keys[new]] = True
+                key_seq[rosters[new], keys[new]] = event(
+                    games[new], new_key_events[side]
+                )
+                step_elos.append(ratings[:, rosters, keys])
+
+            # Decay since each roster's last game
+            for side, rosters in enumerate(sides):
+                days_inactive = np.where(
+                    played[rosters], (now - last_played[rosters]) // DAY_NS, 0
+                )
+                ratings[:, rosters, keys] *= np.power(
+                    decay_rate, days_inactive.astype(float)
+                )
+                last_played[rosters] = now
+                new = ~played[rosters]
+                played[rosters[new]] = True
+                last_seq[rosters[new]] = event(
+                    games[new], (TEAM_PLAYED, OPPONENT_PLAYED)[side]
+                )
+
+            g = games[scored]
+            k = keys[scored]
+            t, o = team[g], opponent[g]
+            if not len(g):
+                continue
+
+            team_score, opponent_score = score[g], score_op[g]
+            team_actual = np.select(
+                [team_score > opponent_score, team_score < opponent_score],
+                [1.0, 0.0],
+                0.5,
+            )
+            opponent_actual = 1.0 - team_actual
+            score_difference = np.abs(team_score - opponent_score)
+
+            # Dynamic K factor
+            tiers, multipliers = [], []
+            for r in (t, o):
+                num_games = counts[r]
+                days_inactive = (now[scored] - last_played[r]) // DAY_NS
+                tiers.append(
+                    np.select([num_games < 5, num_games < 20], [2.0, 1.0], 0.5)
+                )
+                multipliers.append(
+                    np.select(
+                        [days_inactive <= 7, days_inactive <= 30],
+                        [1.0, 1.0 + ((days_inactive - 7) / (30 - 7)) * 0.5],
+                        1.5,
+                    )
+                )
+
+            team_elo = step_elos[0][:, scored]
+            opponent_elo = step_elos[1][:, scored]
+            expected_team = 1 / (1 + np.power(10.0, (opponent_elo - team_elo) / 400))
+            expected_opponent = 1 - expected_team
+            boost_multiplier = np.where(
+                score_difference >= config[:, BOOST_THRESHOLD, None],
+                config[:, BOOST_FACTOR, None],
+                1.0,
+            )
+            boost_diff = np.where(
+                config[:, BOOST_DIFF, None] > 0,
+                base_k_factor / 10 * score_difference,
+                0.0,
+            )
+            team_k = base_k_factor * tiers[0] * multipliers[0]
+            opponent_k = base_k_factor * tiers[1] * multipliers[1]
+
+            team_change = team_k * boost_multiplier * (
+                team_actual - expected_team
+            ) + boost_diff * np.where(team_actual > expected_team, 1, -1)
+            opponent_change = opponent_k * boost_multiplier * (
+                opponent_actual - expected_opponent
+            ) + boost_diff * np.where(opponent_actual > expected_opponent, 1, -1)
+            ratings[:, t, k] += team_change
+            ratings[:, o, k] += opponent_change
+
+            for side, r in enumerate((t, o)):
+                counts[r] += 1
+                new = ~counted[r]
+                counted[r[new]] = True
+                count_seq[r[new]] = event(
+                    g[new], (TEAM_COUNTED, OPPONENT_COUNTED)[side]
+                )
+
+            # Regress to the mean
+            for r in (t, o):
+                weight = np.minimum(5 / (counts[r] + 1), 1.0)
+                ratings[:, r, k] = (1 - weight) * ratings[:, r, k] + weight * config[
+                    :, MEAN_ELO, None
+                ]
+
+    # Dense renumbering of the events, in (game, event) order
+    sequences = (
+        (key_seq, has_key),
+        (roster_seq, exists),
+        (count_seq, counted),
+        (last_seq, played),
+    )
+    new_events = [(values >= seq) & flags for values, flags in sequences]
+    events = np.sort(
+        np.concatenate([values[new] for (values, _), new in zip(sequences, new_events)])
+    )
+    for (values, _), new in zip(sequences, new_events):
+        values[new] = seq + np.searchsorted(events, values[new])
+    return seq + len(events)
+
+
+def _intern(values: List[Hashable], index: Dict) -> np.ndarray:
+    # Same key semantics as the EloSystem dicts
+    return np.array([index.setdefault(v, len(index)) for v in values], dtype=np.int64)
+
+
+def _match_starts(match_ids: List, last_match_id) -> np.ndarray:
+    new_match = np.zeros(len(match_ids), dtype=bool)
+    for i, match_id in enumerate(match_ids):
+        if not last_match_id or last_match_id != match_id:
+            new_match[i] = True
+            last_match_id = match_id
+    return new_match
+
+
+def _default_elos(elo_system, ranks: List) -> np.ndarray:
+    cache = {}
+    defaults = np.empty(len(ranks))
+    for i, rank in enumerate(ranks):
+        if rank not in cache:
+            cache[rank] = elo_system.default_elo(rank)
+        defaults[i] = cache[rank]
+    return defaults
+
+
+def _scores(games: pd.DataFrame, column: str) -> Tuple[np.ndarray, np.ndarray]:
+    # None aborts the update; NaN is a regular (tied) score
+    values = games[column].to_numpy(dtype=object)
+    has_score = np.array([v is not None for v in values], dtype=bool)
+    return games[column].to_numpy(dtype=float, na_value=np.nan), has_score
+
+
+def _to_timestamp(value: int, tz) -> pd.Timestamp:
+    if tz is None:
+        return pd.Timestamp(value)
+    return pd.Timestamp(value, tz="UTC").tz_convert(tz)
+
+
+def _grow(array: np.ndarray, shape: Tuple[int, ...], fill) -> np.ndarray:
+    # Writable copy of the array, padded with fill up to shape
+    grown = np.full(shape, fill, dtype=array.dtype)
+    grown[tuple(slice(0, size) for size in array.shape)] = array
+    return grown
+
+
+# Arrays of an EloState: whether they have a key axis, dtype and fill value
+STATE_ARRAYS = {
+    "ratings": (True, np.float64, np.nan),
+    "has_key": (True, bool, False),
+    "key_seq": (True, np.int64, 0),
+    "snapshot": (True, np.float64, np.nan),
+    "snapshot_mask": (True, bool, False),
+    "exists": (False, bool, False),
+    "roster_seq": (False, np.int64, 0),
+    "counts": (False, np.int64, 0),
+    "counted": (False, bool, False),
+    "count_seq": (False, np.int64, 0),
+    "last_played": (False, np.int64, 0),
+    "played": (False, bool, False),
+    "last_seq": (False, np.int64, 0),
+    "in_match": (False, bool, False),
+}
+# Arrays that depend on the configuration of the system
+CONFIG_ARRAYS = ("ratings", "snapshot")
+
+
+class EloState:
+    """
+    Columnar state of an EloSystem.
+
+    Ratings and the pre-match ratings of the last match processed (snapshot) are
+    dense (n_rosters x n_keys) float arrays; has_key and snapshot_mask flag the
+    ratings that exist. Game counts and last played dates (int64 nanoseconds) are
+    arrays indexed by roster. The *_seq arrays keep the insertion order of the
+    EloSystem dicts, so they can be rebuilt identically (see state_to_dicts).
+
+    Args:
+        rosters (list): Roster key of each row.
+        keys (list): Elo key of each column, without the suffix of the system,
+                     e.g. "overall" or "nuke".
+        arrays (dict): One array per STATE_ARRAYS entry.
+        seq (int): Next insertion sequence number.
+        tz: Time zone of the last played dates. Default: None (naive).
+    """
+
+    def __init__(
+        self,
+        rosters: List[Hashable],
+        keys: List[str],
+        arrays: Dict[str, np.ndarray],
+        seq: int,
+        tz=None,
+    ):
+        self.rosters = rosters
+        self.keys = keys
+        self.arrays = arrays
+        self.seq = seq
+        self.tz = tz
+
+    @classmethod
+    def empty(cls) -> "EloState":
+        arrays = {
+            name: np.full((0, 0) if per_key else 0, fill, dtype=dtype)
+            for name, (per_key, dtype, fill) in STATE_ARRAYS.items()
+        }
+        return cls([], [], arrays, 0)
+
+    def grown(self, name: str, n_rosters: int, n_keys: int) -> np.ndarray:
+        """
+        Returns a writable copy of an array with room for new rosters and keys.
+        """
+        per_key, _, fill = STATE_ARRAYS[name]
+        shape = (n_rosters, n_keys) if per_key else (n_rosters,)
+        return _grow(self.arrays[name], shape, fill)
+
+    def renamed(self, mapping: Mapping) -> "EloState":
+        """
+        Returns the state with other roster keys, sharing the arrays. Rosters
+        missing from mapping keep their key.
+        """
+        rosters = [mapping.get(roster, roster) for roster in self.rosters]
+        return EloState(rosters, self.keys, self.arrays, self.seq, self.tz)
+
+    def same_history(self, other: "EloState") -> bool:
+        """
+        Indicates whether two states differ only in the configuration dependent
+        arrays, i.e. whether their systems processed the same games.
+        """
+        return (
+            self.rosters == other.rosters
+            and self.keys == other.keys
+            and self.seq == other.seq
+            and self.tz == other.tz
+            and all(
+                np.array_equal(self.arrays[name], other.arrays[name])
+                for name in STATE_ARRAYS
+                if name not in CONFIG_ARRAYS
+            )
+        )
+
+    def save(self, directory: str) -> dict:
+        """
+        Saves the arrays as .npy files in a directory.
+
+        Args:
+            directory (str): Existing directory.
+
+        Returns:
+            dict: JSON serializable metadata needed by load.
+
+        Raises:
+            ValueError: If the roster keys are not all strings or all integers.
+        """
+        for name in STATE_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), self.arrays[name])
+        missing = np.array([pd.isna(r) for r in self.rosters], dtype=bool)
+        present = [r for r, is_missing in zip(self.rosters, missing) if not is_missing]
+        if all(isinstance(r, str) for r in present):
+            rosters = np.array(["" if m else r for r, m in zip(self.rosters, missing)])
+        elif all(isinstance(r, (int, np.integer)) for r in present):
+            rosters = np.array(
+                [0 if m else r for r, m in zip(self.rosters, missing)], dtype=np.int64
+            )
+        else:
+            raise ValueError("Roster keys must be all strings or all integers")
+        np.save(os.path.join(directory, "rosters.npy"), rosters)
+        np.save(os.path.join(directory, "rosters_missing.npy"), missing)
+        return {
+            "keys": self.keys,
+            "seq": self.seq,
+            "tz": None if self.tz is None else str(self.tz),
+        }
+
+    @classmethod
+    def load(cls, directory: str, meta: dict, mmap_mode: Optional[str] = "r"):
+        """
+        Loads a state saved with save. The arrays are memory-mapped, so loading
+        is almost instant; the engine copies them when it needs to write.
+
+        Args:
+            directory (str): Directory given to save.
+            meta (dict): Metadata returned by save.
+            mmap_mode (str): Mode passed to np.load. Default: "r".
+
+        Returns:
+            EloState: The state.
+        """
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in STATE_ARRAYS
+        }
+        rosters = np.load(os.path.join(directory, "rosters.npy")).tolist()
+        missing = np.load(os.path.join(directory, "rosters_missing.npy"))
+        rosters = [None if m else r for r, m in zip(rosters, missing)]
+        return cls(rosters, meta["keys"], arrays, meta["seq"], meta["tz"])
+
+
+def state_from_dicts(
+    ratings: Dict,
+    team_game_counts: Dict,
+    last_played: Dict,
+    match_ratings: Dict,
+    suffix: str,
+) -> EloState:
+    """
+    Builds the EloState of the dicts of an EloSystem.
+
+    Args:
+        ratings (dict): {roster: {elo key: rating}}.
+        team_game_counts (dict): {roster: number of games}.
+        last_played (dict): {roster: pd.Timestamp}.
+        match_ratings (dict): {roster: {elo key: pre-match rating}} of the last
+                              match processed.
+        suffix (str): Suffix of the Elo keys of the system, e.g. "_elo_slow".
+
+    Returns:
+        EloState: The columnar state.
+    """
+    size = len(suffix)
+    keys, rosters = {}, {}
+    for state in (ratings, match_ratings):
+        for roster_ratings in state.values():
+            for key in roster_ratings:
+                keys.setdefault(key[:-size], len(keys))
+    for state in (ratings, team_game_counts, last_played, match_ratings):
+        for roster in state:
+            rosters.setdefault(roster, len(rosters))
+
+    empty = EloState.empty()
+    arrays = {name: empty.grown(name, len(rosters), len(keys)) for name in STATE_ARRAYS}
+    seq = 0
+    for roster, roster_ratings in ratings.items():
+        r = rosters[roster]
+        arrays["exists"][r], arrays["roster_seq"][r] = True, seq
+        seq += 1
+        for key, value in roster_ratings.items():
+            k = keys[key[:-size]]
+            arrays["ratings"][r, k] = value
+            arrays["has_key"][r, k], arrays["key_seq"][r, k] = True, seq
+            seq += 1
+    for roster, count in team_game_counts.items():
+        r = rosters[roster]
+        arrays["counts"][r], arrays["counted"][r] = count, True
+        arrays["count_seq"][r] = seq
+        seq += 1
+    tz = None
+    for roster, timestamp in last_played.items():
+        r = rosters[roster]
+        timestamp = pd.Timestamp(timestamp)
+        tz = timestamp.tz
+        arrays["last_played"][r] = timestamp.as_unit("ns").value
+        arrays["played"][r], arrays["last_seq"][r] = True, seq
+        seq += 1
+    for roster, roster_ratings in match_ratings.items():
+        r = rosters[roster]
+        arrays["in_match"][r] = True
+        for key, value in roster_ratings.items():
+            k = keys[key[:-size]]
+            arrays["snapshot"][r, k], arrays["snapshot_mask"][r, k] = value, True
+    return EloState(list(rosters), list(keys), arrays, seq, tz)
+
+
+def _ordered_ratings(
+    values: np.ndarray, mask: np.ndarray, key_seq: np.ndarray, keys: List[str]
+) -> Dict[str, float]:
+    present = np.flatnonzero(mask)
+    return {
+        keys[k]: float(values[k])
+        for k in present[np.argsort(key_seq[present], kind="stable")]
+    }
+
+
+def state_to_dicts(state: EloState, suffix: str) -> Tuple[Dict, Dict, Dict, Dict]:
+    """
+    Rebuilds the dicts of an EloSystem, with their original ordering, from its
+    EloState.
+
+    Args:
+        state (EloState): The columnar state.
+        suffix (str): Suffix of the Elo keys of the system, e.g. "_elo_slow".
+
+    Returns:
+        tuple: ratings, team_game_counts, last_played and match_ratings.
+    """
+    arrays, rosters = state.arrays, state.rosters
+    keys = [f"{key}{suffix}" for key in state.keys]
+
+    exists = np.flatnonzero(arrays["exists"])
+    ratings = {
+        rosters[r]: _ordered_ratings(
+            arrays["ratings"][r], arrays["has_key"][r], arrays["key_seq"][r], keys
+        )
+        for r in exists[np.argsort(arrays["roster_seq"][exists], kind="stable")]
+    }
+
+    counted = np.flatnonzero(arrays["counted"])
+    team_game_counts = {
+        rosters[r]: int(arrays["counts"][r])
+        for r in counted[np.argsort(arrays["count_seq"][counted], kind="stable")]
+    }
+
+    played = np.flatnonzero(arrays["played"])
+    last_played = {
+        rosters[r]: _to_timestamp(int(arrays["last_played"][r]), state.tz)
+        for r in played[np.argsort(arrays["last_seq"][played], kind="stable")]
+    }
+
+    match_ratings = {
+        rosters[r]: _ordered_ratings(
+            arrays["snapshot"][r],
+            arrays["snapshot_mask"][r],
+            arrays["key_seq"][r],
+            keys,
+        )
+        for r in np.flatnonzero(arrays["in_match"])
+    }
+    return ratings, team_game_counts, last_played, match_ratings
+
+
+def can_share_pass(elo_systems: List) -> bool:
+    """
+    Indicates whether several EloSystems can be calculated in a single pass.
+
+    The systems share the game counts, last played dates and insertion order of
+    the engine, so they must have processed the same games: same watermark and
+    same EloState apart from the ratings (see EloState.same_history). New systems
+    always can.
+
+    Args:
+        elo_systems (list): EloSystems to calculate together.
+
+    Returns:
+        bool: True if calculate_elo_arrays accepts them together.
+    """
+    first = elo_systems[0]
+    return all(
+        elo_system.watermark == first.watermark
+        and elo_system.last_match_id == first.last_match_id
+        and elo_system.state.same_history(first.state)
+        for elo_system in elo_systems[1:]
+    )
+
+
+def calculate_elo_arrays(elo_systems: List, games: pd.DataFrame) -> List[pd.DataFrame]:
+    """
+    Array-backed equivalent of EloSystem.calculate_elo for one or more systems.
+
+    The needed columns are extracted once into arrays (integer roster and key
+    codes, scores, default Elos and timestamps) and the update rules of every
+    system run in a single loop over the games, compiled with numba when it is
+    installed. Without numba, busy streams are applied in vectorized wavefronts of
+    games that share no roster (see _run_elo_wavefront). Ratings are held in an
+    (n_systems x n_rosters x n_keys) array, so each extra system only adds its own
+    arithmetic to the pass. The EloState of each system, including the pre-match
+    ratings of a match left unfinished by a previous call, is the starting point
+    and is replaced by the new one at the end, without going through the ratings
+    dicts.
+
+    Args:
+        elo_systems (list): Systems whose rules and state are used. They must be
+                            able to share a pass (see can_share_pass).
+        games (pd.DataFrame): Games with the games_for_elo columns, in processing
+                              order.
+
+    Returns:
+        list: The elo_table of each system, the one built by iterrows (up to
+              ELO_RTOL without numba).
+    """
+    states = [elo_system.state for elo_system in elo_systems]
+    first = states[0]
+    n_games = len(games)
+
+    # Elo keys, without the suffix of each system: the existing ones, overall and
+    # the maps
+    keys = {key: k for k, key in enumerate(first.keys)}
+    keys.setdefault("overall", len(keys))
+    map_key = _intern([played_map.lower() for played_map in games["played_map"]], keys)
+
+    # Rosters: the existing ones, then in order of appearance
+    rosters = {roster: r for r, roster in enumerate(first.rosters)}
+    team_values = games["roster_hash"].to_numpy(dtype=object)
+    opponent_values = games["roster_hash_op"].to_numpy(dtype=object)
+    interleaved = np.empty(2 * n_games, dtype=object)
+    interleaved[0::2] = team_values
+    interleaved[1::2] = opponent_values
+    codes = _intern(interleaved.tolist(), rosters)
+    team, opponent = codes[0::2], codes[1::2]
+
+    n_configs, n_rosters, n_keys = len(elo_systems), len(rosters), len(keys)
+    state_arrays = {
+        name: (
+            np.stack([state.grown(name, n_rosters, n_keys) for state in states])
+            if name in CONFIG_ARRAYS
+            else first.grown(name, n_rosters, n_keys)
+        )
+        for name in STATE_ARRAYS
+    }
+    in_match = state_arrays.pop("in_match")
+
+    score, has_score = _scores(games, "score")
+    score_op, has_score_op = _scores(games, "score_op")
+    start_dates = pd.DatetimeIndex(games["start_date"])
+    team_ranks = games["hltv_rank"].to_numpy(dtype=object).tolist()
+    opponent_ranks = games["hltv_rank_op"].to_numpy(dtype=object).tolist()
+    arrays = dict(
+        team=team,
+        opponent=opponent,
+        map_key=map_key,
+        score=score,
+        score_op=score_op,
+        has_score=has_score & has_score_op,
+        team_default=np.array(
+            [_default_elos(elo_system, team_ranks) for elo_system in elo_systems]
+        ).reshape(n_configs, n_games),
+        opponent_default=np.array(
+            [_default_elos(elo_system, opponent_ranks) for elo_system in elo_systems]
+        ).reshape(n_configs, n_games),
+        times=start_dates.as_unit("ns").asi8,
+        new_match=_match_starts(
+            games["match_id"].tolist(), elo_systems[0].last_match_id
+        ),
+        config=np.array(
+            [
+                [float(getattr(elo_system, field)) for field in CONFIG_FIELDS]
+                for elo_system in elo_systems
+            ]
+        ),
+        **state_arrays,
+        # Rosters of the last match processed keep their pre-match ratings if it
+        # continues here
+        snapshot_match=np.where(in_match, -1, -2).astype(np.int64),
+        records=np.full((n_configs, 2 * n_games, n_keys), np.nan),
+        record_mask=np.zeros((2 * n_games, n_keys), dtype=bool),
+        elos=np.zeros((n_configs, 2)),
+    )
+
+    if _compiled_run_elo is not None:
+        seq = _compiled_run_elo(**arrays, seq=first.seq)
+    else:
+        levels = wavefront_levels(team, opponent)
+        if n_games >= WAVEFRONT_MIN_GAMES * (levels.max(initial=-1) + 1):
+            seq = _run_elo_wavefront(levels, **arrays, seq=first.seq)
+        else:
+            lists = {name: array.tolist() for name, array in arrays.items()}
+            seq = _run_elo(**lists, seq=first.seq)
+            arrays = {
+                name: np.array(lists[name], dtype=a.dtype).reshape(a.shape)
+                for name, a in arrays.items()
+            }
+
+    if n_games:
+        in_match = arrays["snapshot_match"] == arrays["new_match"].sum() - 1
+    tz = start_dates.tz if n_games else first.tz
+    rosters, keys = list(rosters), list(keys)
+    elo_tables = []
+    for c, elo_system in enumerate(elo_systems):
+        new_arrays = {
+            name: arrays[name][c] if name in CONFIG_ARRAYS else arrays[name]
+            for name in STATE_ARRAYS
+            if name != "in_match"
+        }
+        elo_system.state = EloState(
+            rosters, keys, {**new_arrays, "in_match": in_match}, seq, tz
+        )
+        if n_games:
+            elo_system.last_match_id = games["match_id"].iloc[-1]
+        system_keys = [f"{key}{elo_system.key_suffix}" for key in keys]
+        elo_tables.append(_elo_table(games, arrays, c, system_keys))
+    return elo_tables
+
+
+def _elo_table(games: pd.DataFrame, arrays: dict, c: int, keys: List) -> pd.DataFrame:
+    if len(games) == 0:
+        return pd.DataFrame.from_records([])
+
+    records, record_mask = arrays["records"][c], arrays["record_mask"]
+    rows = np.repeat(np.arange(len(games)), 2)
+    sides = np.tile([0, 1], len(games))
+
+    # Columns in order of first appearance, as DataFrame.from_records would do
+    used = np.flatnonzero(record_mask.any(axis=0))
+    first_record = record_mask[:, used].argmax(axis=0)
+    first_roster = np.where(
+        sides[first_record] == 0,
+        arrays["team"][rows[first_record]],
+        arrays["opponent"][rows[first_record]],
+    )
+    key_order = arrays["key_seq"][first_roster, used]
+    used = used[np.lexsort((key_order, first_record))]
+
+    elo_table = pd.DataFrame(
+        {
+            "game_id": games["game_id"].to_numpy()[rows],
+            "roster_hash": np.where(
+                sides == 0,
+                games["roster_hash"].to_numpy(dtype=object)[rows],
+                games["roster_hash_op"].to_numpy(dtype=object)[rows],
+            ),
+        }
+    )
+    values = np.where(record_mask[:, used], records[:, used], np.nan)
+    return pd.concat(
+        [elo_table, pd.DataFrame(values, columns=[keys[k] for k in used])], axis=1
+    )
+
+
+def check_elo_equivalence(expected, result) -> None:
+    """
+    Verifies that two EloSystems processed the same games identically, with the
+    ratings equal up to ELO_RTOL.
+
+    Args:
+        expected (EloSystem): Reference system (iterrows engine).
+        result (EloSystem): System to validate.
+
+    Raises:
+        ValueError: If the elo_tables, ratings, game counts, last played dates or
+                    pre-match ratings of the last match differ.
+    """
+    mismatched = []
+    try:
+        pd.testing.assert_frame_equal(
+            expected.elo_table,
+            result.elo_table,
+            check_dtype=False,
+            check_exact=False,
+            rtol=ELO_RTOL,
+        )
+    except AssertionError:
+        mismatched.append("elo_table")
+    if not _same_nested(expected.ratings, result.ratings):
+        mismatched.append("ratings")
+    if expected.team_game_counts != result.team_game_counts:
+        mismatched.append("team_game_counts")
+    if expected.last_played != result.last_played:
+        mismatched.append("last_played")
+    if (
+        expected.last_match_id != result.last_match_id
+        or set(expected.match_ratings) != set(result.match_ratings)
+        or not _same_nested(
+            expected.match_ratings,
+            {roster: result.match_ratings[roster] for roster in expected.match_ratings},
+        )
+    ):
+        mismatched.append("match_ratings")
+    if mismatched:
+        raise ValueError(f"Elo engines diverge on: {mismatched}")
+
+
+def _same_nested(expected: dict, result: dict) -> bool:
+    if list(expected) != list(result):
+        return False
+    for roster, ratings in expected.items():
+        if list(ratings) != list(result[roster]):
+            return False
+        for key, value in ratings.items():
+            other = result[roster][key]
+            if not (
+                math.isclose(value, other, rel_tol=ELO_RTOL)
+                or (pd.isna(value) and pd.isna(other))
+            ):
+                return False
+    return True
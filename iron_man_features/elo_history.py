@@ -0,0 +1,134 @@
+from typing import Hashable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class RatingHistory:
+    """
+    Time-sorted rating trajectory of each roster, for point-in-time lookups.
+
+    A roster's ratings only change when it plays, so its ratings just before a
+    date are the pre-match ratings of its first game at or after that date, or its
+    current ratings if it has not played since. The pre-match rows of the
+    elo_table are stored sorted by (roster, time) in compact arrays, with the rows
+    of roster r in offsets[r]:offsets[r + 1], and lookups are a binary search.
+
+    Args:
+        rosters (pd.Index): Roster key of each code.
+        offsets (np.ndarray): Start of the rows of each roster, plus the total.
+        times (np.ndarray): Game start of each row, int64 nanoseconds.
+        values (np.ndarray): (n_rows x n_keys) pre-match ratings.
+        current (np.ndarray): (n_rosters x n_keys) current ratings.
+        keys (list): Elo key of each column.
+
+    Usage:
+    >>> history = RatingHistory.build(elo_table, elo_times, ratings_frame)
+    >>> history.as_of(["1-2-3-4-5"], [pd.Timestamp("2024-05-01")])["nuke_elo"]
+    """
+
+    def __init__(
+        self,
+        rosters: pd.Index,
+        offsets: np.ndarray,
+        times: np.ndarray,
+        values: np.ndarray,
+        current: np.ndarray,
+        keys: List[str],
+    ):
+        self.rosters = rosters
+        self.offsets = offsets
+        self.times = times
+        self.values = values
+        self.current = current
+        self.keys = keys
+
+    @classmethod
+    def build(
+        cls,
+        elo_table: Optional[pd.DataFrame],
+        times: np.ndarray,
+        current_ratings: pd.DataFrame,
+    ) -> "RatingHistory":
+        """
+        Builds the history of an EloSystem.
+
+        Args:
+            elo_table (pd.DataFrame): Pre-match ratings of both rosters of every
+                                      game processed.
+            times (np.ndarray): Start date (int64 nanoseconds) of each elo_table
+                                row.
+            current_ratings (pd.DataFrame): Current ratings, indexed by roster
+                                            (see EloSystem.ratings_frame).
+
+        Returns:
+            RatingHistory: The history.
+        """
+        if elo_table is None or elo_table.empty:
+            elo_table = pd.DataFrame(columns=["game_id", "roster_hash"])
+        keys = [c for c in elo_table.columns if c not in ("game_id", "roster_hash")]
+        keys += [c for c in current_ratings.columns if c not in keys]
+
+        codes, rosters = pd.factorize(
+            pd.Index(elo_table["roster_hash"], dtype=object).append(
+                pd.Index(current_ratings.index, dtype=object)
+            )
+        )
+        row_codes = codes[: len(elo_table)]
+        order = np.lexsort((times, row_codes))
+        order = order[row_codes[order] >= 0]
+        offsets = np.searchsorted(row_codes[order], np.arange(len(rosters) + 1))
+
+        values = elo_table.reindex(columns=keys).to_numpy(dtype=float)[order]
+        current = current_ratings.reindex(index=rosters, columns=keys)
+        return cls(
+            rosters,
+            offsets,
+            np.asarray(times, dtype=np.int64)[order],
+            values,
+            current.to_numpy(dtype=float),
+            keys,
+        )
+
+    def as_of(
+        self,
+        rosters: Sequence[Hashable],
+        timestamps: Sequence,
+        keys: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Ratings of each roster just before each date, i.e. the pre-game ratings of
+        a game it would play at that date.
+
+        Args:
+            rosters (list): Roster of each lookup.
+            timestamps (list): Date of each lookup, in the time zone of the games'
+                               start_date.
+            keys (list): Elo keys to return. Default: all.
+
+        Returns:
+            pd.DataFrame: One row per lookup, in order, and one column per key.
+                          Rosters without a rating at that date are NaN.
+        """
+        codes = self.rosters.get_indexer(pd.Index(rosters, dtype=object))
+        query_times = pd.DatetimeIndex(timestamps).as_unit("ns").asi8
+        if len(codes) != len(query_times):
+            raise ValueError("rosters and timestamps must have the same length")
+
+        # Binary search of (roster, time) over the rows sorted by (roster, time),
+        # with times replaced by their ranks so both fit in one int64 key
+        uniques = np.unique(np.concatenate([self.times, query_times]))
+        row_codes = np.repeat(np.arange(len(self.rosters)), np.diff(self.offsets))
+        row_keys = row_codes * len(uniques) + np.searchsorted(uniques, self.times)
+        query_keys = codes * len(uniques) + np.searchsorted(uniques, query_times)
+        positions = np.searchsorted(row_keys, query_keys, side="left")
+
+        known = codes >= 0
+        in_history = known & (positions < self.offsets[np.maximum(codes, 0) + 1])
+        result = np.full((len(codes), len(self.keys)), np.nan)
+        result[in_history] = self.values[positions[in_history]]
+        is_current = known & ~in_history
+        result[is_current] = self.current[codes[is_current]]
+
+        result = pd.DataFrame(result, columns=self.keys)
+        return result if keys is None else result[keys]
@@ -0,0 +1,298 @@
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from iron_man_features.config import ELO_SWEEP_PATH, ELO_SWEEP_WORKERS
+from iron_man_features.elo_system import EloSystem, calculate_elo_systems
+
+
+# Default search space of run_elo_sweep
+SWEEP_GRID = {
+    "base_k_factor": [10, 20, 32, 50],
+    "decay_rate": [0.99, 0.995, 0.999, 1.0],
+    "boost_diff": [False, True],
+}
+
+SWEEP_METRICS = ("log_loss", "brier", "accuracy")
+
+# Probabilities are clipped to [EPSILON, 1 - EPSILON] for the log-loss
+EPSILON = 1e-15
+
+
+def parameter_grid(grid: Dict[str, Sequence]) -> List[dict]:
+    """
+    Lists every combination of the values of a grid of EloSystem parameters.
+
+    Args:
+        grid (dict): Candidate values of each EloSystem.__init__ parameter.
+
+    Returns:
+        list: One dict of parameters per candidate.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def random_parameters(
+    space: Dict[str, Sequence], n_candidates: int, seed: int = 0
+) -> List[dict]:
+    """
+    Draws random candidates from a space of EloSystem parameters.
+
+    Args:
+        space (dict): For each EloSystem.__init__ parameter, either a list of
+                      values, drawn uniformly, or a (low, high) tuple, drawn
+                      uniformly from the interval (integers if both bounds are).
+        n_candidates (int): Number of candidates.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        list: One dict of parameters per candidate.
+    """
+    rng = np.random.default_rng(seed)
+    candidates = []
+    for _ in range(n_candidates):
+        candidate = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    candidate[name] = int(rng.integers(low, high, endpoint=True))
+                else:
+                    candidate[name] = float(rng.uniform(low, high))
+            else:
+                candidate[name] = values[rng.integers(len(values))]
+        candidates.append(candidate)
+    return candidates
+
+
+def time_folds(
+    games: pd.DataFrame, n_folds: int = 5, burn_in: float = 0.2
+) -> List[Tuple[pd.Timestamp, Optional[pd.Timestamp]]]:
+    """
+    Splits the games after a burn-in period into consecutive time folds with about
+    the same number of games.
+
+    The burn-in games are replayed but not scored, so the ratings have time to
+    move away from their initial values.
+
+    Args:
+        games (pd.DataFrame): Games with the games_for_elo columns.
+        n_folds (int): Number of folds.
+        burn_in (float): Fraction of the games, the oldest ones, left out of the
+                         folds.
+
+    Returns:
+        list: (start, end) dates of each fold. The end is exclusive and None for
+              the last fold.
+    """
+    dates = np.sort(games["start_date"].to_numpy())
+    first = int(len(dates) * burn_in)
+    bounds = np.linspace(first, len(dates), n_folds + 1).astype(int)
+    starts = [pd.Timestamp(dates[i]) for i in bounds[:-1] if i < len(dates)]
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def pre_game_expectations(
+    elo_system: EloSystem, games: pd.DataFrame, key: str = "overall"
+) -> pd.DataFrame:
+    """
+    Expected score of the team of each game according to the pre-match ratings of
+    a calculated EloSystem, along with the actual outcome.
+
+    Args:
+        elo_system (EloSystem): System that processed exactly these games from
+                                scratch, so its elo_table has two rows per game
+                                in processing order.
+        games (pd.DataFrame): The games, in processing order.
+        key (str): "overall" for the overall Elo or "map" for the Elo of the
+                   played map.
+
+    Returns:
+        pd.DataFrame: start_date, expected and actual (1, 0 or 0.5) of every game
+                      with both ratings and both scores.
+    """
+    suffix = f"_elo{elo_system.postfix}"
+    if key == "map":
+        columns = [f"{m.lower()}{suffix}" for m in games["played_map"]]
+    else:
+        columns = [f"{key}{suffix}"] * len(games)
+    elo_table = elo_system.elo_table.reindex(columns=sorted(set(columns)))
+    positions = elo_table.columns.get_indexer(columns)
+    values = elo_table.to_numpy(dtype=float)
+    team_elo = values[np.arange(0, 2 * len(games), 2), positions]
+    opponent_elo = values[np.arange(1, 2 * len(games), 2), positions]
+
+    score = games["score"].to_numpy(dtype=float, na_value=np.nan)
+    score_op = games["score_op"].to_numpy(dtype=float, na_value=np.nan)
+    expectations = pd.DataFrame(
+        {
+            "start_date": games["start_date"].to_numpy(),
+            "expected": elo_system.calc_expected_score(team_elo, opponent_elo),
+            "actual": np.select([score > score_op, score < score_op], [1.0, 0.0], 0.5),
+        }
+    )
+    is_scored = ~(
+        np.isnan(team_elo)
+        | np.isnan(opponent_elo)
+        | np.isnan(score)
+        | np.isnan(score_op)
+    )
+    return expectations[is_scored]
+
+
+def score_expectations(expected: np.ndarray, actual: np.ndarray) -> Dict[str, float]:
+    """
+    Scores expected outcomes against actual ones.
+
+    Args:
+        expected (np.ndarray): Expected scores of the teams.
+        actual (np.ndarray): Actual outcomes (1, 0 or 0.5 for a draw).
+
+    Returns:
+        dict: log_loss, brier and accuracy. Accuracy ignores draws.
+    """
+    probability = np.clip(expected, EPSILON, 1 - EPSILON)
+    decided = actual != 0.5
+    return {
+        "log_loss": float(
+            -np.mean(
+                actual * np.log(probability) + (1 - actual) * np.log(1 - probability)
+            )
+        ),
+        "brier": float(np.mean((expected - actual) ** 2)),
+        "accuracy": float(np.mean((expected[decided] > 0.5) == (actual[decided] == 1))),
+    }
+
+
+def _evaluate_batch(
+    candidates: List[dict],
+    games: pd.DataFrame,
+    folds: List[Tuple[pd.Timestamp, Optional[pd.Timestamp]]],
+    key: str,
+) -> List[dict]:
+    elo_systems = [EloSystem(**candidate) for candidate in candidates]
+    calculate_elo_systems(elo_systems, games)
+
+    rows = []
+    for candidate, elo_system in zip(candidates, elo_systems):
+        expectations = pre_game_expectations(elo_system, games, key=key)
+        fold_scores = []
+        for start, end in folds:
+            in_fold = expectations["start_date"] >= start
+            if end is not None:
+                in_fold &= expectations["start_date"] < end
+            fold = expectations[in_fold]
+            fold_scores.append(
+                score_expectations(
+                    fold["expected"].to_numpy(), fold["actual"].to_numpy()
+                )
+            )
+        row = dict(candidate)
+        for metric in SWEEP_METRICS:
+            row[metric] = float(np.mean([scores[metric] for scores in fold_scores]))
+        row["log_loss_std"] = float(
+            np.std([scores["log_loss"] for scores in fold_scores])
+        )
+        rows.append(row)
+    return rows
+
+
+def sweep_elo(
+    games: pd.DataFrame,
+    candidates: List[dict],
+    n_folds: int = 5,
+    burn_in: float = 0.2,
+    key: str = "overall",
+    workers: int = ELO_SWEEP_WORKERS,
+    batch_size: int = 8,
+) -> pd.DataFrame:
+    """
+    Replays the games for each candidate EloSystem and ranks the candidates by how
+    well their pre-match ratings predict the outcomes.
+
+    Candidates are evaluated in batches of batch_size systems, each batch in a
+    single pass over the games (see calculate_elo_systems), and the batches run in
+    a ProcessPoolExecutor. Every candidate is scored with the log-loss, Brier
+    score and accuracy of calc_expected_score on each time fold, averaged over the
+    folds.
+
+    Args:
+        games (pd.DataFrame): Games with the games_for_elo columns.
+        candidates (list): EloSystem.__init__ parameters of each candidate (see
+                           parameter_grid and random_parameters).
+        n_folds (int): Number of time folds (see time_folds).
+        burn_in (float): Fraction of the oldest games that are not scored.
+        key (str): Elo used for the predictions, "overall" or "map".
+        workers (int): Number of processes.
+        batch_size (int): Candidates per pass over the games. Bounds the memory of
+                          each process.
+
+    Returns:
+        pd.DataFrame: One row per candidate with its parameters, the mean of each
+                      metric, the standard deviation of the log-loss over the
+                      folds and its rank, best (lowest log-loss) first.
+    """
+    games = games.sort_values(["start_date", "game_id"])
+    folds = time_folds(games, n_folds=n_folds, burn_in=burn_in)
+    batches = []
+    for start in range(0, len(candidates), batch_size):
+        stop = start + batch_size
+        batches.append(candidates[start:stop])
+    logging.info(
+        f"Sweeping {len(candidates)} Elo candidates in {len(batches)} batches over "
+        f"{len(games)} games and {len(folds)} folds with {workers} workers"
+    )
+
+    rows = []
+    if workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            rows.extend(_evaluate_batch(batch, games, folds, key))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_evaluate_batch, batch, games, folds, key)
+                for batch in batches
+            ]
+            for future in futures:
+                rows.extend(future.result())
+
+    table = pd.DataFrame(rows).sort_values(
+        ["log_loss", "brier"], kind="stable", ignore_index=True
+    )
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table
+
+
+def run_elo_sweep(grid: Dict[str, Sequence] = SWEEP_GRID) -> pd.DataFrame:
+    """
+    Runs a grid sweep over the downloaded games_for_elo and saves the ranked table.
+    """
+    # Imported here so the sweep functions can run without a database connection
+    from iron_man_features.data_manager.downloads import get_dataframes
+
+    games = get_dataframes(["games_for_elo"])["games_for_elo"]
+    table = sweep_elo(games, parameter_grid(grid))
+
+    logging.info(f"Saving Elo sweep of {len(table)} candidates to {ELO_SWEEP_PATH}")
+    table.to_csv(ELO_SWEEP_PATH, index=False)
+    logging.info(f"Best Elo candidates:\n{table.head().to_string(index=False)}")
+    return table
+
+
+if __name__ == "__main__":
+    import importlib
+
+    importlib.reload(logging)
+
+    logging.basicConfig(
+        format="%(asctime)s %(filename)s %(levelname)s: %(message)s",
+        level=logging.INFO,
+        datefmt="%H:%M:%S",
+        encoding="utf-8",
+    )
+    run_elo_sweep()
@@ -1,11 +1,71 @@
+import copy
 import json
 import logging
-from typing import Tuple
+import os
+import shutil
+from typing import Hashable, List, Mapping, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 
+from iron_man_features.config import ELO_ENGINE
+from iron_man_features.elo_engine import (
+    EloState,
+    calculate_elo_arrays,
+    can_share_pass,
+    check_elo_equivalence,
+    state_from_dicts,
+    state_to_dicts,
+)
+from iron_man_features.elo_history import RatingHistory
+
+
+ELO_ENGINES = ("array", "iterrows", "check")
+
+# Arguments of EloSystem.__init__, saved with checkpoints
+ELO_CONFIG_FIELDS = (
+    "base_k_factor",
+    "boost_threshold",
+    "boost_factor",
+    "postfix",
+    "first_from_rank",
+    "boost_diff",
+    "mean_elo",
+    "decay_rate",
+)
+CHECKPOINT_VERSION = 3
+
+
+class _DictState:
+    """
+    EloSystem attribute backed by the dict form of its state.
+
+    The state of an EloSystem is held either as dicts, used by the iterrows
+    engine, or as an EloState, used by the array engine. Accessing a dict
+    attribute rebuilds the dicts from the EloState and makes them the current
+    form, since the caller may modify them.
+    """
+
+    def __set_name__(self, owner, name):
+        self.attribute = f"_{name}"
+
+    def __get__(self, elo_system, owner=None):
+        if elo_system is None:
+            return self
+        elo_system._use_dicts()
+        return getattr(elo_system, self.attribute)
+
+    def __set__(self, elo_system, value):
+        elo_system._use_dicts()
+        setattr(elo_system, self.attribute, value)
+
 
 class EloSystem:
+    ratings = _DictState()
+    team_game_counts = _DictState()
+    last_played = _DictState()
+    match_ratings = _DictState()
+
     def __init__(
         self,
         base_k_factor: int = 32,
@@ -32,6 +92,7 @@ class EloSystem:
             mean_elo (float): The mean Elo rating for regression.
             decay_rate (float): The rate at which Elo ratings decay over time.
         """
+        self._state = None
         self.base_k_factor = base_k_factor
         self.boost_threshold = boost_threshold
         self.boost_factor = boost_factor
@@ -43,6 +104,15 @@ class EloSystem:
         self.decay_rate = decay_rate
         self.team_game_counts = {}
         self.last_played = {}
+        self.elo_table = None
+        # Start date (int64 nanoseconds) of each elo_table row
+        self.elo_times = np.empty(0, dtype=np.int64)
+        self._history = None
+        # Last processed (start_date, game_id) and the pre-match ratings of the
+        # last processed match, whose remaining games may come in a later call
+        self.watermark = None
+        self.last_match_id = None
+        self.match_ratings = {}
         logging.info(
             "Elo System initiated\n"
             f"base_k_factor: {base_k_factor}\n"
@@ -55,6 +125,62 @@ class EloSystem:
             f"decay_rate: {decay_rate}"
         )
 
+    @property
+    def config(self) -> dict:
+        """
+        The arguments this system was initialized with.
+        """
+        return {field: getattr(self, field) for field in ELO_CONFIG_FIELDS}
+
+    @property
+    def key_suffix(self) -> str:
+        """
+        Suffix of all Elo keys of this system, e.g. "_elo_slow".
+        """
+        return f"_elo{self.postfix}"
+
+    @property
+    def state(self) -> EloState:
+        """
+        ratings, team_game_counts, last_played and match_ratings in columnar form
+        (see EloState). Makes it the current form of the state.
+        """
+        if self._state is None:
+            self._state = state_from_dicts(
+                self._ratings,
+                self._team_game_counts,
+                self._last_played,
+                self._match_ratings,
+                self.key_suffix,
+            )
+            self._ratings = self._team_game_counts = None
+            self._last_played = self._match_ratings = None
+        return self._state
+
+    @state.setter
+    def state(self, state: EloState) -> None:
+        self._state = state
+        self._ratings = self._team_game_counts = None
+        self._last_played = self._match_ratings = None
+
+    def _use_dicts(self) -> None:
+        if self._state is not None:
+            (
+                self._ratings,
+                self._team_game_counts,
+                self._last_played,
+                self._match_ratings,
+            ) = state_to_dicts(self._state, self.key_suffix)
+            self._state = None
+
+    def rosters(self) -> list:
+        """
+        The rosters with a rating, without converting the state.
+        """
+        if self._state is not None:
+            return list(self._state.rosters)
+        return list(self._ratings)
+
     def default_elo(self, rank) -> float:
         if not self.first_from_rank:
             return self.mean_elo
@@ -222,24 +348,217 @@ class EloSystem:
                 current_date=game["start_date"],
             )
 
-    def calculate_elo(self, games: pd.DataFrame) -> None:
+    def pending_games(self, games: pd.DataFrame) -> pd.DataFrame:
+        """
+        Select the games after the watermark, in processing order.
+
+        Games are processed in (start_date, game_id) order, the order of the
+        games_for_elo query, so the watermark splits any list of games the same
+        way. Games added before the watermark after it was saved are ignored.
+
+        Args:
+            games (pd.DataFrame): Games with the games_for_elo columns.
+
+        Returns:
+            pd.DataFrame: The games still to be processed, sorted.
+        """
+        games = games.sort_values(["start_date", "game_id"])
+        if self.watermark is None:
+            return games
+        start_date, game_id = self.watermark
+        is_pending = (games["start_date"] > start_date) | (
+            (games["start_date"] == start_date) & (games["game_id"] > game_id)
+        )
+        return games[is_pending]
+
+    def calculate_elo(self, games: pd.DataFrame, engine: str = ELO_ENGINE) -> None:
+        """
+        Process the games after the watermark and append the pre-match ratings of
+        both rosters of each of them to the elo_table.
+
+        A new system processes all games. A system loaded with load_checkpoint, or
+        one that already processed earlier games, resumes where it stopped and
+        ends in the same state as a single call with all the games.
+
+        Args:
+            games (pd.DataFrame): Games with the games_for_elo columns.
+            engine (str): "array" (array-backed loop, see elo_engine), "iterrows"
+                          (row-by-row loop) or "check" (runs both and fails if the
+                          elo_table or the ratings diverge).
+        """
+        calculate_elo_systems([self], games, engine=engine)
+
+    def _calculate_elo_iterrows(self, games: pd.DataFrame) -> pd.DataFrame:
         elo_rows = []
-        match_ratings = {}
-        last_match_id = None
-        for _, game in games.sort_values("start_date").iterrows():
-            if not last_match_id or last_match_id != game["match_id"]:
-                match_ratings = self.ratings.copy()
-                last_match_id = game["match_id"]
+        for _, game in games.iterrows():
+            if not self.last_match_id or self.last_match_id != game["match_id"]:
+                self.match_ratings = {}
+                self.last_match_id = game["match_id"]
             for roster_hash in [game["roster_hash"], game["roster_hash_op"]]:
+                # Copy on first appearance in the match, before any of its updates
+                if roster_hash not in self.match_ratings:
+                    self.match_ratings[roster_hash] = dict(
+                        self.ratings.get(roster_hash, {})
+                    )
                 elo_row = {
                     "game_id": game["game_id"],
                     "roster_hash": roster_hash,
                 }
-                elo_row.update(match_ratings.get(roster_hash, {}))
+                elo_row.update(self.match_ratings[roster_hash])
                 elo_rows.append(elo_row)
             self.process_game(game)
 
-        self.elo_table = pd.DataFrame.from_records(elo_rows)
+        return pd.DataFrame.from_records(elo_rows)
+
+    def _append_games(self, games: pd.DataFrame, elo_table: pd.DataFrame) -> None:
+        # Both elo_table rows of a game share its start date
+        times = np.repeat(pd.DatetimeIndex(games["start_date"]).as_unit("ns").asi8, 2)
+        if self.elo_table is None or self.elo_table.empty:
+            self.elo_table = elo_table
+            self.elo_times = times
+        elif not elo_table.empty:
+            self.elo_table = pd.concat([self.elo_table, elo_table], ignore_index=True)
+            self.elo_times = np.concatenate([self.elo_times, times])
+        self._history = None
+        if len(games):
+            last_game = games.iloc[-1]
+            self.watermark = (last_game["start_date"], last_game["game_id"])
+
+    def rename_rosters(self, mapping: Mapping) -> None:
+        """
+        Replace the roster keys in the whole state, e.g. interned codes by roster
+        hashes before saving a checkpoint.
+
+        Args:
+            mapping (Mapping): New key of each roster. Rosters missing from it keep
+                               their key.
+        """
+
+        def rename(roster):
+            return mapping.get(roster, roster)
+
+        if self._state is not None:
+            self._state = self._state.renamed(mapping)
+        else:
+            for field in (
+                "_ratings",
+                "_team_game_counts",
+                "_last_played",
+                "_match_ratings",
+            ):
+                state = getattr(self, field)
+                setattr(self, field, {rename(k): v for k, v in state.items()})
+        if self.elo_table is not None and not self.elo_table.empty:
+            self.elo_table["roster_hash"] = self.elo_table["roster_hash"].map(rename)
+        self._history = None
+
+    def save_checkpoint(
+        self, path: str, roster_names: Optional[Mapping] = None
+    ) -> None:
+        """
+        Save the config and the full state needed to resume the calculation to a
+        checkpoint directory.
+
+        The EloState arrays, the elo_table and its start dates are saved as .npy
+        files, which load_checkpoint memory-maps, and the config, watermark and
+        last match id to meta.json. The checkpoint is written to a temporary
+        directory and then moved to path, so an interrupted run never leaves a
+        partial checkpoint.
+
+        Args:
+            path (str): Path of the checkpoint directory.
+            roster_names (Mapping): Maps interned roster codes back to their roster
+                                    hashes (see KeyInterner.names), which are
+                                    saved instead. Default: keys as is.
+        """
+        temporary = f"{path}.tmp"
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+
+        state = self.state
+        meta = {
+            "version": CHECKPOINT_VERSION,
+            "config": self.config,
+            "state": state.renamed(roster_names or {}).save(temporary),
+            "watermark": None,
+            "last_match_id": _json_value(self.last_match_id),
+            "elo_columns": None,
+        }
+        if self.watermark is not None:
+            start_date, game_id = self.watermark
+            meta["watermark"] = [start_date.isoformat(), _json_value(game_id)]
+        if self.elo_table is not None and not self.elo_table.empty:
+            roster_codes = {roster: r for r, roster in enumerate(state.rosters)}
+            elo_columns = [
+                c for c in self.elo_table.columns if c not in ("game_id", "roster_hash")
+            ]
+            arrays = {
+                "elo_game_id": self.elo_table["game_id"].to_numpy(dtype=np.int64),
+                "elo_roster": np.array(
+                    [roster_codes[r] for r in self.elo_table["roster_hash"]],
+                    dtype=np.int64,
+                ),
+                "elo_values": self.elo_table[elo_columns].to_numpy(dtype=float),
+                "elo_time": np.asarray(self.elo_times, dtype=np.int64),
+            }
+            for name, array in arrays.items():
+                np.save(os.path.join(temporary, f"{name}.npy"), array)
+            meta["elo_columns"] = elo_columns
+        with open(os.path.join(temporary, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(temporary, path)
+        logging.info(f"Saved Elo checkpoint at {self.watermark} to {path}")
+
+    @classmethod
+    def load_checkpoint(cls, path: str, mmap_mode: Optional[str] = "r") -> "EloSystem":
+        """
+        Load an EloSystem saved with save_checkpoint.
+
+        Args:
+            path (str): Path of the checkpoint directory.
+            mmap_mode (str): Mode passed to np.load. Default: "r" (memory-mapped).
+
+        Returns:
+            EloSystem: The system, ready to resume with calculate_elo.
+
+        Raises:
+            ValueError: If the checkpoint was saved by an incompatible version.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported Elo checkpoint version in {path}")
+
+        elo_system = cls(**meta["config"])
+        elo_system.state = EloState.load(path, meta["state"], mmap_mode=mmap_mode)
+        elo_system.last_match_id = meta["last_match_id"]
+        if meta["watermark"] is not None:
+            start_date, game_id = meta["watermark"]
+            elo_system.watermark = (pd.Timestamp(start_date), game_id)
+        if meta["elo_columns"] is not None:
+
+            def load(name):
+                return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+
+            rosters = np.array(elo_system.state.rosters, dtype=object)
+            elo_system.elo_table = pd.concat(
+                [
+                    pd.DataFrame(
+                        {
+                            "game_id": load("elo_game_id"),
+                            "roster_hash": rosters[load("elo_roster")],
+                        }
+                    ),
+                    pd.DataFrame(load("elo_values"), columns=meta["elo_columns"]),
+                ],
+                axis=1,
+            )
+            elo_system.elo_times = load("elo_time")
+        logging.info(f"Loaded Elo checkpoint at {elo_system.watermark} from {path}")
+        return elo_system
 
     def add_elos_to_df(self, df: pd.DataFrame) -> pd.DataFrame:
         df = df.merge(
@@ -250,25 +569,143 @@ class EloSystem:
         )
         return df
 
-    def save_ratings(self):
+    def ratings_frame(self) -> pd.DataFrame:
+        """
+        Export the current ratings as a DataFrame with one row per roster and one
+        column per Elo key. Keys a roster has no rating for are NaN.
+        """
+        if self._state is None:
+            return pd.DataFrame.from_dict(self.ratings, orient="index", dtype=float)
+        state = self._state
+        return pd.DataFrame(
+            np.where(state.arrays["has_key"], state.arrays["ratings"], np.nan),
+            index=pd.Index(state.rosters, dtype=object),
+            columns=[f"{key}{self.key_suffix}" for key in state.keys],
+        )
+
+    @property
+    def history(self) -> RatingHistory:
+        """
+        Rating trajectory of every roster (see RatingHistory), built from the
+        elo_table on first use and kept until more games are processed.
+        """
+        if self._history is None:
+            self._history = RatingHistory.build(
+                self.elo_table, self.elo_times, self.ratings_frame()
+            )
+        return self._history
+
+    def ratings_as_of(
+        self,
+        rosters: Sequence[Hashable],
+        timestamps: Sequence,
+        keys: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Look up the ratings of rosters just before given dates, without replaying
+        any games. A roster's ratings only change when it plays, so these are the
+        pre-match ratings of its first game at or after the date, or its current
+        ratings if it has not played since.
+
+        Args:
+            rosters (Sequence): Roster of each lookup.
+            timestamps (Sequence): Date of each lookup, in the time zone of the
+                                   games' start_date.
+            keys (list): Elo columns to return, e.g. ["nuke_elo"]. Default: all.
+
+        Returns:
+            pd.DataFrame: One row per (roster, timestamp) pair, in order, and one
+                          column per Elo key. NaN where the roster had no rating.
+        """
+        return self.history.as_of(rosters, timestamps, keys=keys)
+
+    def save_ratings(self, roster_names: Optional[Mapping] = None):
+        """
+        Save the ratings to elo_ratings.json.
+
+        Args:
+            roster_names (Mapping): Maps interned roster codes back to their roster
+                                    hashes (see KeyInterner.names). Default: keys
+                                    as is.
+        """
+        ratings = self.ratings
+        if roster_names is not None:
+            ratings = {roster_names.get(k): v for k, v in ratings.items()}
         with open("elo_ratings.json", "w") as f:
-            json.dump(self.ratings, f, indent=4)
+            json.dump(ratings, f, indent=4)
+
+
+def _json_value(value):
+    # numpy scalars (e.g. ids read from DataFrames) are not JSON serializable
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def calculate_elo_systems(
+    elo_systems: List[EloSystem], games: pd.DataFrame, engine: str = ELO_ENGINE
+) -> None:
+    """
+    Run calculate_elo for several systems, in a single pass over the games when
+    their states allow it (see can_share_pass).
+
+    Args:
+        elo_systems (list): EloSystems to calculate.
+        games (pd.DataFrame): Games with the games_for_elo columns.
+        engine (str): "array", "iterrows" or "check" (see EloSystem.calculate_elo).
+    """
+    if engine not in ELO_ENGINES:
+        raise ValueError(f"Unknown Elo engine: {engine}")
+    groups = [[elo_system] for elo_system in elo_systems]
+    if engine != "iterrows" and len(elo_systems) > 1:
+        if can_share_pass(elo_systems):
+            groups = [elo_systems]
+        else:
+            logging.info("Elo systems are at different states, calculating apart")
+
+    for group in groups:
+        games_to_process = group[0].pending_games(games)
+        if group[0].watermark is not None:
+            logging.info(
+                f"Resuming Elo from {group[0].watermark} with "
+                f"{len(games_to_process)} new games"
+            )
+
+        expected = [copy.deepcopy(s) for s in group] if engine == "check" else []
+        if engine == "iterrows":
+            elo_tables = [s._calculate_elo_iterrows(games_to_process) for s in group]
+        else:
+            elo_tables = calculate_elo_arrays(group, games_to_process)
+        for elo_system, elo_table in zip(group, elo_tables):
+            elo_system._append_games(games_to_process, elo_table)
+        for reference, elo_system in zip(expected, group):
+            reference._append_games(
+                games_to_process, reference._calculate_elo_iterrows(games_to_process)
+            )
+            check_elo_equivalence(reference, elo_system)
+        logging.info(
+            f"Calculated {len(group)} Elo systems for {len(group[0].rosters())} team "
+            f"rosters using {len(games_to_process)} game results"
+        )
 
 
 def calculate_elos(
     df: pd.DataFrame, elo_games_df: pd.DataFrame, elo_system: EloSystem
 ) -> pd.DataFrame:
     elo_system.calculate_elo(games=elo_games_df)
-    logging.info(
-        f"Calculated elos for {len(elo_system.ratings.keys())} team rosters using "
-        f"{len(elo_games_df)} game results"
-    )
+    return add_elos(df, elo_system)
+
+
+def add_elos(df: pd.DataFrame, elo_system: EloSystem) -> pd.DataFrame:
+    """
+    Add the pre-match Elos of an already calculated system to the games, and the
+    current ratings to the games not played yet.
+    """
     df = elo_system.add_elos_to_df(df)
 
     new_matches = pd.isna(df["won"])
-    elo_columns = [c for c in df.columns if f"elo{elo_system.postfix}" in c]
+    elo_columns = [c for c in df.columns if c.endswith(elo_system.key_suffix)]
 
-    for c in elo_columns:
-        for i, new_match in df.loc[new_matches].iterrows():
-            df.at[i, c] = elo_system.ratings.get(new_match["roster_hash"], {}).get(c)
+    current_ratings = elo_system.ratings_frame().reindex(
+        index=df.loc[new_matches, "roster_hash"], columns=elo_columns
+    )
+    df.loc[new_matches, elo_columns] = current_ratings.to_numpy()
     return df
@@ -8,11 +8,11 @@ from iron_man_features.features.simple_feature import SimpleFeature
 
 FEATURES = [
     SimpleFeature("overall_elo"),
-    # SimpleFeature("overall_elo_slow"),
-    # SimpleFeature("overall_elo_fast"),
+    SimpleFeature("overall_elo_slow"),
+    SimpleFeature("overall_elo_fast"),
     SimpleFeature("overall_elo", shift=5),
-    # SimpleFeature("overall_elo_slow", shift=5),
-    # SimpleFeature("overall_elo_fast", shift=5),
+    SimpleFeature("overall_elo_slow", shift=5),
+    SimpleFeature("overall_elo_fast", shift=5),
     HistoricalSum("game_played"),
     Categorical("played_map"),
     SimpleFeature("hltv_rank"),
@@ -30,12 +30,17 @@ MAPS = [
     "overpass",
 ]
 
+MAP_NAMES = [map_name.lower() for map_name in MAPS]
+
 WINDOWS = [5, 10, 20, 50, 100]
 
+RANK_RANGES = [5, 10, 20, 50, 100, 500]
+
 for days in [1, 3, 5, 10, 30]:
     FEATURES.append(GamesPlayedLastDays(days))
-    for map_name in MAPS:
-        FEATURES.append(GamesPlayedLastDays(days, played_map=map_name))
+    FEATURES.append(
+        GamesPlayedLastDays(days, partition_by="played_map", partition_values=MAPS)
+    )
 
 average_columns = [
     "won",
@@ -67,40 +72,61 @@ important_average_columns = [
 ]
 
 
-for rank_range in [5, 10, 20, 50, 100, 500]:
-    FEATURES.append(HistoricalSum("game_played", rank_range_op=rank_range))
-    for avg_column in important_average_columns:
-        FEATURES.append(HistoricalAverage(avg_column, rank_range_op=rank_range))
-        for map_name in MAPS:
-            FEATURES.append(
-                HistoricalAverage(
-                    avg_column,
-                    played_map=map_name.lower(),
-                    rank_range_op=rank_range,
-                )
+# Features that sweep every value of rank_range_op or played_map are partitioned:
+# each one is a single groupby over (roster_hash, partition column) that yields one
+# column per value, named as the equivalent filtered feature.
+FEATURES.append(
+    HistoricalSum(
+        "game_played", partition_by="rank_range_op", partition_values=RANK_RANGES
+    )
+)
+for avg_column in important_average_columns:
+    FEATURES.append(
+        HistoricalAverage(
+            avg_column, partition_by="rank_range_op", partition_values=RANK_RANGES
+        )
+    )
+    for rank_range in RANK_RANGES:
+        FEATURES.append(
+            HistoricalAverage(
+                avg_column,
+                partition_by="played_map",
+                partition_values=MAP_NAMES,
+                rank_range_op=rank_range,
             )
+        )
 
 
 for avg_column in average_columns:
     FEATURES.append(HistoricalAverage(avg_column))
-    for map_name in MAPS:
-        FEATURES.append(HistoricalAverage(avg_column, played_map=map_name.lower()))
+    FEATURES.append(
+        HistoricalAverage(
+            avg_column, partition_by="played_map", partition_values=MAP_NAMES
+        )
+    )
 
 for avg_column in average_columns:
     for window in WINDOWS:
         FEATURES.append(MovingAverage(avg_column, window))
-        for map_name in MAPS:
-            FEATURES.append(
-                MovingAverage(avg_column, window, played_map=map_name.lower())
+        FEATURES.append(
+            MovingAverage(
+                avg_column,
+                window,
+                partition_by="played_map",
+                partition_values=MAP_NAMES,
             )
+        )
 
 for map_name in MAPS:
     FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo"))
-    # FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo_slow"))
-    # FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo_fast"))
+    FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo_slow"))
+    FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo_fast"))
     FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo", shift=5))
-    # FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo_slow", shift=5))
-    # FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo_fast", shift=5))
+    FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo_slow", shift=5))
+    FEATURES.append(SimpleFeature(f"{map_name.lower()}_elo_fast", shift=5))
     # FEATURES.append(SimpleFeature(f"{map_name.lower()}_ct_elo"))
     # FEATURES.append(SimpleFeature(f"{map_name.lower()}_tr_elo"))
-    FEATURES.append(HistoricalSum("game_played", played_map=map_name))
+
+FEATURES.append(
+    HistoricalSum("game_played", partition_by="played_map", partition_values=MAPS)
+)
@@ -1,27 +1,40 @@
-from typing import Dict
-
+import numpy as np
 import pandas as pd
 
+from iron_man_features.features.feature_cache import current_feature_cache
+
 
-# Cache global para armazenar resultados de groupby
-groupby_cache: Dict[str, pd.DataFrame] = {}
+# Janela usada pelas features históricas (soma e média acumuladas)
+HISTORICAL_WINDOW = 1000
 
 
-def apply_filters(df, filters):
+def apply_filters(df, filters, columns=None):
     """
     Aplica filtros ao DataFrame.
 
+    Os filtros são combinados em uma única máscara antes de selecionar as linhas,
+    sem copiar o DataFrame inteiro. Para filtrar repetidamente o mesmo DataFrame,
+    prefira um FilterIndex.
+
     :param df: DataFrame pandas.
     :param filters: Dicionário de filtros a serem aplicados.
+    :param columns: Colunas a manter no resultado. Padrão: todas.
     :return: DataFrame filtrado.
     """
-    filtered_df = df.copy()
+    subset = df if columns is None else df[columns]
+    if not filters:
+        return subset
+    mask = np.ones(len(df), dtype=bool)
     for key, value in filters.items():
-        filtered_df = filtered_df[(filtered_df[key] == value)]
-    return filtered_df
+        mask &= (df[key] == value).to_numpy(dtype=bool, na_value=False)
+    return subset[mask]
 
 
 def get_grouped_df(df, groupby_key, shift, filters=None) -> pd.DataFrame:
+    """
+    Filtra e agrupa o DataFrame, reaproveitando o agrupamento do cache do escopo
+    atual (ver feature_cache_scope) quando df, chave, shift e filtros coincidem.
+    """
     # Convertendo a chave do groupby em uma tupla, se for uma lista
     groupby_fields = groupby_key
     if isinstance(groupby_key, list):
@@ -31,12 +44,11 @@ def get_grouped_df(df, groupby_key, shift, filters=None) -> pd.DataFrame:
     filters_repr = str(sorted(filters.items())) if filters else "no_filters"
 
     # Criar a chave do cache com as informações adicionais
-    cache_key = (groupby_key, shift, filters_repr)
+    cache_key = ("groupby", groupby_key, shift, filters_repr)
 
-    if cache_key not in groupby_cache:
-        filtered_df = apply_filters(df, filters)
-        groupby_cache[cache_key] = filtered_df.groupby(groupby_fields)
-    return groupby_cache[cache_key]
+    return current_feature_cache().get_or_compute(
+        df, cache_key, lambda: apply_filters(df, filters).groupby(groupby_fields)
+    )
 
 
 def calculate_sum(df, field, shift=1, filters=None):
@@ -48,7 +60,11 @@ def calculate_sum(df, field, shift=1, filters=None):
     )
     hist_sum = (
         grouped_df[field]
-        .apply(lambda x: x.rolling(window=1000, min_periods=1).sum().shift(shift))
+        .apply(
+            lambda x: x.rolling(window=HISTORICAL_WINDOW, min_periods=1)
+            .sum()
+            .shift(shift)
+        )
         .reset_index(level=0, drop=True)
     )
     return hist_sum
@@ -63,7 +79,11 @@ def calculate_average(df, field, shift=1, filters=None):
     )
     average = (
         grouped_df[field]
-        .apply(lambda x: x.rolling(window=1000, min_periods=1).mean().shift(shift))
+        .apply(
+            lambda x: x.rolling(window=HISTORICAL_WINDOW, min_periods=1)
+            .mean()
+            .shift(shift)
+        )
         .reset_index(level=0, drop=True)
     )
     return average
@@ -0,0 +1,177 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from iron_man_features.config import FEATURE_CACHE_MAX_BYTES, FEATURE_CACHE_MAX_ENTRIES
+
+
+# Número de linhas amostradas para calcular a impressão digital de um DataFrame
+FINGERPRINT_SAMPLE_ROWS = 64
+
+
+def frame_fingerprint(df: pd.DataFrame) -> Tuple:
+    """
+    Calcula uma impressão digital barata de um DataFrame.
+
+    Combina o formato, as colunas e o hash de uma amostra de linhas espaçadas
+    uniformemente (incluindo o índice). Não detecta toda alteração possível, mas
+    distingue execuções com dados diferentes sem percorrer o DataFrame inteiro.
+
+    :param df: DataFrame pandas.
+    :return: Tupla hashable que identifica o DataFrame.
+    """
+    sample_positions = np.unique(
+        np.linspace(0, max(len(df) - 1, 0), FINGERPRINT_SAMPLE_ROWS).astype(int)
+    )
+    sample = df.iloc[sample_positions] if len(df) else df
+    sample_hash = int(
+        pd.util.hash_pandas_object(sample.astype(str), index=True).sum()
+        & 0xFFFFFFFFFFFF
+    )
+    return len(df), tuple(df.columns), sample_hash
+
+
+def estimate_nbytes(value: Any) -> int:
+    """
+    Estima a memória ocupada por um valor guardado no cache.
+
+    :param value: DataFrame, Series, groupby, array numpy ou tupla desses.
+    :return: Número aproximado de bytes.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(index=True)))
+    if hasattr(value, "obj") and hasattr(value, "ngroups"):
+        return estimate_nbytes(value.obj)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(v) for v in value)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return 0
+
+
+class FeatureCache:
+    """
+    Cache LRU de resultados intermediários do cálculo de features.
+
+    As chaves combinam a impressão digital do DataFrame de origem com a chave do
+    resultado, de forma que dados novos nunca reaproveitam agrupamentos antigos.
+    As entradas menos usadas são descartadas ao exceder o número máximo de
+    entradas ou o orçamento de bytes.
+
+    Parâmetros:
+    - max_entries (int): Número máximo de entradas. 0 desativa o cache.
+    - max_bytes (int): Orçamento de memória em bytes. None para ilimitado.
+
+    Uso:
+    >>> with feature_cache_scope() as cache:
+    ...     grouped = get_grouped_df(df, "roster_hash", shift=1)
+    >>> cache.stats()
+    """
+
+    def __init__(
+        self,
+        max_entries: int = FEATURE_CACHE_MAX_ENTRIES,
+        max_bytes: Optional[int] = FEATURE_CACHE_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(
+        self, df: pd.DataFrame, key: Hashable, compute: Callable[[], Any]
+    ) -> Any:
+        """
+        Retorna o valor em cache para (df, key) ou o calcula e guarda.
+
+        :param df: DataFrame de origem do valor.
+        :param key: Chave do valor para esse DataFrame.
+        :param compute: Função sem argumentos que calcula o valor.
+        :return: Valor em cache ou recém-calculado.
+        """
+        # Sem cache (fora de um escopo) a impressão digital nunca seria reutilizada
+        if self.max_entries <= 0:
+            self.misses += 1
+            return compute()
+
+        cache_key = (frame_fingerprint(df), key)
+        if cache_key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(cache_key)
+            return self._entries[cache_key][0]
+
+        self.misses += 1
+        value = compute()
+        nbytes = estimate_nbytes(value)
+        self._entries[cache_key] = (value, nbytes)
+        self.nbytes += nbytes
+        self._evict()
+        return value
+
+    def _evict(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_current_cache: ContextVar[Optional[FeatureCache]] = ContextVar(
+    "feature_cache", default=None
+)
+
+
+def current_feature_cache() -> FeatureCache:
+    """
+    Retorna o cache do escopo atual. Fora de um feature_cache_scope os valores são
+    calculados sem serem guardados.
+    """
+    cache = _current_cache.get()
+    return cache if cache is not None else FeatureCache(max_entries=0)
+
+
+@contextmanager
+def feature_cache_scope(
+    cache: Optional[FeatureCache] = None,
+) -> Iterator[FeatureCache]:
+    """
+    Abre um escopo de cache para uma execução do pipeline. Ao sair do escopo o
+    cache é esvaziado e a memória dos agrupamentos é liberada.
+
+    :param cache: Cache a usar. Padrão: um FeatureCache novo.
+    :return: O cache do escopo.
+    """
+    cache = FeatureCache() if cache is None else cache
+    token = _current_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_cache.reset(token)
+        cache.clear()
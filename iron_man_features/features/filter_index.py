@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    """
+    Índice de posições de linha por valor das colunas de filtro.
+
+    Na primeira vez que uma coluna é usada em um filtro, suas linhas são ordenadas
+    por valor uma única vez e as posições de cada valor são guardadas. Um conjunto
+    de filtros é resolvido pela interseção dessas posições, sem copiar o DataFrame.
+
+    Parâmetros:
+    - df (pd.DataFrame): DataFrame indexado.
+    - columns (list): Colunas a indexar antecipadamente. As demais são indexadas sob
+                      demanda.
+
+    Uso:
+    >>> index = FilterIndex(information_df, columns=["played_map", "rank_range_op"])
+    >>> positions = index.positions({"played_map": "nuke", "rank_range_op": 5})
+    >>> subset = index.take({"played_map": "nuke"}, columns=["roster_hash", "won"])
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Optional[List[str]] = None):
+        self.df = df
+        self._positions: Dict[str, Dict] = {}
+        for column in columns or []:
+            self.column_positions(column)
+
+    def column_positions(self, column: str) -> Dict:
+        """
+        Retorna as posições de cada valor de uma coluna, indexando-a se necessário.
+
+        :param column: Nome da coluna.
+        :return: Dicionário {valor: posições em ordem crescente}.
+        """
+        if column not in self._positions:
+            codes, uniques = pd.factorize(self.df[column])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self._positions[column] = dict(zip(uniques, np.split(order, bounds)[1:-1]))
+        return self._positions[column]
+
+    def positions(self, filters: dict) -> np.ndarray:
+        """
+        Resolve um conjunto de filtros de igualdade em posições de linha.
+
+        :param filters: Dicionário {coluna: valor}.
+        :return: Posições (ordem crescente) das linhas que satisfazem os filtros.
+        """
+        if not filters:
+            return np.arange(len(self.df))
+
+        arrays = []
+        for column, value in filters.items():
+            matches = self.column_positions(column).get(value)
+            if matches is None:
+                return np.array([], dtype=np.intp)
+            arrays.append(matches)
+
+        arrays.sort(key=len)
+        positions = arrays[0]
+        for other in arrays[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions
+
+    def take(self, filters: dict, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Retorna apenas as linhas e colunas necessárias para um conjunto de filtros.
+
+        :param filters: Dicionário {coluna: valor}.
+        :param columns: Colunas a retornar. Padrão: todas.
+        :return: DataFrame com as linhas filtradas.
+        """
+        subset = self.df if columns is None else self.df[columns]
+        return subset.take(self.positions(filters))
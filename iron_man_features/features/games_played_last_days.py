@@ -1,50 +1,62 @@
 import pandas as pd
 
 from iron_man_features.features.calculation_functions import calculate_games_last_n_days
-from iron_man_features.features.model_feature import ModelFeature
+from iron_man_features.features.model_feature import PartitionedFeature
 
 
-class GamesPlayedLastDays(ModelFeature):
+class GamesPlayedLastDays(PartitionedFeature):
     """
-    Classe SimpleFeature extrai um campo da tabela de scouts do banco de dados para a
-    rodada atual ou rodadas anteriores.
+    Classe GamesPlayedLastDays conta os jogos de cada roster nos últimos dias,
+    excluindo o jogo atual.
 
     Parâmetros:
-    - field (str): Campo do banco de dados scouts a ser extraído.
-    - shift (int): Define o deslocamento para rodadas anteriores. Padrão: 0.
+    - days (int): Número de dias da janela.
+    - partition_by (str): Coluna cujos valores viram uma coluna cada (ver
+                          PartitionedFeature). Padrão: None.
+    - partition_values (list): Valores de partition_by a calcular.
+    - **kwargs: Filtros adicionais para a consulta.
 
     Atributos:
     - live (bool): Indica se a feature é calculada em tempo real ou não. Padrão: False.
     - feature_type (str): Tipo de feature. Padrão: 'numeric'.
-    - base_df (str): DataFrame base utilizado. Padrão: 'scouts'.
+    - field (str): Campo somado na janela. Padrão: 'game_played'.
+    - time_field (str): Campo de data que define a janela. Padrão: 'match_date'.
 
     Uso:
-    >>> simple_feature = SimpleFeature(field="gols", shift=1)
-    >>> print(simple_feature.name)
-    'simple_feature(gols, 1)'
+    >>> games = GamesPlayedLastDays(days=5, played_map="nuke")
+    >>> print(games.name)
+    'games_played_last_days(5-played_map=nuke)'
     """
 
     live: bool = False
     feature_type: str = "numeric"
-    shift: int
-
-    def __init__(self, days: int, **kwargs):
+    field: str = "game_played"
+    time_field: str = "match_date"
+
+    def __init__(
+        self,
+        days: int,
+        partition_by: str = None,
+        partition_values: list = None,
+        **kwargs,
+    ):
         self.days = days
         self.filters = kwargs
-        kwargs_string = "-".join([f"{k}={v}" for k, v in self.filters.items()])
-        self.name = f"games_played_last_days({self.days}"
-        if len(kwargs_string) > 2:
-            self.name += f"-{kwargs_string})"
-        else:
-            self.name += ")"
+        self.set_partition(partition_by, partition_values)
+        self.name_prefix = f"games_played_last_days({self.days}"
+        self.name = self.build_name(
+            {partition_by: "*", **kwargs} if partition_by else kwargs
+        )
 
     def calculation(self, df: pd.DataFrame) -> pd.DataFrame:
         result = pd.DataFrame(index=df.index)
 
-        result[self.name] = calculate_games_last_n_days(
-            df,
-            n_days=self.days,
-            filters=self.filters,
-        )
+        for name, filters in zip(self.names, self.partition_filters()):
+            result[name] = calculate_games_last_n_days(
+                df,
+                n_days=self.days,
+                shift=self.shift,
+                filters=filters,
+            )
 
-        return result[self.name]
+        return result if self.partition_by else result[self.name]
@@ -1,10 +1,13 @@
 import pandas as pd
 
-from iron_man_features.features.calculation_functions import calculate_average
-from iron_man_features.features.model_feature import ModelFeature
+from iron_man_features.features.calculation_functions import (
+    HISTORICAL_WINDOW,
+    calculate_average,
+)
+from iron_man_features.features.model_feature import RollingFeature
 
 
-class HistoricalAverage(ModelFeature):
+class HistoricalAverage(RollingFeature):
     """
     Classe HistoricalAverage calcula a média histórica para cada jogador de um campo
     especificado.
@@ -12,6 +15,9 @@ class HistoricalAverage(ModelFeature):
     Parâmetros:
     - field (str): Campo do banco de dados scouts para o qual a média será
                     calculada.
+    - partition_by (str): Coluna cujos valores viram uma coluna cada (ver
+                          RollingFeature). Padrão: None.
+    - partition_values (list): Valores de partition_by a calcular.
     - **kwargs: Filtros adicionais para a consulta.
 
     Atributos:
@@ -29,16 +35,23 @@ class HistoricalAverage(ModelFeature):
     feature_type: str = "numeric"
     base_df: str = "scouts"
     field: str
+    statistic: str = "mean"
+    window: int = HISTORICAL_WINDOW
 
-    def __init__(self, field: str, **kwargs):
+    def __init__(
+        self,
+        field: str,
+        partition_by: str = None,
+        partition_values: list = None,
+        **kwargs,
+    ):
         self.field = field
         self.filters = kwargs
-        kwargs_string = "-".join([f"{k}={v}" for k, v in self.filters.items()])
-        self.name = f"historical_average({self.field}"
-        if len(kwargs_string) > 2:
-            self.name += f"-{kwargs_string})"
-        else:
-            self.name += ")"
+        self.set_partition(partition_by, partition_values)
+        self.name_prefix = f"historical_average({self.field}"
+        self.name = self.build_name(
+            {partition_by: "*", **kwargs} if partition_by else kwargs
+        )
 
     def calculation(
         self,
@@ -46,10 +59,11 @@ class HistoricalAverage(ModelFeature):
     ) -> pd.DataFrame:
         result = pd.DataFrame(index=df.index)
 
-        result[self.name] = calculate_average(
-            df=df,
-            field=self.field,
-            filters=self.filters,
-        )
+        for name, filters in zip(self.names, self.partition_filters()):
+            result[name] = calculate_average(
+                df=df,
+                field=self.field,
+                filters=filters,
+            )
 
-        return result[self.name]
+        return result if self.partition_by else result[self.name]
@@ -1,4 +1,6 @@
+import copy
 from abc import ABC, abstractmethod
+from typing import List, Optional
 
 from pandas import DataFrame
 
@@ -12,3 +14,71 @@ class ModelFeature(ABC):
     @abstractmethod
     def calculation(self, df: DataFrame) -> DataFrame:
         raise NotImplementedError
+
+
+# Classe base para features calculadas por roster sobre um subconjunto filtrado.
+#
+# Com partition_by a feature varre todos os valores de uma coluna (por exemplo
+# rank_range_op ou played_map): o resultado tem uma coluna por valor de
+# partition_values, idêntica à feature filtrada por aquele valor, mas calculada com
+# um único agrupamento por (roster_hash, partition_by).
+class PartitionedFeature(ModelFeature):
+    filters: dict
+    shift: int = 1
+    partition_by: Optional[str] = None
+    partition_values: List = []
+    name_prefix: str
+
+    def set_partition(self, partition_by: Optional[str], partition_values: list):
+        if partition_by is not None and not partition_values:
+            raise ValueError(
+                f"partition_values is required to partition by {partition_by}"
+            )
+        self.partition_by = partition_by
+        self.partition_values = list(partition_values or [])
+
+    def build_name(self, filters: Optional[dict] = None) -> str:
+        filters = self.filters if filters is None else filters
+        kwargs_string = "-".join([f"{k}={v}" for k, v in filters.items()])
+        if len(kwargs_string) > 2:
+            return f"{self.name_prefix}-{kwargs_string})"
+        return f"{self.name_prefix})"
+
+    def partition_filters(self) -> List[dict]:
+        """Filtros equivalentes a cada coluna da feature, na ordem de names."""
+        if self.partition_by is None:
+            return [self.filters]
+        return [
+            {self.partition_by: value, **self.filters}
+            for value in self.partition_values
+        ]
+
+    @property
+    def names(self) -> List[str]:
+        if self.partition_by is None:
+            return [self.name]
+        return [self.build_name(filters) for filters in self.partition_filters()]
+
+    def expand_partitions(self) -> List["PartitionedFeature"]:
+        """Uma feature filtrada, sem partição, para cada coluna da feature."""
+        if self.partition_by is None:
+            return [self]
+        expanded = []
+        for name, filters in zip(self.names, self.partition_filters()):
+            feature = copy.copy(self)
+            feature.filters = filters
+            feature.name = name
+            feature.partition_by = None
+            feature.partition_values = []
+            expanded.append(feature)
+        return expanded
+
+
+# Classe base para features de janela móvel por roster. As subclasses descrevem a
+# estatística (soma ou média), a janela e o min_periods, permitindo que o
+# rolling_engine calcule várias features do mesmo grupo de filtros de uma vez.
+class RollingFeature(PartitionedFeature):
+    field: str
+    statistic: str
+    window: int
+    min_periods: int = 1
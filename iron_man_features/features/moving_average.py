@@ -1,10 +1,10 @@
 import pandas as pd
 
 from iron_man_features.features.calculation_functions import calculate_moving_average
-from iron_man_features.features.model_feature import ModelFeature
+from iron_man_features.features.model_feature import RollingFeature
 
 
-class MovingAverage(ModelFeature):
+class MovingAverage(RollingFeature):
     """
     Classe MovingAverage calcula a média móvel para cada jogador de um campo
     especificado, baseada em um número definido de partidas anteriores.
@@ -16,6 +16,9 @@ class MovingAverage(ModelFeature):
     - field (str): Campo do banco de dados scouts para o qual a média móvel será
                     calculada.
     - n_games (int): Número de partidas anteriores a considerar para a média móvel.
+    - partition_by (str): Coluna cujos valores viram uma coluna cada (ver
+                          RollingFeature). Padrão: None.
+    - partition_values (list): Valores de partition_by a calcular.
     - **kwargs: Filtros adicionais para a consulta.
 
     Atributos:
@@ -33,17 +36,26 @@ class MovingAverage(ModelFeature):
     feature_type: str = "numeric"
     field: str
     n_games: int
+    statistic: str = "mean"
 
-    def __init__(self, field: str, n_games: int, **kwargs):
+    def __init__(
+        self,
+        field: str,
+        n_games: int,
+        partition_by: str = None,
+        partition_values: list = None,
+        **kwargs,
+    ):
         self.field = field
         self.n_games = n_games
+        self.window = n_games
+        self.min_periods = n_games // 2 if n_games > 1 else 1
         self.filters = kwargs
-        kwargs_string = "-".join([f"{k}={v}" for k, v in self.filters.items()])
-        self.name = f"moving_average({self.field}-{self.n_games}"
-        if len(kwargs_string) > 2:
-            self.name += f"-{kwargs_string})"
-        else:
-            self.name += ")"
+        self.set_partition(partition_by, partition_values)
+        self.name_prefix = f"moving_average({self.field}-{self.n_games}"
+        self.name = self.build_name(
+            {partition_by: "*", **kwargs} if partition_by else kwargs
+        )
 
     def calculation(
         self,
@@ -51,11 +63,12 @@ class MovingAverage(ModelFeature):
     ) -> pd.DataFrame:
         result = pd.DataFrame(index=df.index)
 
-        result[self.name] = calculate_moving_average(
-            df=df,
-            field=self.field,
-            window=self.n_games,
-            filters=self.filters,
-        )
+        for name, filters in zip(self.names, self.partition_filters()):
+            result[name] = calculate_moving_average(
+                df=df,
+                field=self.field,
+                window=self.n_games,
+                filters=filters,
+            )
 
-        return result[self.name]
+        return result if self.partition_by else result[self.name]
@@ -0,0 +1,123 @@
+import heapq
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from iron_man_features.config import (
+    FEATURE_PARALLEL_MIN_ROWS,
+    FEATURE_WORKERS,
+    ROLLING_ENGINE,
+)
+from iron_man_features.features.feature_cache import feature_cache_scope
+from iron_man_features.features.model_feature import ModelFeature, PartitionedFeature
+from iron_man_features.features.planner import FeaturePlan
+from iron_man_features.features.simple_feature import SimpleFeature
+
+
+def is_roster_local(feature: ModelFeature) -> bool:
+    """
+    Indica se a feature de uma linha depende apenas das linhas do mesmo roster.
+
+    Essas features podem ser calculadas em shards de rosters. As demais (por
+    exemplo Categorical, cujas colunas dependem de todos os valores do campo) são
+    calculadas sobre o DataFrame inteiro.
+
+    :param feature: Feature a verificar.
+    :return: True se a feature pode ser calculada por shard.
+    """
+    return isinstance(feature, (PartitionedFeature, SimpleFeature))
+
+
+def shard_rows(df: pd.DataFrame, n_shards: int) -> List[np.ndarray]:
+    """
+    Divide as linhas em shards de rosters inteiros com números de linhas próximos.
+
+    Cada roster vai para o shard com menos linhas até o momento, do maior para o
+    menor. Linhas sem roster_hash vão para o primeiro shard.
+
+    :param df: DataFrame com a coluna roster_hash.
+    :param n_shards: Número de shards.
+    :return: Posições (ordem crescente) das linhas de cada shard não vazio.
+    """
+    codes, _ = pd.factorize(df["roster_hash"])
+    sizes = np.bincount(codes[codes >= 0], minlength=codes.max() + 1)
+
+    loads = [(0, shard) for shard in range(n_shards)]
+    roster_shard = np.zeros(len(sizes), dtype=np.intp)
+    for code in np.argsort(-sizes, kind="stable"):
+        load, shard = heapq.heappop(loads)
+        roster_shard[code] = shard
+        heapq.heappush(loads, (load + sizes[code], shard))
+
+    row_shard = np.where(codes >= 0, roster_shard[codes], 0)
+    shards = [np.flatnonzero(row_shard == shard) for shard in range(n_shards)]
+    return [positions for positions in shards if len(positions)]
+
+
+def _execute_shard(
+    features: List[ModelFeature], df: pd.DataFrame, engine: str
+) -> List[pd.DataFrame]:
+    with feature_cache_scope():
+        return FeaturePlan(features).execute(df, engine=engine)
+
+
+def execute_plan(
+    plan: FeaturePlan,
+    df: pd.DataFrame,
+    workers: int = FEATURE_WORKERS,
+    min_rows: int = FEATURE_PARALLEL_MIN_ROWS,
+    engine: str = ROLLING_ENGINE,
+) -> List[pd.DataFrame]:
+    """
+    Executa um plano de features, em paralelo por shards de rosters quando vale a
+    pena.
+
+    As features calculadas por roster (ver is_roster_local) são executadas em um
+    ProcessPoolExecutor, um shard de rosters por tarefa, e remontadas na ordem
+    original das linhas. As demais features são calculadas no processo atual. Com
+    um único worker ou menos de min_rows linhas o plano roda serialmente.
+
+    :param plan: Plano de features.
+    :param df: DataFrame com as informações dos jogos.
+    :param workers: Número de processos.
+    :param min_rows: Número mínimo de linhas para usar processos.
+    :param engine: "numpy", "pandas" ou "check" (ver FeaturePlan.execute).
+    :return: Lista com o resultado de cada feature, na ordem do plano.
+    """
+    local = [p for p, f in enumerate(plan.features) if is_roster_local(f)]
+    if workers <= 1 or len(df) < max(min_rows, 1) or not local:
+        return plan.execute(df, engine=engine)
+
+    shards = shard_rows(df, workers)
+    logging.info(
+        f"Calculating {len(local)} roster features in {len(shards)} shards "
+        f"with {workers} workers"
+    )
+    local_features = [plan.features[p] for p in local]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_execute_shard, local_features, df.iloc[rows], engine)
+            for rows in shards
+        ]
+
+        # As features globais rodam neste processo enquanto os shards são calculados
+        remaining = sorted(set(range(len(plan.features))) - set(local))
+        results = [None] * len(plan.features)
+        if remaining:
+            global_outputs = FeaturePlan([plan.features[p] for p in remaining]).execute(
+                df, engine=engine
+            )
+            for position, output in zip(remaining, global_outputs):
+                results[position] = output
+
+        shard_outputs = [future.result() for future in futures]
+
+    # Recoloca as linhas dos shards na ordem original do DataFrame
+    row_order = np.argsort(np.concatenate(shards), kind="stable")
+    for i, position in enumerate(local):
+        parts = pd.concat([outputs[i] for outputs in shard_outputs])
+        results[position] = parts.iloc[row_order]
+    return results
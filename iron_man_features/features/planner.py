@@ -0,0 +1,488 @@
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from iron_man_features.config import ROLLING_ENGINE
+from iron_man_features.features.feature_cache import current_feature_cache
+from iron_man_features.features.filter_index import FilterIndex
+from iron_man_features.features.games_played_last_days import GamesPlayedLastDays
+from iron_man_features.features.model_feature import (
+    ModelFeature,
+    PartitionedFeature,
+    RollingFeature,
+)
+from iron_man_features.features.rolling_engine import (
+    ROLLING_ENGINES,
+    calculate_rolling_features,
+    check_equivalence,
+    filters_key,
+)
+from iron_man_features.features.rolling_kernels import (
+    group_layout,
+    prefix_sums,
+    range_statistic,
+    shift_segments,
+    time_window_starts,
+    window_statistic,
+)
+from iron_man_features.features.simple_feature import SimpleFeature
+
+
+FILTER = "filter"
+GROUP = "group"
+PREFIX = "prefix"
+WINDOW = "window"
+TIME_WINDOW = "time_window"
+SHIFT = "shift"
+FEATURE = "feature"
+NODE_KINDS = (FILTER, GROUP, PREFIX, WINDOW, TIME_WINDOW, SHIFT, FEATURE)
+
+# Seletividade assumida por coluna de filtro quando o plano é explicado sem dados
+DEFAULT_SELECTIVITY = 0.1
+DEFAULT_ROWS = 100_000
+
+
+class PlanNode:
+    """
+    Nó do plano de execução de features.
+
+    Parâmetros:
+    - kind (str): Tipo do nó (filter, group, prefix, window, time_window, shift ou
+                  feature).
+    - key (tuple): Chave que identifica o trabalho feito pelo nó. Nós com a mesma
+                   chave são o mesmo nó, o que garante que cada trabalho compartilhado
+                   seja executado uma única vez.
+    - inputs (list): Nós dos quais este nó depende.
+    - label (str): Descrição usada na impressão do plano.
+    """
+
+    def __init__(self, kind: str, key: Tuple, inputs: list, label: str):
+        self.kind = kind
+        self.key = key
+        self.inputs = inputs
+        self.label = label
+        self.consumers: List["PlanNode"] = []
+        self.features: List[int] = []
+        self.feature: Optional[ModelFeature] = None
+
+
+class FeaturePlan:
+    """
+    Plano de execução que deduplica o trabalho comum entre as features.
+
+    As features de janela móvel compartilham os nós de filtro (mesmo conjunto de
+    filtros), de agrupamento por roster e de somas acumuladas (mesma coluna de
+    origem); cada janela vira apenas um nó final. As contagens de jogos nos últimos
+    dias (GamesPlayedLastDays) reaproveitam as mesmas somas acumuladas, com um nó
+    de janela de tempo por horizonte. SimpleFeatures com shift compartilham o
+    agrupamento sem filtros. As demais features são nós opacos calculados pelo
+    próprio método calculation.
+
+    Uso:
+    >>> plan = FeaturePlan(FEATURES)
+    >>> print(plan.explain(information_df))
+    >>> result = plan.execute(information_df)
+    """
+
+    def __init__(self, features: List[ModelFeature]):
+        self.features = features
+        self.nodes: Dict[Tuple, PlanNode] = {}
+        self.outputs: List[PlanNode] = [self._plan_feature(f) for f in features]
+        for position, node in enumerate(self.outputs):
+            node.features.append(position)
+
+    def _node(self, kind: str, key: Tuple, inputs: list, label: str) -> PlanNode:
+        node_key = (kind, key)
+        if node_key not in self.nodes:
+            node = PlanNode(kind, key, inputs, label)
+            for input_node in inputs:
+                input_node.consumers.append(node)
+            self.nodes[node_key] = node
+        return self.nodes[node_key]
+
+    def _group(self, filters: dict, partition_by: Optional[str] = None) -> PlanNode:
+        key = filters_key(filters)
+        filter_label = ", ".join(f"{k}={v}" for k, v in key) or "all rows"
+        filter_node = self._node(FILTER, key, [], f"filter({filter_label})")
+        group_columns = ["roster_hash"] + ([partition_by] if partition_by else [])
+        return self._node(
+            GROUP,
+            (key, partition_by),
+            [filter_node],
+            f"group({', '.join(group_columns)})",
+        )
+
+    def _plan_feature(self, feature: ModelFeature) -> PlanNode:
+        if isinstance(feature, RollingFeature):
+            group = self._group(feature.filters, feature.partition_by)
+            prefix = self._node(
+                PREFIX, (group.key, feature.field), [group], f"prefix({feature.field})"
+            )
+            window = "expanding" if feature.window is None else feature.window
+            return self._node(
+                WINDOW,
+                (
+                    prefix.key,
+                    feature.statistic,
+                    feature.window,
+                    feature.min_periods,
+                    feature.shift,
+                ),
+                [prefix, group],
+                f"window({feature.statistic}, {window}, "
+                f"min_periods={feature.min_periods}, shift={feature.shift})",
+            )
+        if isinstance(feature, GamesPlayedLastDays):
+            group = self._group(feature.filters, feature.partition_by)
+            prefix = self._node(
+                PREFIX, (group.key, feature.field), [group], f"prefix({feature.field})"
+            )
+            return self._node(
+                TIME_WINDOW,
+                (prefix.key, feature.time_field, feature.days, feature.shift),
+                [prefix, group],
+                f"time_window(sum, {feature.days}D on {feature.time_field}, "
+                f"shift={feature.shift})",
+            )
+        if isinstance(feature, SimpleFeature) and feature.shift > 0:
+            group = self._group({})
+            return self._node(
+                SHIFT,
+                (group.key, feature.field, feature.shift),
+                [group],
+                f"shift({feature.field}, {feature.shift})",
+            )
+        node = self._node(FEATURE, (feature.name,), [], f"feature({feature.name})")
+        node.feature = feature
+        return node
+
+    def _filter_rows(self, df: Optional[pd.DataFrame]) -> Dict[Tuple, float]:
+        filter_index = None if df is None else _filter_index(df)
+        rows = {}
+        for node in self.nodes.values():
+            if node.kind != FILTER:
+                continue
+            if df is None:
+                rows[node.key] = DEFAULT_ROWS * DEFAULT_SELECTIVITY ** len(node.key)
+            else:
+                rows[node.key] = len(filter_index.positions(dict(node.key)))
+        return rows
+
+    def _estimate_cost(self, node: PlanNode, rows: float, total_rows: float) -> float:
+        if node.kind == FILTER:
+            return total_rows * max(len(node.key), 1)
+        if node.kind in (GROUP, TIME_WINDOW):
+            return rows * max(math.log2(rows), 1) if rows > 1 else rows
+        if node.kind == FEATURE:
+            return total_rows
+        return rows
+
+    def estimate_costs(self, df: Optional[pd.DataFrame] = None) -> Dict[Tuple, float]:
+        """
+        Estima o custo de cada nó, em operações por linha.
+
+        :param df: DataFrame de informações. Se informado, o número de linhas de cada
+                   filtro é exato; caso contrário assume DEFAULT_ROWS linhas e
+                   DEFAULT_SELECTIVITY por coluna filtrada.
+        :return: Dicionário {(tipo, chave): custo estimado}.
+        """
+        total_rows = DEFAULT_ROWS if df is None else len(df)
+        filter_rows = self._filter_rows(df)
+        costs = {}
+        for node_key, node in self.nodes.items():
+            root = node
+            while root.inputs:
+                root = root.inputs[0]
+            rows = filter_rows.get(root.key, total_rows)
+            costs[node_key] = self._estimate_cost(node, rows, total_rows)
+        return costs
+
+    def _unplanned_cost(self, costs: Dict[Tuple, float]) -> float:
+        # Sem planejamento cada coluna (cada valor de uma partição) refaz a cadeia
+        unplanned = 0.0
+        for node, feature in zip(self.outputs, self.features):
+            chain = [node]
+            while chain[-1].inputs:
+                chain.append(chain[-1].inputs[0])
+            columns = (
+                len(feature.names) if isinstance(feature, PartitionedFeature) else 1
+            )
+            unplanned += columns * sum(costs[(n.kind, n.key)] for n in chain)
+        return unplanned
+
+    def summary(
+        self,
+        df: Optional[pd.DataFrame] = None,
+        costs: Optional[Dict[Tuple, float]] = None,
+    ) -> str:
+        """
+        Resume o plano: número de nós por tipo e custo estimado total comparado ao
+        da execução sem planejamento (uma filtragem, um agrupamento e um rolling por
+        feature).
+
+        :param df: DataFrame de informações opcional para estimar as linhas.
+        :param costs: Custos já estimados por estimate_costs.
+        :return: Texto com o resumo.
+        """
+        costs = self.estimate_costs(df) if costs is None else costs
+        planned = sum(costs.values())
+        unplanned = self._unplanned_cost(costs)
+        kinds = Counter(node.kind for node in self.nodes.values())
+        node_counts = ", ".join(f"{kinds[k]} {k}" for k in NODE_KINDS if kinds[k])
+        return (
+            f"FeaturePlan: {len(self.features)} features -> {len(self.nodes)} nodes "
+            f"({node_counts})\n"
+            f"Estimated cost: {planned:,.0f} planned vs {unplanned:,.0f} unplanned "
+            f"row operations ({unplanned / max(planned, 1):.1f}x)"
+        )
+
+    def explain(self, df: Optional[pd.DataFrame] = None) -> str:
+        """
+        Descreve o plano em árvore, com o custo estimado de cada nó.
+
+        :param df: DataFrame de informações opcional para estimar as linhas.
+        :return: Texto com o resumo e a árvore do plano.
+        """
+        costs = self.estimate_costs(df)
+        lines = [self.summary(costs=costs), ""]
+
+        def describe(node: PlanNode, depth: int):
+            cost = costs[(node.kind, node.key)]
+            line = f"{'  ' * depth}{node.label}  cost={cost:,.0f}"
+            if node.features:
+                line += f"  features={len(node.features)}"
+            lines.append(line)
+            for consumer in node.consumers:
+                if consumer.inputs[0] is node:
+                    describe(consumer, depth + 1)
+
+        for node in self.nodes.values():
+            if not node.inputs:
+                describe(node, 0)
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.explain()
+
+    def _execute_node(
+        self,
+        node: PlanNode,
+        df: pd.DataFrame,
+        values: dict,
+        filter_index: FilterIndex,
+    ):
+        inputs = [values[input_node] for input_node in node.inputs]
+        if node.kind == FILTER:
+            return filter_index.positions(dict(node.key))
+        if node.kind == GROUP:
+            (positions,) = inputs
+            return _group_rows(df, positions, node.key[1])
+        if node.kind == PREFIX:
+            ((target, _, _, _),) = inputs
+            column = df[node.key[1]].to_numpy(dtype=float, na_value=np.nan)[target]
+            return prefix_sums(column.reshape(-1, 1))
+        if node.kind == WINDOW:
+            (sums, counts), (_, row_start, row_end, _) = inputs
+            _, statistic, window, min_periods, shift = node.key
+            rolled = window_statistic(
+                sums, counts, row_start, window, min_periods, statistic
+            )
+            return shift_segments(rolled, row_start, row_end, shift)[:, 0]
+        if node.kind == TIME_WINDOW:
+            (sums, counts), (target, row_start, row_end, _) = inputs
+            _, time_field, days, shift = node.key
+            times = df[time_field].to_numpy(dtype="datetime64[ns]")[target]
+            if np.isnat(times).any():
+                raise ValueError(f"{time_field} values must not have NaT")
+            start = time_window_starts(
+                times.view("int64"), row_start, pd.Timedelta(days=days).value
+            )
+            counted = range_statistic(sums, counts, start, 1, "sum")
+            return shift_segments(counted, row_start, row_end, shift)[:, 0]
+        if node.kind == SHIFT:
+            ((target, row_start, row_end, _),) = inputs
+            _, field, shift = node.key
+            if not _is_numeric(df[field]):
+                return None
+            column = df[field].to_numpy(dtype=float, na_value=np.nan)[target]
+            shifted = shift_segments(column.reshape(-1, 1), row_start, row_end, shift)
+            return shifted[:, 0]
+        return node.feature.calculation(df)
+
+    def execution_order(self) -> List[PlanNode]:
+        """
+        Ordena os nós em profundidade a partir de cada filtro, para que os
+        intermediários de um grupo possam ser liberados assim que sua subárvore
+        termina.
+
+        :return: Lista de nós em ordem de execução.
+        """
+        order = []
+
+        def visit(node: PlanNode):
+            order.append(node)
+            for consumer in node.consumers:
+                if consumer.inputs[0] is node:
+                    visit(consumer)
+
+        for node in self.nodes.values():
+            if not node.inputs:
+                visit(node)
+        return order
+
+    def execute(
+        self, df: pd.DataFrame, engine: str = ROLLING_ENGINE
+    ) -> List[pd.DataFrame]:
+        """
+        Executa o plano, calculando cada nó uma única vez. Os resultados
+        intermediários são descartados assim que todos os seus consumidores forem
+        executados.
+
+        :param df: DataFrame com as informações dos jogos.
+        :param engine: "numpy", "pandas" ou "check" (ver rolling_engine). Com
+                       "pandas" as features de janela móvel e de janela de tempo usam
+                       o rolling do pandas; com "check" o resultado do plano é
+                       comparado a ele.
+        :return: Lista com o resultado de cada feature, na ordem recebida.
+        """
+        if engine not in ROLLING_ENGINES:
+            raise ValueError(f"Unknown rolling engine: {engine}")
+        if engine == "pandas":
+            return self._execute_with_pandas_rolling(df)
+
+        filter_index = _filter_index(df)
+        values = {}
+        outputs = {}
+        pending = {node: len(node.consumers) for node in self.nodes.values()}
+        for node in self.execution_order():
+            values[node] = self._execute_node(node, df, values, filter_index)
+            for position in node.features:
+                outputs[position] = self._feature_output(
+                    node, self.features[position], df, values
+                )
+            for input_node in node.inputs:
+                pending[input_node] -= 1
+                if pending[input_node] == 0:
+                    del values[input_node]
+            if pending[node] == 0:
+                del values[node]
+
+        results = []
+        for position, feature in enumerate(self.features):
+            output = outputs[position]
+            results.append(output.rename(feature.name) if output.ndim == 1 else output)
+
+        if engine == "check":
+            self._check_rolling(df, results)
+        return results
+
+    def _feature_output(
+        self, node: PlanNode, feature: ModelFeature, df: pd.DataFrame, values: dict
+    ):
+        value = values[node]
+        if node.kind not in (WINDOW, TIME_WINDOW, SHIFT):
+            return value
+        if value is None:
+            return feature.calculation(df)
+
+        target, _, _, partitions = values[node.inputs[-1]]
+        if partitions is None:
+            column = np.full(len(df), np.nan)
+            column[target] = value
+            return pd.Series(column, index=df.index)
+
+        partition_codes, partition_lookup = partitions
+        result = np.full((len(df), len(feature.partition_values)), np.nan)
+        for i, partition_value in enumerate(feature.partition_values):
+            code = partition_lookup.get(partition_value)
+            if code is not None:
+                rows = partition_codes == code
+                result[target[rows], i] = value[rows]
+        return pd.DataFrame(result, index=df.index, columns=feature.names)
+
+    def _pandas_rolling_outputs(self, df: pd.DataFrame) -> Dict[int, pd.DataFrame]:
+        positions = [
+            p for p, f in enumerate(self.features) if isinstance(f, RollingFeature)
+        ]
+        block = calculate_rolling_features(
+            df, [self.features[p] for p in positions], engine="pandas"
+        )
+
+        outputs = {}
+        start = 0
+        for position in positions:
+            feature = self.features[position]
+            end = start + len(feature.names)
+            columns = block.iloc[:, start:end]
+            outputs[position] = columns if feature.partition_by else columns.iloc[:, 0]
+            start = end
+
+        for position, feature in enumerate(self.features):
+            if isinstance(feature, GamesPlayedLastDays):
+                outputs[position] = feature.calculation(df)
+        return outputs
+
+    def _execute_with_pandas_rolling(self, df: pd.DataFrame) -> List[pd.DataFrame]:
+        outputs = self._pandas_rolling_outputs(df)
+        return [
+            outputs[p] if p in outputs else f.calculation(df)
+            for p, f in enumerate(self.features)
+        ]
+
+    def _check_rolling(self, df: pd.DataFrame, results: List[pd.DataFrame]) -> None:
+        expected = self._pandas_rolling_outputs(df)
+        if not expected:
+            return
+        check_equivalence(
+            pd.concat(list(expected.values()), axis=1),
+            pd.concat([results[p] for p in expected], axis=1),
+        )
+
+
+def _filter_index(df: pd.DataFrame) -> FilterIndex:
+    return current_feature_cache().get_or_compute(
+        df, ("filter_index",), lambda: FilterIndex(df)
+    )
+
+
+def _group_rows(
+    df: pd.DataFrame, positions: np.ndarray, partition_by: Optional[str]
+) -> Tuple:
+    """
+    Agrupa as linhas filtradas por roster_hash e, opcionalmente, pela coluna de
+    partição.
+
+    :return: Tupla (target, row_start, row_end, partitions), onde target são as
+             posições em df ordenadas por grupo e partitions é None ou
+             (código da partição de cada posição ordenada, {valor: código}).
+    """
+    codes, _ = pd.factorize(df["roster_hash"].to_numpy()[positions])
+    if partition_by is None:
+        order, row_start, row_end = group_layout(codes)
+        return positions[order], row_start, row_end, None
+
+    partition_codes, partition_uniques = pd.factorize(
+        df[partition_by].to_numpy()[positions]
+    )
+    codes = np.where(
+        (codes >= 0) & (partition_codes >= 0),
+        codes * len(partition_uniques) + partition_codes,
+        -1,
+    )
+    order, row_start, row_end = group_layout(codes)
+    partition_lookup = {value: code for code, value in enumerate(partition_uniques)}
+    return (
+        positions[order],
+        row_start,
+        row_end,
+        (partition_codes[order], partition_lookup),
+    )
+
+
+def _is_numeric(column: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(
+        column
+    )
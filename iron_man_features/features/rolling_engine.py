@@ -0,0 +1,217 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from iron_man_features.config import ROLLING_ENGINE
+from iron_man_features.features.calculation_functions import apply_filters
+from iron_man_features.features.model_feature import RollingFeature
+from iron_man_features.features.rolling_kernels import (
+    group_layout,
+    prefix_sums,
+    shift_segments,
+    window_statistic,
+)
+
+
+ROLLING_ENGINES = ("numpy", "pandas", "check")
+
+# Tolerância do modo "check": as somas acumuladas diferem do rolling do pandas
+# apenas por erro de arredondamento
+CHECK_RTOL = 1e-9
+CHECK_ATOL = 1e-12
+
+
+def filters_key(filters: dict) -> Tuple:
+    """
+    Cria uma chave hashable e independente de ordem para um conjunto de filtros.
+
+    :param filters: Dicionário de filtros.
+    :return: Tupla ordenada com os pares (coluna, valor).
+    """
+    return tuple(sorted((filters or {}).items()))
+
+
+def group_rolling_features(
+    features: List[RollingFeature],
+) -> Dict[Tuple, List[int]]:
+    """
+    Agrupa as features de janela móvel por (filtros, shift).
+
+    :param features: Lista de features de janela móvel.
+    :return: Dicionário {(filtros, shift): posições das features na lista}.
+    """
+    groups = defaultdict(list)
+    for position, feature in enumerate(features):
+        groups[(filters_key(feature.filters), feature.shift)].append(position)
+    return groups
+
+
+def group_by_window(features: List[RollingFeature]) -> Dict[Tuple, List[int]]:
+    """
+    Agrupa as features por (estatística, janela, min_periods).
+
+    :param features: Lista de features de janela móvel.
+    :return: Dicionário {(estatística, janela, min_periods): posições na lista}.
+    """
+    windows = defaultdict(list)
+    for position, feature in enumerate(features):
+        windows[(feature.statistic, feature.window, feature.min_periods)].append(
+            position
+        )
+    return windows
+
+
+def _filtered_columns(
+    df: pd.DataFrame, filters: dict, features: List[RollingFeature]
+) -> Tuple[pd.DataFrame, List[str]]:
+    fields = list(dict.fromkeys(f.field for f in features))
+    columns = list(dict.fromkeys(["roster_hash", *filters.keys(), *fields]))
+    return apply_filters(df, filters, columns=columns), fields
+
+
+def _rolling_group_pandas(
+    df: pd.DataFrame,
+    filters: dict,
+    shift: int,
+    features: List[RollingFeature],
+) -> pd.DataFrame:
+    filtered_df, _ = _filtered_columns(df, filters, features)
+    grouped_df = filtered_df.groupby("roster_hash", sort=False)
+
+    results = [None] * len(features)
+    for (statistic, window, min_periods), positions in group_by_window(
+        features
+    ).items():
+        window_fields = list(dict.fromkeys(features[p].field for p in positions))
+        rolling = grouped_df[window_fields].rolling(
+            window=window, min_periods=min_periods
+        )
+        rolled = getattr(rolling, statistic)().reset_index(level=0, drop=True)
+        rolled = rolled.groupby(filtered_df.loc[rolled.index, "roster_hash"]).shift(
+            shift
+        )
+        rolled = rolled.reindex(df.index)
+        for p in positions:
+            results[p] = rolled[features[p].field].rename(features[p].name)
+
+    return pd.concat(results, axis=1)
+
+
+def _rolling_group_numpy(
+    df: pd.DataFrame,
+    filters: dict,
+    shift: int,
+    features: List[RollingFeature],
+) -> pd.DataFrame:
+    filtered_df, fields = _filtered_columns(df, filters, features)
+
+    codes, _ = pd.factorize(filtered_df["roster_hash"])
+    order, row_start, row_end = group_layout(codes)
+    target = df.index.get_indexer(filtered_df.index)[order]
+    values = filtered_df[fields].to_numpy(dtype=float, na_value=np.nan)[order]
+    sums, counts = prefix_sums(values)
+    field_position = {field: i for i, field in enumerate(fields)}
+
+    result = np.full((len(df), len(features)), np.nan)
+    for (statistic, window, min_periods), positions in group_by_window(
+        features
+    ).items():
+        rolled = window_statistic(
+            sums, counts, row_start, window, min_periods, statistic
+        )
+        rolled = shift_segments(rolled, row_start, row_end, shift)
+        for p in positions:
+            result[target, p] = rolled[:, field_position[features[p].field]]
+
+    return pd.DataFrame(result, index=df.index, columns=[f.name for f in features])
+
+
+def check_equivalence(expected: pd.DataFrame, result: pd.DataFrame) -> None:
+    """
+    Verifica se dois blocos de features são equivalentes coluna a coluna.
+
+    :param expected: Bloco de referência (engine pandas).
+    :param result: Bloco a ser validado.
+    :raises ValueError: Se alguma coluna divergir além do erro de arredondamento.
+    """
+    mismatched = [
+        name
+        for i, name in enumerate(expected.columns)
+        if not np.allclose(
+            expected.iloc[:, i].to_numpy(dtype=float),
+            result.iloc[:, i].to_numpy(dtype=float),
+            rtol=CHECK_RTOL,
+            atol=CHECK_ATOL,
+            equal_nan=True,
+        )
+    ]
+    if mismatched:
+        raise ValueError(
+            f"Rolling engines diverge on {len(mismatched)} features: {mismatched}"
+        )
+
+
+def calculate_rolling_group(
+    df: pd.DataFrame,
+    filters: dict,
+    shift: int,
+    features: List[RollingFeature],
+    engine: str = ROLLING_ENGINE,
+) -> pd.DataFrame:
+    """
+    Calcula de uma vez todas as features de um mesmo grupo (filtros, shift).
+
+    O engine "numpy" ordena as linhas por roster uma única vez e calcula somas
+    acumuladas de todos os campos; cada janela é obtida da diferença dessas somas.
+    O engine "pandas" usa um groupby().rolling() por (estatística, janela), e o
+    modo "check" executa os dois e falha se os resultados divergirem.
+
+    :param df: DataFrame com as informações dos jogos.
+    :param filters: Filtros comuns ao grupo.
+    :param shift: Número de linhas para desconsiderar o jogo atual.
+    :param features: Features do grupo.
+    :param engine: "numpy", "pandas" ou "check".
+    :return: DataFrame com uma coluna por feature, alinhado ao índice de df.
+    """
+    if engine not in ROLLING_ENGINES:
+        raise ValueError(f"Unknown rolling engine: {engine}")
+    if engine == "pandas":
+        return _rolling_group_pandas(df, filters, shift, features)
+
+    result = _rolling_group_numpy(df, filters, shift, features)
+    if engine == "check":
+        check_equivalence(_rolling_group_pandas(df, filters, shift, features), result)
+    return result
+
+
+def calculate_rolling_features(
+    df: pd.DataFrame,
+    features: List[RollingFeature],
+    engine: str = ROLLING_ENGINE,
+) -> pd.DataFrame:
+    """
+    Calcula todas as features de janela móvel agrupando-as por (filtros, shift).
+
+    Features particionadas são expandidas em uma feature filtrada por valor.
+
+    :param df: DataFrame com as informações dos jogos.
+    :param features: Lista de features de janela móvel.
+    :param engine: "numpy", "pandas" ou "check".
+    :return: DataFrame com uma coluna por feature (uma por valor de partição nas
+             features particionadas), na ordem da lista recebida.
+    """
+    features = [expanded for f in features for expanded in f.expand_partitions()]
+    if not features:
+        return pd.DataFrame(index=df.index)
+
+    results = [None] * len(features)
+    for (filters, shift), positions in group_rolling_features(features).items():
+        group_features = [features[p] for p in positions]
+        block = calculate_rolling_group(
+            df, dict(filters), shift, group_features, engine=engine
+        )
+        for i, p in enumerate(positions):
+            results[p] = block.iloc[:, i]
+    return pd.concat(results, axis=1)
@@ -0,0 +1,152 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def group_layout(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ordena as linhas por grupo mantendo a ordem original dentro de cada grupo.
+
+    Linhas com código negativo (chave nula) são descartadas, como no groupby do
+    pandas.
+
+    :param codes: Código inteiro do grupo de cada linha.
+    :return: Tupla (order, row_start, row_end): posições ordenadas por grupo e, para
+             cada posição ordenada, o início e o fim (exclusivo) do seu segmento.
+    """
+    positions = np.flatnonzero(codes >= 0)
+    order = positions[np.argsort(codes[positions], kind="stable")]
+    sorted_codes = codes[order]
+
+    is_start = np.ones(len(order), dtype=bool)
+    is_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], len(order))
+    segment = np.cumsum(is_start) - 1
+    return order, starts[segment], ends[segment]
+
+
+def prefix_sums(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula as somas e contagens acumuladas de valores não nulos.
+
+    :param values: Matriz (linhas, campos) já ordenada por grupo.
+    :return: Tupla (sums, counts) com uma linha extra de zeros no início.
+    """
+    valid = ~np.isnan(values)
+    sums = np.zeros((len(values) + 1, values.shape[1]))
+    counts = np.zeros((len(values) + 1, values.shape[1]), dtype=np.int64)
+    np.cumsum(np.where(valid, values, 0.0), axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
+    return sums, counts
+
+
+def window_statistic(
+    sums: np.ndarray,
+    counts: np.ndarray,
+    row_start: np.ndarray,
+    window: Optional[int],
+    min_periods: int,
+    statistic: str,
+) -> np.ndarray:
+    """
+    Calcula soma ou média de uma janela a partir das somas acumuladas.
+
+    :param sums: Somas acumuladas retornadas por prefix_sums.
+    :param counts: Contagens acumuladas retornadas por prefix_sums.
+    :param row_start: Início do segmento de cada linha.
+    :param window: Tamanho da janela. None para janela expansiva.
+    :param min_periods: Número mínimo de valores não nulos na janela.
+    :param statistic: 'sum' ou 'mean'.
+    :return: Matriz (linhas, campos) com a estatística de cada janela.
+    """
+    end = np.arange(1, len(row_start) + 1)
+    start = row_start if window is None else np.maximum(end - window, row_start)
+    return range_statistic(sums, counts, start, min_periods, statistic)
+
+
+def range_statistic(
+    sums: np.ndarray,
+    counts: np.ndarray,
+    start: np.ndarray,
+    min_periods: int,
+    statistic: str,
+) -> np.ndarray:
+    """
+    Calcula soma ou média das linhas [start, linha atual] a partir das somas
+    acumuladas.
+
+    :param sums: Somas acumuladas retornadas por prefix_sums.
+    :param counts: Contagens acumuladas retornadas por prefix_sums.
+    :param start: Primeira linha da janela de cada linha.
+    :param min_periods: Número mínimo de valores não nulos na janela.
+    :param statistic: 'sum' ou 'mean'.
+    :return: Matriz (linhas, campos) com a estatística de cada janela.
+    """
+    end = np.arange(1, len(start) + 1)
+    window_sum = sums[end] - sums[start]
+    window_count = counts[end] - counts[start]
+
+    if statistic == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = window_sum / window_count
+    elif statistic == "sum":
+        result = window_sum
+    else:
+        raise ValueError(f"Unknown rolling statistic: {statistic}")
+
+    result[window_count < min_periods] = np.nan
+    return result
+
+
+def time_window_starts(
+    times: np.ndarray, row_start: np.ndarray, offset: int
+) -> np.ndarray:
+    """
+    Calcula o início de janelas de tempo (t - offset, t] terminando em cada linha,
+    como o rolling(f"{n}D", on=...) do pandas aplicado a cada grupo.
+
+    Os instantes de cada segmento são trocados por seu posto entre os instantes e
+    os limites t - offset, de forma que (segmento, posto) vira uma única chave
+    inteira crescente e todas as janelas saem de um único searchsorted.
+
+    :param times: Instantes (int64) de cada linha, ordenados por grupo.
+    :param row_start: Início do segmento de cada linha.
+    :param offset: Tamanho da janela, na unidade de times.
+    :return: Primeira linha da janela de cada linha.
+    :raises ValueError: Se os instantes não forem crescentes dentro de um segmento.
+    """
+    rows = len(times)
+    is_start = np.ones(rows, dtype=bool)
+    is_start[1:] = row_start[1:] != row_start[:-1]
+    segment = np.cumsum(is_start) - 1
+
+    uniques, ranks = np.unique(
+        np.concatenate([times, times - offset]), return_inverse=True
+    )
+    keys = segment * len(uniques) + ranks[:rows]
+    if np.any(keys[1:] < keys[:-1]):
+        raise ValueError("times must be monotonic within each group")
+    bounds = segment * len(uniques) + ranks[rows:]
+    return np.searchsorted(keys, bounds, side="right")
+
+
+def shift_segments(
+    values: np.ndarray, row_start: np.ndarray, row_end: np.ndarray, shift: int
+) -> np.ndarray:
+    """
+    Desloca os valores dentro de cada segmento, como groupby().shift().
+
+    :param values: Matriz (linhas, campos) ordenada por grupo.
+    :param row_start: Início do segmento de cada linha.
+    :param row_end: Fim (exclusivo) do segmento de cada linha.
+    :param shift: Número de linhas a deslocar.
+    :return: Matriz deslocada, com NaN onde a origem cai fora do segmento.
+    """
+    if shift == 0:
+        return values
+    source = np.arange(len(values)) - shift
+    valid = (source >= row_start) & (source < row_end)
+    shifted = np.full(values.shape, np.nan)
+    shifted[valid] = values[source[valid]]
+    return shifted
@@ -294,4 +294,312 @@ QUERIES = {
         LEFT JOIN team_game op ON t.game_id = op.game_id AND t.team_id <> op.team_id
         ORDER BY t.match_date;
     """,
+    "team_game": """  # noqa
+        SELECT
+            m.id AS match_id,
+            tg.team_id,
+            tg.game_id,
+            g.hltv_id AS game_hltv_id,
+            m.lan,
+            m.start_date,
+            t.name AS team_name,
+            GROUP_CONCAT(
+                DISTINCT pg.player_id
+                ORDER BY pg.player_id SEPARATOR '-'
+            ) roster_hash,
+            tg.starting_side,
+            tg.score_ct,
+            tg.won_pistol_ct,
+            tg.score_tr,
+            tg.won_pistol_tr,
+            tg.clutches,
+            tg.first_kills,
+            g.map_id,
+            LOWER(maps.name) AS played_map,
+            eht.rank AS hltv_rank,
+            score + score_opponent AS total_rounds,
+            score,
+            SUM(pg.kills) AS kills,
+            SUM(pg.deaths) AS deaths,
+            SUM(pg.assists) AS assists,
+            SUM(pg.flash_assists) AS flash_assists,
+            SUM(pg.fk_diff) AS fk_diff,
+            SUM(pg.kills_ct) AS kills_ct,
+            SUM(pg.deaths_ct) AS deaths_ct,
+            SUM(pg.assists_ct) AS assists_ct,
+            SUM(pg.flash_assists_ct) AS flash_assists_ct,
+            SUM(pg.fk_diff_ct) AS fk_diff_ct,
+            SUM(pg.kills_tr) AS kills_tr,
+            SUM(pg.deaths_tr) AS deaths_tr,
+            SUM(pg.assists_tr) AS assists_tr,
+            SUM(pg.flash_assists_tr) AS flash_assists_tr,
+            SUM(pg.fk_diff_tr) AS fk_diff_tr,
+            MAX(pg.rating) AS max_rating,
+            AVG(pg.rating) AS avg_rating,
+            MIN(pg.rating) AS min_rating,
+            MAX(pg.kast) AS max_kast,
+            AVG(pg.kast) AS avg_kast,
+            MIN(pg.kast) AS min_kast,
+            MAX(pg.rating_ct) AS max_rating_ct,
+            AVG(pg.rating_ct) AS avg_rating_ct,
+            MIN(pg.rating_ct) AS min_rating_ct,
+            MAX(pg.rating_tr) AS max_rating_tr,
+            AVG(pg.rating_tr) AS avg_rating_tr,
+            MIN(pg.rating_tr) AS min_rating_tr
+        FROM team_games tg
+        LEFT JOIN teams t ON t.id = tg.team_id
+        LEFT JOIN games g ON g.id = tg.game_id
+        LEFT JOIN maps ON maps.id = g.map_id
+        LEFT JOIN matches m ON m.id = g.match_id
+        LEFT JOIN events e ON e.id = m.event_id
+        LEFT JOIN events_have_teams eht ON eht.event_id = e.id AND eht.team_id = tg.team_id
+        LEFT JOIN player_games pg ON pg.team_game_id = tg.id
+        GROUP BY tg.id
+        ORDER BY m.start_date, tg.game_id, tg.team_id;
+    """,
+}
+
+
+# team_game is the per-team-game aggregate behind the team_game CTE of both
+# games_for_elo and team_games. With DOWNLOAD_SHARED_TEAM_GAME it is downloaded
+# once in their place and both are derived from it on the client (see
+# data_manager.views).
+SHARED_VIEWS = {"games_for_elo": "team_game", "team_games": "team_game"}
+
+# Results returned by default by downloads.get_dataframes
+RESULT_NAMES = [name for name in QUERIES if name not in SHARED_VIEWS.values()]
+
+# Historical queries downloaded incrementally (see downloads.get_dataframes): the
+# date and id columns of their watermark and the columns identifying a row
+WATERMARKS = {
+    "games_for_elo": ("start_date", "game_id"),
+    "team_games": ("match_date", "game_id"),
+    "team_game": ("start_date", "game_id"),
+}
+ROW_KEYS = ["game_id", "team_id"]
+
+# Same queries restricted to matches since :since. The filter goes before the
+# GROUP BY of the team_game aggregate, so the database only aggregates the
+# player_games of those matches
+INCREMENTAL_QUERIES = {
+    name: QUERIES[name].replace(
+        "GROUP BY tg.id", "WHERE m.start_date >= :since\n            GROUP BY tg.id"
+    )
+    for name in WATERMARKS
+}
+
+
+# Cheap probe of the source tables: a stored query result is reused while the row
+# count and the largest id of every table it reads stay the same. This sees rows
+# inserted or deleted, not rows edited in place; set DOWNLOAD_FULL_REFRESH to
+# download every query in full again. events_have_teams has no id column, so its
+# largest event id is probed. Queries without sources are small and read rows that
+# are edited in place (lineups and ranks of upcoming matches), so they are
+# downloaded again on every online run.
+SOURCE_PROBE = """
+    SELECT 'team_games' AS source, COUNT(*) AS row_count, MAX(id) AS max_id
+    FROM team_games
+    UNION ALL
+    SELECT 'games', COUNT(*), MAX(id) FROM games
+    UNION ALL
+    SELECT 'player_games', COUNT(*), MAX(id) FROM player_games
+    UNION ALL
+    SELECT 'matches', COUNT(*), MAX(id) FROM matches
+    UNION ALL
+    SELECT 'events', COUNT(*), MAX(id) FROM events
+    UNION ALL
+    SELECT 'events_have_teams', COUNT(*), MAX(event_id) FROM events_have_teams
+    UNION ALL
+    SELECT 'teams', COUNT(*), MAX(id) FROM teams
+    UNION ALL
+    SELECT 'maps', COUNT(*), MAX(id) FROM maps
+"""
+HISTORICAL_SOURCES = [
+    "team_games",
+    "games",
+    "player_games",
+    "matches",
+    "events",
+    "events_have_teams",
+    "teams",
+    "maps",
+]
+# Same probe for the rows of the historical queries that an incremental download
+# from :since does not read again (rows of matches before it or without a date).
+# The incremental download is only used while it is unchanged since the snapshot
+HISTORY_PROBE = """
+    SELECT 'matches' AS source, COUNT(*) AS row_count, MAX(m.id) AS max_id
+    FROM matches m
+    WHERE m.start_date < :since OR m.start_date IS NULL
+    UNION ALL
+    SELECT 'games', COUNT(*), MAX(g.id)
+    FROM games g
+    LEFT JOIN matches m ON m.id = g.match_id
+    WHERE m.start_date < :since OR m.start_date IS NULL
+    UNION ALL
+    SELECT 'team_games', COUNT(*), MAX(tg.id)
+    FROM team_games tg
+    LEFT JOIN games g ON g.id = tg.game_id
+    LEFT JOIN matches m ON m.id = g.match_id
+    WHERE m.start_date < :since OR m.start_date IS NULL
+    UNION ALL
+    SELECT 'player_games', COUNT(*), MAX(pg.id)
+    FROM player_games pg
+    LEFT JOIN team_games tg ON tg.id = pg.team_game_id
+    LEFT JOIN games g ON g.id = tg.game_id
+    LEFT JOIN matches m ON m.id = g.match_id
+    WHERE m.start_date < :since OR m.start_date IS NULL
+    UNION ALL
+    SELECT 'events_have_teams', COUNT(*), MAX(eht.event_id)
+    FROM events_have_teams eht
+    WHERE eht.event_id IN (
+        SELECT m.event_id FROM matches m WHERE m.start_date < :since
+    )
+"""
+# Date of the last match with games, from which the next incremental download
+# starts (minus the overlap)
+LAST_MATCH_DATE = """
+    SELECT MAX(m.start_date) AS last_date
+    FROM matches m
+    JOIN games g ON g.match_id = m.id
+"""
+QUERY_SOURCES = {
+    "games_for_elo": HISTORICAL_SOURCES,
+    "matches_to_predict": None,
+    "team_games": HISTORICAL_SOURCES,
+    "team_game": HISTORICAL_SOURCES,
+}
+
+
+def _with_opponent(columns: list) -> list:
+    return columns + [f"{column}_op" for column in columns]
+
+
+# Compact dtypes applied to each query result at load time (see apply_schema).
+# Low-cardinality strings are categoricals, per-round statistics fit in float32,
+# counts in nullable Int8/Int16 and flags and targets are nullable booleans.
+# Columns not listed keep the type inferred by read_sql. The Elo scores stay
+# float64: a missing score must keep behaving as NaN in EloSystem.
+SCHEMAS = {
+    "games_for_elo": {
+        "lan": "boolean",
+        "played_map": "category",
+        "map_id": "Int16",
+        "total_rounds": "Int16",
+        **{c: "category" for c in _with_opponent(["team_name", "starting_side"])},
+        **{c: "Int16" for c in _with_opponent(["score_ct", "score_tr", "hltv_rank"])},
+    },
+    "matches_to_predict": {
+        "max_maps": "Int8",
+        "played_map": "category",
+        **{c: "category" for c in _with_opponent(["team_name"])},
+        **{c: "Int16" for c in _with_opponent(["hltv_rank"])},
+    },
+    "team_games": {
+        "lan": "boolean",
+        "played_map": "category",
+        "total_rounds": "Int16",
+        **{c: "category" for c in _with_opponent(["team_name", "starting_side"])},
+        **{c: "Int8" for c in _with_opponent(["won_pistol_ct", "won_pistol_tr"])},
+        **{
+            c: "Int16"
+            for c in _with_opponent(
+                [
+                    "score_ct",
+                    "score_tr",
+                    "clutches",
+                    "first_kills",
+                    "hltv_rank",
+                    "score",
+                    "kills",
+                    "deaths",
+                    "assists",
+                    "flash_assists",
+                    "fk_diff",
+                    "kills_ct",
+                    "deaths_ct",
+                    "assists_ct",
+                    "flash_assists_ct",
+                    "fk_diff_ct",
+                    "kills_tr",
+                    "deaths_tr",
+                    "assists_tr",
+                    "flash_assists_tr",
+                    "fk_diff_tr",
+                ]
+            )
+        },
+        **{
+            c: "float32"
+            for c in _with_opponent(
+                [
+                    "max_rating",
+                    "avg_rating",
+                    "min_rating",
+                    "max_rating_ct",
+                    "avg_rating_ct",
+                    "min_rating_ct",
+                    "max_rating_tr",
+                    "avg_rating_tr",
+                    "min_rating_tr",
+                ]
+            )
+        },
+        "max_kast": "float32",
+        "avg_kast": "float32",
+        "min_kast": "float32",
+        # Derived columns
+        "pistols_won": "Int8",
+        "rank_range_op": "Int16",
+        "rank_range": "Int16",
+        "rank_diff": "Int16",
+        "player_carried_down": "boolean",
+        "player_carried": "boolean",
+        "rounds_lost_on_win": "Int16",
+        "rounds_won_on_loss": "Int16",
+        "kills_per_round": "float32",
+        "deaths_per_round": "float32",
+        "first_kills_per_round": "float32",
+        "flash_assists_per_round": "float32",
+        "clutches_per_round": "float32",
+        "game_played": "Int8",
+        "won": "boolean",
+    },
+    # Only lossless casts: score and the ratings are compared and divided as
+    # downloaded when the views are derived, and get their view dtypes afterwards
+    "team_game": {
+        "lan": "boolean",
+        "played_map": "category",
+        "map_id": "Int16",
+        "total_rounds": "Int16",
+        "team_name": "category",
+        "starting_side": "category",
+        "won_pistol_ct": "Int8",
+        "won_pistol_tr": "Int8",
+        **{
+            c: "Int16"
+            for c in [
+                "score_ct",
+                "score_tr",
+                "clutches",
+                "first_kills",
+                "hltv_rank",
+                "kills",
+                "deaths",
+                "assists",
+                "flash_assists",
+                "fk_diff",
+                "kills_ct",
+                "deaths_ct",
+                "assists_ct",
+                "flash_assists_ct",
+                "fk_diff_ct",
+                "kills_tr",
+                "deaths_tr",
+                "assists_tr",
+                "flash_assists_tr",
+                "fk_diff_tr",
+            ]
+        },
+    },
 }
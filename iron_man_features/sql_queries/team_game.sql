@@ -0,0 +1,61 @@
+SELECT
+    m.id AS match_id,
+    tg.team_id,
+    tg.game_id,
+    g.hltv_id AS game_hltv_id,
+    m.lan,
+    m.start_date,
+    t.name AS team_name,
+    GROUP_CONCAT(
+        DISTINCT pg.player_id
+        ORDER BY pg.player_id SEPARATOR '-'
+    ) roster_hash,
+    tg.starting_side,
+    tg.score_ct,
+    tg.won_pistol_ct,
+    tg.score_tr,
+    tg.won_pistol_tr,
+    tg.clutches,
+    tg.first_kills,
+    g.map_id,
+    LOWER(maps.name) AS played_map,
+    eht.rank AS hltv_rank,
+    score + score_opponent AS total_rounds,
+    score,
+    SUM(pg.kills) AS kills,
+    SUM(pg.deaths) AS deaths,
+    SUM(pg.assists) AS assists,
+    SUM(pg.flash_assists) AS flash_assists,
+    SUM(pg.fk_diff) AS fk_diff,
+    SUM(pg.kills_ct) AS kills_ct,
+    SUM(pg.deaths_ct) AS deaths_ct,
+    SUM(pg.assists_ct) AS assists_ct,
+    SUM(pg.flash_assists_ct) AS flash_assists_ct,
+    SUM(pg.fk_diff_ct) AS fk_diff_ct,
+    SUM(pg.kills_tr) AS kills_tr,
+    SUM(pg.deaths_tr) AS deaths_tr,
+    SUM(pg.assists_tr) AS assists_tr,
+    SUM(pg.flash_assists_tr) AS flash_assists_tr,
+    SUM(pg.fk_diff_tr) AS fk_diff_tr,
+    MAX(pg.rating) AS max_rating,
+    AVG(pg.rating) AS avg_rating,
+    MIN(pg.rating) AS min_rating,
+    MAX(pg.kast) AS max_kast,
+    AVG(pg.kast) AS avg_kast,
+    MIN(pg.kast) AS min_kast,
+    MAX(pg.rating_ct) AS max_rating_ct,
+    AVG(pg.rating_ct) AS avg_rating_ct,
+    MIN(pg.rating_ct) AS min_rating_ct,
+    MAX(pg.rating_tr) AS max_rating_tr,
+    AVG(pg.rating_tr) AS avg_rating_tr,
+    MIN(pg.rating_tr) AS min_rating_tr
+FROM team_games tg
+LEFT JOIN teams t ON t.id = tg.team_id
+LEFT JOIN games g ON g.id = tg.game_id
+LEFT JOIN maps ON maps.id = g.map_id
+LEFT JOIN matches m ON m.id = g.match_id
+LEFT JOIN events e ON e.id = m.event_id
+LEFT JOIN events_have_teams eht ON eht.event_id = e.id AND eht.team_id = tg.team_id
+LEFT JOIN player_games pg ON pg.team_game_id = tg.id
+GROUP BY tg.id
+ORDER BY m.start_date, tg.game_id, tg.team_id;
@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from iron_man_features.data_manager.schema import apply_schema
+from iron_man_features.features import MAP_NAMES, RANK_RANGES
+from iron_man_features.queries import SCHEMAS
+
+
+FEATURE_FIELDS = [
+    "won",
+    "kills_per_round",
+    "deaths_per_round",
+    "first_kills_per_round",
+    "flash_assists_per_round",
+    "avg_rating",
+    "avg_kast",
+    "clutches_per_round",
+    "pistols_won",
+    "hltv_rank",
+    "hltv_rank_op",
+    "player_carried",
+    "player_carried_down",
+    "rounds_lost_on_win",
+    "rounds_won_on_loss",
+]
+ELO_FIELDS = [
+    f"{key}_elo{postfix}"
+    for key in ["overall"] + MAP_NAMES
+    for postfix in ("", "_slow", "_fast")
+]
+
+
+def make_feature_frame(
+    n_rows: int = 1500, n_rosters: int = 25, seed: int = 0
+) -> pd.DataFrame:
+    """
+    Information DataFrame of the feature pipeline, sorted by match_date.
+
+    About 10% of every field is NaN, some rows have no roster_hash and dates are
+    drawn from few days, so several games of a roster share a timestamp.
+    """
+    rng = np.random.default_rng(seed)
+    rosters = pd.array(rng.integers(0, n_rosters, n_rows), dtype="Int32")
+    rosters[rng.random(n_rows) < 0.03] = pd.NA
+    df = pd.DataFrame(
+        {
+            "roster_hash": rosters,
+            "match_date": pd.Timestamp("2024-01-01")
+            + pd.to_timedelta(rng.integers(0, 120, n_rows), unit="D")
+            + pd.to_timedelta(rng.choice([0, 12], n_rows), unit="h"),
+            "played_map": rng.choice(MAP_NAMES, n_rows),
+            "rank_range_op": rng.choice(RANK_RANGES + [np.nan], n_rows),
+            "game_played": 1,
+        }
+    )
+    for field in FEATURE_FIELDS + ELO_FIELDS:
+        values = rng.normal(size=n_rows)
+        values[rng.random(n_rows) < 0.1] = np.nan
+        df[field] = values
+    return df.sort_values("match_date", kind="stable", ignore_index=True)
+
+
+def make_games_for_elo(
+    n_games: int = 300, n_teams: int = 12, seed: int = 0
+) -> pd.DataFrame:
+    """
+    games_for_elo result with NaN scores and ranks, null rosters and self-play
+    games (the same roster on both sides), sorted by start_date and game_id. Every
+    match has two games.
+    """
+    rng = np.random.default_rng(seed)
+    team = rng.integers(1, n_teams + 1, n_games)
+    opponent = (team + rng.integers(1, n_teams, n_games) - 1) % n_teams + 1
+    players = {t: [f"{t}{i}" for i in range(5)] for t in range(1, n_teams + 1)}
+
+    def roster(t):
+        lineup = list(players[t])
+        lineup[rng.integers(5)] = f"{t}sub{rng.integers(2)}"
+        return "-".join(sorted(lineup))
+
+    roster_hash = [roster(t) for t in team]
+    roster_hash_op = [roster(t) for t in opponent]
+    for i in range(0, n_games, 41):
+        roster_hash_op[i] = roster_hash[i]
+    for i in range(7, n_games, 53):
+        roster_hash[i] = None
+    score = rng.integers(0, 17, n_games).astype(float)
+    score_op = np.where(score == 16, rng.integers(0, 15, n_games), 16).astype(float)
+    score[rng.random(n_games) < 0.03] = np.nan
+    hltv_rank = rng.integers(1, 300, (2, n_games)).astype(float)
+    hltv_rank[rng.random((2, n_games)) < 0.1] = np.nan
+    games = pd.DataFrame(
+        {
+            "team_id": team,
+            "game_id": np.arange(1, n_games + 1),
+            "match_id": np.arange(n_games) // 2 + 1,
+            "start_date": pd.Timestamp("2023-01-01")
+            + pd.to_timedelta(np.sort(rng.integers(0, 400, n_games)), unit="D"),
+            "roster_hash": roster_hash,
+            "played_map": rng.choice([m.capitalize() for m in MAP_NAMES], n_games),
+            "score": score,
+            "hltv_rank": hltv_rank[0],
+            "team_id_op": opponent,
+            "roster_hash_op": roster_hash_op,
+            "score_op": score_op,
+            "hltv_rank_op": hltv_rank[1],
+        }
+    )
+    return games.sort_values(["start_date", "game_id"], ignore_index=True)
+
+
+def make_team_game(n_games: int = 60, seed: int = 0) -> pd.DataFrame:
+    """
+    team_game result with the dtypes of its schema, sorted by start_date, game_id
+    and team_id.
+
+    Every 9th game has a single team, every 11th no score and every 13th no
+    rounds; some teams have no rank or no players, and some ranks and ratings sit
+    on the rank_range bounds and player_carried thresholds.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for game_id in range(1, n_games + 1):
+        teams = rng.choice(np.arange(1, 9), 2, replace=False)
+        if game_id % 9 == 0:
+            teams = teams[:1]
+        for side, team_id in enumerate(sorted(teams)):
+            score_ct, score_tr = rng.integers(0, 10, 2)
+            score = np.nan if game_id % 11 == 0 else float(rng.integers(0, 17))
+            total_rounds = 0 if game_id % 13 == 0 else int(rng.integers(16, 31))
+            no_players = rng.random() < 0.05
+            ratings = rng.choice([0.5, 1.6, 0.3, 1.9, 1.0], 3)
+            row = {
+                "match_id": (game_id + 1) // 2,
+                "team_id": team_id,
+                "game_id": game_id,
+                "game_hltv_id": game_id * 7,
+                "lan": bool(game_id % 2),
+                "start_date": pd.Timestamp("2024-01-01")
+                + pd.Timedelta(days=game_id // 3),
+                "team_name": f"Team {team_id}",
+                "roster_hash": None if no_players else f"{team_id}-1-2-3-4",
+                "starting_side": ["CT", "T"][side],
+                "score_ct": score_ct,
+                "won_pistol_ct": int(rng.integers(0, 2)),
+                "score_tr": score_tr,
+                "won_pistol_tr": int(rng.integers(0, 2)),
+                "clutches": int(rng.integers(0, 4)),
+                "first_kills": int(rng.integers(0, 15)),
+                "map_id": int(rng.integers(1, 8)),
+                "played_map": rng.choice(MAP_NAMES),
+                "hltv_rank": (
+                    np.nan
+                    if rng.random() < 0.1
+                    else rng.choice([5, 20, 500, 501, rng.integers(1, 700)])
+                ),
+                "total_rounds": total_rounds,
+                "score": score,
+            }
+            for side_suffix in ("", "_ct", "_tr"):
+                for stat in ("kills", "deaths", "assists", "flash_assists", "fk_diff"):
+                    row[f"{stat}{side_suffix}"] = (
+                        np.nan if no_players else int(rng.integers(0, 90))
+                    )
+                for aggregate, rating in zip(("max", "avg", "min"), ratings):
+                    row[f"{aggregate}_rating{side_suffix}"] = (
+                        np.nan if no_players else float(rating)
+                    )
+            for aggregate in ("max", "avg", "min"):
+                row[f"{aggregate}_kast"] = np.nan if no_players else rng.uniform(40, 90)
+            rows.append(row)
+    team_game = pd.DataFrame(rows)
+    return apply_schema(team_game, SCHEMAS["team_game"])
+
+
+@pytest.fixture
+def feature_frame() -> pd.DataFrame:
+    return make_feature_frame()
+
+
+@pytest.fixture
+def games_for_elo() -> pd.DataFrame:
+    return make_games_for_elo()
+
+
+@pytest.fixture
+def team_game() -> pd.DataFrame:
+    return make_team_game()
@@ -0,0 +1,138 @@
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from iron_man_features.data_manager import downloads
+
+
+def _team_game(game_ids) -> pd.DataFrame:
+    # Two teams per game and one game per day
+    game_ids = [game_id for game_id in game_ids for _ in range(2)]
+    return pd.DataFrame(
+        {
+            "start_date": pd.Timestamp("2024-01-01")
+            + pd.to_timedelta(game_ids, unit="D"),
+            "game_id": game_ids,
+            "team_id": [1, 2] * (len(game_ids) // 2),
+            "score": [16.0] * len(game_ids),
+        }
+    )
+
+
+class FakeDatabase:
+    """
+    team_game result standing for the database, with the probes derived from it.
+    """
+
+    def __init__(self, n_games: int):
+        self.team_game = _team_game(range(1, n_games + 1))
+        self.reads = []
+
+    def probe(self) -> dict:
+        return {"team_games": [len(self.team_game), int(self.team_game.index.max())]}
+
+    def read_query(self, query, schema, params=None, chunksize=None):
+        self.reads.append(params)
+        df = self.team_game
+        if params is not None:
+            df = df[df["start_date"] >= pd.Timestamp(params["since"])]
+        return downloads.apply_schema(df.reset_index(drop=True), schema)
+
+    def probe_history(self, since):
+        old = self.team_game[self.team_game["start_date"] < since]
+        return {"team_games": [len(old), int(old.index.max())]}
+
+    def last_match_date(self):
+        return self.team_game["start_date"].max()
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase(20)
+    for function in ("read_query", "probe_history", "last_match_date"):
+        monkeypatch.setattr(downloads, function, getattr(database, function))
+    return database
+
+
+def _download(database, directory, **kwargs):
+    return downloads.download_query(
+        "team_game", database.probe(), str(directory), overlap_days=3, **kwargs
+    )
+
+
+def test_reuses_the_snapshot_while_the_probe_is_the_same(tmp_path, database):
+    first = _download(database, tmp_path)
+    second = _download(database, tmp_path)
+    assert database.reads == [None]
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_full_refresh_ignores_the_snapshot(tmp_path, database):
+    _download(database, tmp_path)
+    _download(database, tmp_path, full_refresh=True)
+    assert database.reads == [None, None]
+
+
+def test_schema_change_discards_the_snapshot(tmp_path, database, monkeypatch):
+    _download(database, tmp_path)
+    schemas = {**downloads.SCHEMAS, "team_game": {"score": "float32"}}
+    monkeypatch.setattr(downloads, "SCHEMAS", schemas)
+    assert downloads.load_snapshot("team_game", str(tmp_path)) == (None, None)
+
+    df = _download(database, tmp_path)
+    assert database.reads == [None, None]
+    assert df["score"].dtype == "float32"
+
+
+def test_downloads_the_new_matches_since_the_saved_start(tmp_path, database):
+    _download(database, tmp_path)
+    # A correction within the overlap and a new game
+    database.team_game.loc[database.team_game["game_id"] == 19, "score"] = 3.0
+    database.team_game = pd.concat(
+        [database.team_game, _team_game([21]).set_axis([40, 41])]
+    )
+
+    df = _download(database, tmp_path)
+    assert database.reads[1] == {"since": pd.Timestamp("2024-01-18")}
+    pd.testing.assert_frame_equal(df, database.read_query(None, {}))
+
+
+def test_change_before_the_window_downloads_in_full(tmp_path, database):
+    _download(database, tmp_path)
+    # An old game is deleted when a new one is added
+    database.team_game = pd.concat(
+        [database.team_game.iloc[2:], _team_game([21]).set_axis([40, 41])]
+    )
+
+    df = _download(database, tmp_path)
+    assert database.reads == [None, None]
+    assert 1 not in df["game_id"].to_numpy()
+    pd.testing.assert_frame_equal(df, database.read_query(None, {}))
+
+
+def test_chunked_read_matches_a_single_read(monkeypatch):
+    engine = sqlalchemy.create_engine("sqlite://")
+    monkeypatch.setattr(downloads, "engine", engine)
+    df = pd.DataFrame(
+        {
+            "team_name": ["a", "b", None, "c", "a", "d"],
+            "rounds": [13, 16, None, 9, 12, 2.5],
+            "pistols": [0, 1, None, 2, 1, 0],
+            "rate": [0.5, None, None, 0.25, 1.0, 0.75],
+        }
+    )
+    df.to_sql("result", engine, index=False)
+    schema = {
+        "team_name": "category",
+        "rounds": "Int8",
+        "pistols": "Int8",
+        "rate": "float32",
+    }
+
+    query = "SELECT * FROM result"
+    expected = downloads.apply_schema(pd.read_sql(query, engine), schema)
+    result = downloads.read_query(query, schema, chunksize=2)
+    # Only the last chunk has a value that does not fit its dtype
+    assert result["rounds"].dtype == "float64"
+    assert result["pistols"].dtype == "Int8"
+    pd.testing.assert_frame_equal(result, expected)
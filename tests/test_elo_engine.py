@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from iron_man_features import datasets, elo_engine
+from iron_man_features.data_manager.interning import KeyInterner
+from iron_man_features.elo_engine import (
+    check_elo_equivalence,
+    state_from_dicts,
+    state_to_dicts,
+)
+from iron_man_features.elo_system import EloSystem, add_elos, calculate_elo_systems
+
+
+CONFIGS = datasets.ELO_SYSTEMS_CONFIG
+
+
+def _systems():
+    return [EloSystem(**config) for config in CONFIGS]
+
+
+def _calculate_in_runs(games: pd.DataFrame, cuts: list, engine: str = "array"):
+    elo_systems = _systems()
+    for cut in cuts + [len(games)]:
+        calculate_elo_systems(elo_systems, games.iloc[:cut], engine=engine)
+    return elo_systems
+
+
+def test_fixture_has_the_edge_cases(games_for_elo):
+    assert games_for_elo["score"].isna().any()
+    assert games_for_elo["roster_hash"].isna().any()
+    assert (games_for_elo["roster_hash"] == games_for_elo["roster_hash_op"]).any()
+
+
+@pytest.mark.parametrize("engine", ["array", "check"])
+def test_array_engine_matches_iterrows(games_for_elo, engine):
+    expected = _systems()
+    calculate_elo_systems(expected, games_for_elo, engine="iterrows")
+    result = _systems()
+    calculate_elo_systems(result, games_for_elo, engine=engine)
+    for reference, elo_system in zip(expected, result):
+        check_elo_equivalence(reference, elo_system)
+
+
+@pytest.mark.parametrize("engine", ["array", "iterrows"])
+def test_runs_split_mid_match_match_a_single_run(games_for_elo, engine):
+    cuts = [101, 150, 151, 233]
+    match_ids = games_for_elo["match_id"].to_numpy()
+    assert all(match_ids[cut - 1] == match_ids[cut] for cut in (101, 151, 233))
+
+    expected = _calculate_in_runs(games_for_elo, [], engine="iterrows")
+    for reference, elo_system in zip(
+        expected, _calculate_in_runs(games_for_elo, cuts, engine=engine)
+    ):
+        check_elo_equivalence(reference, elo_system)
+
+
+def test_checkpoint_resumes_under_another_interning(
+    games_for_elo, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(datasets, "ELO_CHECKPOINT_DIR", str(tmp_path))
+    expected = _calculate_in_runs(games_for_elo, [], engine="iterrows")
+
+    cut = 151
+    first = KeyInterner.fit({"games_for_elo": games_for_elo.iloc[:cut]})
+    elo_systems = _systems()
+    calculate_elo_systems(elo_systems, first.intern(games_for_elo.iloc[:cut]))
+    datasets.save_elo_checkpoints(elo_systems, first)
+    # Saving does not rename the rosters of the running systems
+    assert set(elo_systems[0].rosters()) <= set(
+        range(len(first.vocabularies["roster"]))
+    ) | {pd.NA}
+
+    # The next run interns the rosters in another order
+    second = KeyInterner.fit({"games_for_elo": games_for_elo.iloc[::-1]})
+    assert not first.vocabularies["roster"].equals(
+        second.vocabularies["roster"][: len(first.vocabularies["roster"])]
+    )
+    elo_systems = datasets.initialize_elo_systems(CONFIGS, second)
+    assert all(elo_system.watermark is not None for elo_system in elo_systems)
+    calculate_elo_systems(elo_systems, second.intern(games_for_elo))
+
+    # Interned games have <NA> instead of None for the missing rosters
+    names = {**second.names("roster"), pd.NA: None}
+    for reference, elo_system in zip(expected, elo_systems):
+        elo_system.rename_rosters(names)
+        check_elo_equivalence(reference, elo_system)
+
+
+def test_state_dicts_round_trip(games_for_elo):
+    # Stop mid-match, so match_ratings is not empty
+    elo_system = _calculate_in_runs(games_for_elo.iloc[:151], [], "iterrows")[0]
+    assert elo_system.match_ratings
+    dicts = (
+        elo_system.ratings,
+        elo_system.team_game_counts,
+        elo_system.last_played,
+        elo_system.match_ratings,
+    )
+
+    state = state_from_dicts(*dicts, elo_system.key_suffix)
+    assert None in state.rosters
+    result = state_to_dicts(state, elo_system.key_suffix)
+    for expected, dictionary in zip(dicts, result):
+        assert list(dictionary) == list(expected)
+    assert result[1] == dicts[1] and result[2] == dicts[2]
+    for expected, dictionary in zip((dicts[0], dicts[3]), (result[0], result[3])):
+        for roster, ratings in expected.items():
+            assert list(dictionary[roster]) == list(ratings)
+            np.testing.assert_array_equal(
+                list(dictionary[roster].values()), list(ratings.values())
+            )
+
+
+def test_add_elos_fills_only_the_columns_of_its_system(games_for_elo):
+    elo_systems = _systems()
+    calculate_elo_systems(elo_systems, games_for_elo.iloc[:250])
+    df = games_for_elo[["game_id", "roster_hash"]].assign(won=1.0)
+    df.loc[250:, "won"] = np.nan
+    for elo_system in elo_systems[::-1]:
+        df = add_elos(df, elo_system)
+
+    new_matches = df[df["won"].isna()].dropna(subset=["roster_hash"])
+    for elo_system in elo_systems:
+        columns = [c for c in df.columns if c.endswith(elo_system.key_suffix)]
+        current = elo_system.ratings_frame().reindex(
+            index=new_matches["roster_hash"], columns=columns
+        )
+        np.testing.assert_array_equal(
+            new_matches[columns].to_numpy(dtype=float), current.to_numpy()
+        )
+
+
+@pytest.mark.parametrize("min_games", [0, 10**9])
+def test_numpy_engines_match_iterrows(games_for_elo, monkeypatch, min_games):
+    # Without numba, the wavefront (min_games=0) or the sequential Python loop
+    calls = []
+    run_elo_wavefront = elo_engine._run_elo_wavefront
+
+    def wavefront(*args, **kwargs):
+        calls.append(len(args[0]))
+        return run_elo_wavefront(*args, **kwargs)
+
+    monkeypatch.setattr(elo_engine, "_compiled_run_elo", None)
+    monkeypatch.setattr(elo_engine, "WAVEFRONT_MIN_GAMES", min_games)
+    monkeypatch.setattr(elo_engine, "_run_elo_wavefront", wavefront)
+    expected = _calculate_in_runs(games_for_elo, [], engine="iterrows")
+    result = _calculate_in_runs(games_for_elo, [101, 151])
+    assert bool(calls) == (min_games == 0)
+    for reference, elo_system in zip(expected, result):
+        check_elo_equivalence(reference, elo_system)
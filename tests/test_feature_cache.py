@@ -0,0 +1,25 @@
+import pandas as pd
+
+from iron_man_features.features import feature_cache
+from iron_man_features.features.feature_cache import (
+    current_feature_cache,
+    feature_cache_scope,
+)
+
+
+def test_no_fingerprint_outside_a_scope(monkeypatch):
+    def fingerprint(df):
+        raise AssertionError("fingerprinted a DataFrame without a cache")
+
+    monkeypatch.setattr(feature_cache, "frame_fingerprint", fingerprint)
+    df = pd.DataFrame({"a": [1, 2]})
+    assert current_feature_cache().get_or_compute(df, "key", lambda: 42) == 42
+
+
+def test_scope_reuses_values():
+    df = pd.DataFrame({"a": [1, 2]})
+    with feature_cache_scope() as cache:
+        assert cache.get_or_compute(df, "key", lambda: 1) == 1
+        assert cache.get_or_compute(df, "key", lambda: 2) == 1
+        assert cache.stats()["hits"] == 1
+    assert len(cache) == 0
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from iron_man_features.features import FEATURES
+from iron_man_features.features.feature_cache import feature_cache_scope
+from iron_man_features.features.parallel import execute_plan
+from iron_man_features.features.planner import FeaturePlan
+
+
+def _execute(df: pd.DataFrame, engine: str) -> pd.DataFrame:
+    with feature_cache_scope():
+        return pd.concat(FeaturePlan(FEATURES).execute(df, engine=engine), axis=1)
+
+
+def _assert_same_features(expected: pd.DataFrame, result: pd.DataFrame):
+    assert list(result.columns) == list(expected.columns)
+    np.testing.assert_allclose(
+        result.to_numpy(dtype=float),
+        expected.to_numpy(dtype=float),
+        rtol=1e-9,
+        atol=1e-12,
+        equal_nan=True,
+    )
+
+
+@pytest.mark.parametrize("roster_keys", ["interned", "strings"])
+def test_numpy_engine_matches_pandas_rolling(feature_frame, roster_keys):
+    if roster_keys == "strings":
+        feature_frame["roster_hash"] = [
+            None if pd.isna(code) else f"{code}-1-2-3-4"
+            for code in feature_frame["roster_hash"]
+        ]
+    # Several games of a roster on the same timestamp, for the time windows
+    assert feature_frame.duplicated(["roster_hash", "match_date"]).any()
+
+    _assert_same_features(
+        _execute(feature_frame, "pandas"), _execute(feature_frame, "numpy")
+    )
+
+
+def test_rows_without_roster_have_no_roster_features(feature_frame):
+    result = _execute(feature_frame, "numpy")
+    no_roster = feature_frame["roster_hash"].isna().to_numpy()
+    games_played = result.filter(like="games_played_last_days").to_numpy()
+    assert no_roster.any()
+    assert np.isnan(games_played[no_roster]).all()
+
+
+def test_parallel_execution_matches_serial(feature_frame):
+    plan = FeaturePlan(FEATURES)
+    with feature_cache_scope():
+        serial = pd.concat(plan.execute(feature_frame, engine="numpy"), axis=1)
+    parallel = pd.concat(
+        execute_plan(plan, feature_frame, workers=2, min_rows=0, engine="numpy"),
+        axis=1,
+    )
+    _assert_same_features(serial, parallel)
@@ -0,0 +1,170 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from iron_man_features.data_manager.schema import compact_dataframes
+from iron_man_features.data_manager.views import (
+    ELO_COLUMNS,
+    ELO_OPPONENT_COLUMNS,
+    _per_round,
+    _rank_range,
+    derive_views,
+)
+from iron_man_features.queries import SCHEMAS
+
+
+def _views(team_game: pd.DataFrame) -> dict:
+    return derive_views({"team_game": team_game}, ["games_for_elo", "team_games"])
+
+
+def _opponents(team_game: pd.DataFrame) -> list:
+    # Position of the opponent of each row, or None for games with a single team
+    rows = {}
+    for row, game_id in enumerate(team_game["game_id"]):
+        rows.setdefault(game_id, []).append(row)
+    return [
+        next((other for other in rows[game_id] if other != row), None)
+        for row, game_id in enumerate(team_game["game_id"])
+    ]
+
+
+def _missing(value) -> bool:
+    return value is None or pd.isna(value)
+
+
+def _per_round_reference(value, total_rounds):
+    if _missing(value) or _missing(total_rounds) or total_rounds == 0:
+        return None
+    ratio = Decimal(int(value)) / Decimal(int(total_rounds))
+    return float(ratio.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP))
+
+
+def _rank_range_reference(rank):
+    if _missing(rank):
+        return None
+    return next((bound for bound in (5, 10, 20, 50, 100, 500) if rank <= bound), None)
+
+
+def _assert_values(result: pd.Series, expected: list):
+    assert len(result) == len(expected)
+    for value, reference in zip(result.tolist(), expected):
+        if _missing(reference):
+            assert _missing(value)
+        else:
+            assert value == pytest.approx(reference, rel=1e-12)
+
+
+def test_per_round_rounds_half_up_and_is_null_without_rounds():
+    values = pd.Series([1, 3, 2, 5, None, 7], dtype="Int16")
+    total_rounds = pd.Series([32, 32, 3, 0, 20, None], dtype="Int16")
+    result = _per_round(values, total_rounds)
+    _assert_values(result, [0.0313, 0.0938, 0.6667, None, None, None])
+
+
+def test_rank_range_buckets():
+    ranks = pd.Series([1, 5, 6, 10, 11, 50, 51, 500, 501, None], dtype="Int16")
+    result = _rank_range(ranks)
+    assert result.dtype == "Int16"
+    _assert_values(result, [5, 5, 10, 10, 20, 50, 100, 500, None, None])
+
+
+def test_games_for_elo_has_one_row_per_game_from_the_lowest_team(team_game):
+    games_for_elo = _views(team_game)["games_for_elo"]
+    opponents = _opponents(team_game)
+    rows = [
+        row
+        for row, other in enumerate(opponents)
+        if other is not None
+        and team_game["team_id"].iloc[row] < team_game["team_id"].iloc[other]
+    ]
+
+    assert list(games_for_elo.columns) == ELO_COLUMNS + [
+        f"{column}_op" for column in ELO_OPPONENT_COLUMNS
+    ]
+    pd.testing.assert_frame_equal(
+        games_for_elo[ELO_COLUMNS],
+        team_game[ELO_COLUMNS].iloc[rows].reset_index(drop=True),
+    )
+    opponent_rows = [opponents[row] for row in rows]
+    pd.testing.assert_frame_equal(
+        games_for_elo[[f"{column}_op" for column in ELO_OPPONENT_COLUMNS]],
+        team_game[ELO_OPPONENT_COLUMNS]
+        .iloc[opponent_rows]
+        .add_suffix("_op")
+        .reset_index(drop=True),
+    )
+
+
+def test_team_games_derived_columns(team_game):
+    team_games = _views(team_game)["team_games"]
+    opponents = _opponents(team_game)
+    assert None in opponents
+    assert len(team_games) == len(team_game)
+    np.testing.assert_array_equal(team_games["game_id"], team_game["game_id"])
+    np.testing.assert_array_equal(team_games["match_date"], team_game["start_date"])
+
+    def opponent(column):
+        return [
+            None if other is None else team_game[column].iloc[other]
+            for other in opponents
+        ]
+
+    rows = team_game.to_dict("records")
+    score_op = opponent("score")
+    won = [
+        None if _missing(row["score"]) or _missing(op) else row["score"] > op
+        for row, op in zip(rows, score_op)
+    ]
+    lost = [
+        None if _missing(row["score"]) or _missing(op) else row["score"] < op
+        for row, op in zip(rows, score_op)
+    ]
+    rounds_op = [
+        None if ct is None else ct + tr
+        for ct, tr in zip(opponent("score_ct"), opponent("score_tr"))
+    ]
+    _assert_values(team_games["won"], won)
+    _assert_values(
+        team_games["rounds_lost_on_win"],
+        [rounds if w else None for rounds, w in zip(rounds_op, won)],
+    )
+    _assert_values(
+        team_games["rounds_won_on_loss"],
+        [
+            row["score_ct"] + row["score_tr"] if w else None
+            for row, w in zip(rows, lost)
+        ],
+    )
+    _assert_values(
+        team_games["rank_range_op"],
+        [_rank_range_reference(rank) for rank in opponent("hltv_rank")],
+    )
+    _assert_values(
+        team_games["player_carried"],
+        [
+            None if _missing(row["max_rating"]) else row["max_rating"] > 1.6
+            for row in rows
+        ],
+    )
+    _assert_values(
+        team_games["player_carried_down"],
+        [
+            None if _missing(row["min_rating"]) else row["min_rating"] < 0.5
+            for row in rows
+        ],
+    )
+    for column in ("kills", "deaths", "first_kills", "flash_assists", "clutches"):
+        _assert_values(
+            team_games[f"{column}_per_round"],
+            [_per_round_reference(row[column], row["total_rounds"]) for row in rows],
+        )
+
+
+@pytest.mark.parametrize("name", ["games_for_elo", "team_games"])
+def test_views_have_the_columns_and_dtypes_of_their_schema(team_game, name):
+    view = compact_dataframes(_views(team_game), SCHEMAS)[name]
+    assert set(SCHEMAS[name]) <= set(view.columns)
+    dtypes = {column: str(view[column].dtype) for column in SCHEMAS[name]}
+    assert dtypes == SCHEMAS[name]